@@ -0,0 +1,87 @@
+# Интерфейс бэкенда хранилища книг.
+# Фасады BookStorage (async) и sotrage_sync.BookStorage работают
+# с любым объектом, реализующим этот протокол
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from app.core.storage import BookModel
+
+
+class BookBackend(Protocol):
+    # Вызовы выполняют блокирующий ввод-вывод (например, SQLite):
+    # асинхронный фасад выполняет их в пуле потоков
+    blocking: bool
+    # Блокировка, сериализующая изменения
+    lock: threading.Lock
+    # Подписчики на изменения: вызываются как
+    # listener(op, id, title, old_title) в порядке изменений,
+    # после того как изменение выполнено
+    listeners: list
+
+    def add_book(self, book: BookModel) -> None:
+        """Сохраняет книгу и проставляет ей id"""
+
+    def get_books(
+        self,
+        id: int | None = None,
+        title: str | None = None,
+        id__gt: int | None = None,
+        id__lt: int | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+            ) -> list[BookModel]:
+        """Книги по фильтрам в порядке возрастания id"""
+
+    def get_book(
+        self,
+        id: int | None = None,
+        title: str | None = None
+            ) -> BookModel | None:
+        """Книга по id или первая книга с названием"""
+
+    def get_books_by_ids(self, book_ids: list[int]) -> list[BookModel | None]:
+        """Книги по списку id за один запрос, в порядке ids
+        (None для отсутствующих)"""
+
+    def update_book(self, book_id: int, title: str) -> BookModel | None:
+        """Меняет название, возвращает книгу или None"""
+
+    def delete_book(self, book_id: int) -> bool:
+        """Удаляет книгу, возвращает признак успеха"""
+
+    def add_books(self, books: list[BookModel]) -> None:
+        """Сохраняет пакет книг за одну блокировку"""
+
+    def update_books(
+        self,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        """Пакетное изменение названий (id, title)"""
+
+    def delete_books(self, book_ids: list[int]) -> list[bool]:
+        """Пакетное удаление, признак успеха для каждого id"""
+
+    def apply_batch(
+        self,
+        books: list[BookModel],
+        updates: list[tuple[int, str]],
+        book_ids: list[int],
+            ) -> tuple[list[BookModel | None], list[bool]]:
+        """Атомарно: add_books(books), update_books(updates)
+        и delete_books(book_ids). Возвращает результаты изменения
+        и удаления"""
+
+    def commit_future(self) -> Future | None:
+        """Future, который завершится, когда выполненные изменения
+        станут долговечными. None, если ждать нечего"""
+
+    def close(self) -> None:
+        """Освобождает ресурсы бэкенда"""
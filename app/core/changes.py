@@ -0,0 +1,70 @@
+# Лента изменений книг (change data capture).
+# Бэкенд хранилища вызывает ChangeFeed.append для каждого изменения
+# под своей блокировкой записи, поэтому номера событий (seq) идут
+# в порядке изменений. Последние события хранятся в кольцевом буфере:
+# переподключившийся клиент получает только пропущенные события,
+# а полный снимок - лишь если нужные события уже вытеснены
+import json
+import threading
+from collections import deque
+from itertools import islice
+
+# Событие: (seq, вид изменения, id книги, название, прежнее название).
+# Название есть у добавления и обновления, прежнее - у обновления
+# и удаления
+ChangeEvent = tuple[int, str, int, str | None, str | None]
+
+
+def event_json(event: ChangeEvent) -> str:
+    seq, op, book_id, title, old_title = event
+    return json.dumps(
+        {"type": "change", "seq": seq, "op": op, "id": book_id,
+         "title": title, "old_title": old_title},
+        ensure_ascii=False,
+        )
+
+
+class ChangeFeed:
+
+    def __init__(self, capacity: int = 100_000):
+        self.events: deque[ChangeEvent] = deque(maxlen=capacity)
+        # Номер последнего события
+        self.seq = 0
+        self.lock = threading.Lock()
+        # Вызываются с каждым новым событием в потоке изменения
+        self.listeners: list = []
+
+    def append(
+        self,
+        op: str,
+        book_id: int,
+        title: str | None = None,
+        old_title: str | None = None,
+            ):
+        with self.lock:
+            self.seq += 1
+            event = (self.seq, op, book_id, title, old_title)
+            self.events.append(event)
+        for listener in self.listeners:
+            listener(event)
+
+    def restart(self, seq: int):
+        """Продолжает нумерацию с seq (номера событий сервера
+        хранилища, общие для всех процессов)"""
+        with self.lock:
+            self.events.clear()
+            self.seq = seq
+
+    def since(self, seq: int) -> list[ChangeEvent] | None:
+        """События после seq. None, если часть из них уже вытеснена
+        из буфера или seq неизвестен (например, до перезапуска)"""
+        with self.lock:
+            if seq > self.seq:
+                return None
+            first = self.events[0][0] if self.events else self.seq + 1
+            if seq < first - 1:
+                return None
+            return list(islice(self.events, seq - first + 1, None))
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,303 @@
+# Журнал изменений таблицы книг (write-ahead log) и снимки.
+# Каждое изменение BookTable дописывается в двоичный журнал.
+# Поток записи забирает накопившиеся записи одним пакетом и делает
+# один fsync на пакет (group commit). Если запись на диск не удалась,
+# журнал больше не пишется, а таблица отклоняет изменения: иначе
+# следующие записи легли бы в журнал после потерянного пакета.
+# Периодически таблица сохраняется в уплотнённый снимок, после чего
+# вошедшие в него журналы удаляются.
+# При старте снимок читается через mmap, а поверх проигрывается
+# только хвост журнала
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from concurrent.futures import Future
+from itertools import accumulate
+
+from app.core.storage import ADD, UPDATE, DELETE, BookTable
+
+# Запись журнала: crc32 | вид изменения, id, длина названия | название
+RECORD_CRC = struct.Struct("<I")
+RECORD_HEADER = struct.Struct("<BqI")
+OPS = {ADD: 1, UPDATE: 2, DELETE: 3}
+OP_NAMES = {code: op for op, code in OPS.items()}
+
+# Снимок: сигнатура, поколение журнала, следующий id, число книг,
+# размер блока названий в байтах. Затем колонка id (int64),
+# смещения названий в символах (int64) и сами названия (utf-8)
+SNAPSHOT_MAGIC = b"BOOKSNP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQQQQ")
+
+SNAPSHOT_FILE = "books.snapshot"
+WAL_PREFIX, WAL_SUFFIX = "books.", ".wal"
+
+
+def encode_record(op: str, book_id: int, title: str | None) -> bytes:
+    data = title.encode() if title is not None else b""
+    body = RECORD_HEADER.pack(OPS[op], book_id, len(data)) + data
+    return RECORD_CRC.pack(zlib.crc32(body)) + body
+
+
+def read_records(data: bytes) -> tuple[list, int]:
+    """Разбирает записи журнала. Возвращает записи и длину целой части:
+    оборванная при сбое последняя запись отбрасывается"""
+    records = []
+    offset = 0
+    header_size = RECORD_CRC.size + RECORD_HEADER.size
+    while offset + header_size <= len(data):
+        (crc,) = RECORD_CRC.unpack_from(data, offset)
+        start = offset + RECORD_CRC.size
+        code, book_id, length = RECORD_HEADER.unpack_from(data, start)
+        end = start + RECORD_HEADER.size + length
+        if end > len(data) or zlib.crc32(data[start:end]) != crc:
+            break
+        op = OP_NAMES[code]
+        title = None
+        if op != DELETE:
+            title = data[start + RECORD_HEADER.size:end].decode()
+        records.append((op, book_id, title))
+        offset = end
+    return records, offset
+
+
+class BookJournal:
+
+    def __init__(
+        self,
+        directory: str,
+        table: BookTable,
+        snapshot_every: int = 100_000,
+            ):
+        self.directory = directory
+        self.table = table
+        # Через сколько записей журнала делать новый снимок
+        self.snapshot_every = snapshot_every
+        # Ещё не записанные записи и Future их пакета
+        self.buffer = bytearray()
+        self.future: Future | None = None
+        # Пакет, который сейчас записывается на диск
+        self.inflight: Future | None = None
+        self.records = 0
+        self.condition = threading.Condition()
+        # Порядок захвата: file_lock -> table.lock -> condition.
+        # Запись на диск идёт под file_lock, но не под table.lock
+        self.file_lock = threading.Lock()
+        # Ошибка записи на диск; после неё изменения отклоняются
+        self.error: OSError | None = None
+        self.closed = False
+        self.snapshot_thread: threading.Thread | None = None
+
+        os.makedirs(directory, exist_ok=True)
+        self.generation = self._recover()
+        self.file = open(self._wal_path(self.generation), "ab")
+        self.flusher = threading.Thread(
+            target=self._flush_loop, name="book-journal", daemon=True
+            )
+        self.flusher.start()
+        table.journal = self
+
+    def _wal_path(self, generation: int) -> str:
+        return os.path.join(
+            self.directory, f"{WAL_PREFIX}{generation:08d}{WAL_SUFFIX}"
+            )
+
+    def _wal_generations(self) -> list[int]:
+        return sorted(
+            int(name[len(WAL_PREFIX):-len(WAL_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.startswith(WAL_PREFIX) and name.endswith(WAL_SUFFIX)
+        )
+
+    def _recover(self) -> int:
+        """Загружает снимок и проигрывает журналы после него"""
+        generation = self._load_snapshot()
+        for wal_generation in self._wal_generations():
+            path = self._wal_path(wal_generation)
+            if wal_generation < generation:
+                os.remove(path)
+                continue
+            with open(path, "rb") as file:
+                data = file.read()
+            records, valid = read_records(data)
+            for op, book_id, title in records:
+                self.table.apply(op, book_id, title)
+            self.records += len(records)
+            if valid < len(data):
+                os.truncate(path, valid)
+            generation = wal_generation
+        return generation
+
+    def _load_snapshot(self) -> int:
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with (
+            open(path, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view,
+        ):
+            magic, generation, index, count, size = (
+                SNAPSHOT_HEADER.unpack_from(view)
+                )
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Повреждённый снимок: {path}")
+            offset = SNAPSHOT_HEADER.size
+            ids = array("q")
+            ids.frombytes(view[offset:offset + count * ids.itemsize])
+            offset += count * ids.itemsize
+            offsets = array("q")
+            offsets.frombytes(
+                view[offset:offset + (count + 1) * offsets.itemsize]
+                )
+            offset += (count + 1) * offsets.itemsize
+            blob = view[offset:offset + size].decode()
+        titles = [
+            sys.intern(blob[start:end])
+            for start, end in zip(offsets, offsets[1:])
+        ]
+        self.table.load(ids, titles, index)
+        return generation
+
+    def check(self) -> None:
+        """Вызывается под table.lock перед изменением таблицы"""
+        if self.error is not None:
+            raise OSError(
+                f"Журнал не записан, изменения отклоняются: {self.error}"
+                ) from self.error
+
+    def append(self, op: str, book_id: int, title: str | None) -> None:
+        """Добавляет запись в текущий пакет. Вызывается под table.lock"""
+        record = encode_record(op, book_id, title)
+        with self.condition:
+            self.buffer += record
+            if self.future is None:
+                self.future = Future()
+            self.records += 1
+            self.condition.notify()
+        if (
+            self.records >= self.snapshot_every
+            and self.snapshot_thread is None
+        ):
+            self.snapshot_thread = threading.Thread(
+                target=self._snapshot_worker,
+                name="book-snapshot",
+                daemon=True,
+                )
+            self.snapshot_thread.start()
+
+    def commit_future(self) -> Future | None:
+        with self.condition:
+            return self.future or self.inflight
+
+    def _take_batch(self) -> tuple[bytearray, Future | None]:
+        with self.condition:
+            data, future = self.buffer, self.future
+            self.buffer, self.future = bytearray(), None
+            if future is not None:
+                self.inflight = future
+            return data, future
+
+    def _write(self, data: bytearray, future: Future | None) -> None:
+        # После ошибки пакеты не пишутся: в журнале был бы пропуск.
+        # Ошибку получат ожидающие и этого пакета, и следующих
+        # (принятых до того, как таблица начала отклонять изменения)
+        if self.error is None:
+            try:
+                self.file.write(data)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except OSError as e:
+                self.error = e
+        if future is None:
+            return
+        if self.error is not None:
+            future.set_exception(self.error)
+        else:
+            future.set_result(None)
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self.condition:
+                while not self.buffer and not self.closed:
+                    self.condition.wait()
+                if not self.buffer and self.closed:
+                    return
+            with self.file_lock:
+                data, future = self._take_batch()
+                if data:
+                    self._write(data, future)
+
+    def _rotate(self, data: bytearray, future: Future | None) -> int:
+        """Дописывает пакет в текущий журнал и начинает следующий.
+        Вызывается под file_lock"""
+        if data:
+            self._write(data, future)
+        self.file.close()
+        self.generation += 1
+        self.file = open(self._wal_path(self.generation), "ab")
+        return self.generation
+
+    def _snapshot_worker(self) -> None:
+        try:
+            self.snapshot()
+        finally:
+            self.snapshot_thread = None
+
+    def snapshot(self) -> None:
+        """Сохраняет уплотнённый снимок таблицы и удаляет журналы,
+        которые в него вошли"""
+        # Под table.lock только копируем колонки и забираем пакет
+        # текущего журнала: всё до него входит в снимок. Пакет пишется
+        # и журнал переключается уже без table.lock, но под file_lock,
+        # чтобы поток записи не дописал в старый журнал изменения,
+        # сделанные после копирования
+        with self.file_lock:
+            with self.table.lock:
+                ids, titles = self.table.columns
+                ids, titles = array("q", ids), list(titles)
+                index = self.table.index
+                data, future = self._take_batch()
+                self.records = 0
+            generation = self._rotate(data, future)
+        if None in titles:
+            live = [
+                (book_id, title)
+                for book_id, title in zip(ids, titles)
+                if title is not None
+            ]
+            ids = array("q", (book_id for book_id, _ in live))
+            titles = [title for _, title in live]
+        offsets = array("q", accumulate(map(len, titles), initial=0))
+        blob = "".join(titles).encode()
+
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + ".tmp", "wb") as file:
+            file.write(SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC, generation, index, len(ids), len(blob)
+                ))
+            file.write(ids.tobytes())
+            file.write(offsets.tobytes())
+            file.write(blob)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        for wal_generation in self._wal_generations():
+            if wal_generation < generation:
+                os.remove(self._wal_path(wal_generation))
+
+    def close(self) -> None:
+        """Дописывает журнал и сохраняет снимок для быстрого старта"""
+        snapshot_thread = self.snapshot_thread
+        if snapshot_thread is not None:
+            snapshot_thread.join()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.flusher.join()
+        if self.records:
+            self.snapshot()
+        self.file.close()
+        self.table.journal = None
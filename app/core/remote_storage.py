@@ -0,0 +1,401 @@
+# Бэкенд хранилища книг, работающий через сервер хранилища
+# (app/core/storage_server.py) по Unix сокету.
+# Нужен при запуске нескольких процессов (uvicorn --workers N):
+# у каждого процесса своя память, а данные должны быть общими.
+#
+# Протокол двоичный. Запрос: заголовок (длина данных - 4 байта,
+# номер запроса - 4 байта, операция - 1 байт) и данные операции.
+# Ответ: такой же заголовок, вместо операции - статус. Запросы
+# отправляются, не дожидаясь ответов на предыдущие (конвейер): ответ
+# находит своего ожидающего по номеру запроса. События изменений
+# сервер присылает с номером запроса 0
+import socket
+import struct
+import threading
+from concurrent.futures import Future
+from itertools import count
+
+from app.core.storage import BookModel
+
+HEADER = struct.Struct(">IIB")
+INT = struct.Struct(">q")
+LENGTH = struct.Struct(">I")
+FILTER_MASK = struct.Struct(">H")
+
+# Операции
+(
+    ADD_BOOK, GET_BOOKS, GET_BOOK, UPDATE_BOOK, DELETE_BOOK,
+    ADD_BOOKS, UPDATE_BOOKS, DELETE_BOOKS, SUBSCRIBE, GET_BOOKS_BY_IDS,
+    APPLY_BATCH,
+) = range(11)
+# Статусы ответа
+OK, ERROR, EVENT = range(3)
+
+# Фильтры get_books в порядке битов маски и их типы
+FILTERS = (
+    ("id", int),
+    ("title", str),
+    ("id__gt", int),
+    ("id__lt", int),
+    ("limit", int),
+    ("after", str),
+    ("title__startswith", str),
+    ("title__istartswith", str),
+    ("title__contains", str),
+    ("title__icontains", str),
+)
+
+
+class Packer:
+    """Данные запроса или ответа"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def put_int(self, value: int) -> None:
+        try:
+            self.buffer += INT.pack(value)
+        except struct.error as e:
+            raise ValueError(f"Число вне диапазона: {value}") from e
+
+    def put_count(self, value: int) -> None:
+        self.buffer += LENGTH.pack(value)
+
+    def put_flag(self, value: bool) -> None:
+        self.buffer.append(1 if value else 0)
+
+    def put_str(self, value: str) -> None:
+        data = value.encode()
+        self.buffer += LENGTH.pack(len(data))
+        self.buffer += data
+
+    def put_optional_str(self, value: str | None) -> None:
+        self.put_flag(value is not None)
+        if value is not None:
+            self.put_str(value)
+
+    def put_book(self, book: BookModel | None) -> None:
+        self.put_flag(book is not None)
+        if book is not None:
+            self.put_int(book.id)
+            self.put_str(book.title)
+
+    def put_books(self, books: list[BookModel]) -> None:
+        """Список книг: id и длины названий массивами, затем названия
+        подряд - без заголовка на каждое поле"""
+        titles = [book.title.encode() for book in books]
+        self.put_count(len(books))
+        self.buffer += struct.pack(
+            f">{len(books)}q", *(book.id for book in books)
+            )
+        self.buffer += struct.pack(f">{len(titles)}I", *map(len, titles))
+        self.buffer += b"".join(titles)
+
+    def put_filters(self, filters: dict) -> None:
+        mask = 0
+        for bit, (name, _) in enumerate(FILTERS):
+            if filters.get(name) is not None:
+                mask |= 1 << bit
+        self.buffer += FILTER_MASK.pack(mask)
+        for name, kind in FILTERS:
+            value = filters.get(name)
+            if value is None:
+                continue
+            if kind is int:
+                self.put_int(value)
+            else:
+                self.put_str(value)
+
+
+class Unpacker:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def get_int(self) -> int:
+        (value,) = INT.unpack_from(self.data, self.offset)
+        self.offset += INT.size
+        return value
+
+    def get_count(self) -> int:
+        (value,) = LENGTH.unpack_from(self.data, self.offset)
+        self.offset += LENGTH.size
+        return value
+
+    def get_flag(self) -> bool:
+        value = self.data[self.offset]
+        self.offset += 1
+        return bool(value)
+
+    def get_str(self) -> str:
+        length = self.get_count()
+        end = self.offset + length
+        value = self.data[self.offset:end].decode()
+        self.offset = end
+        return value
+
+    def get_optional_str(self) -> str | None:
+        return self.get_str() if self.get_flag() else None
+
+    def get_book(self) -> BookModel | None:
+        if not self.get_flag():
+            return None
+        book_id = self.get_int()
+        return BookModel(title=self.get_str(), id=book_id)
+
+    def get_optional_books(self) -> list[BookModel | None]:
+        return [self.get_book() for _ in range(self.get_count())]
+
+    def get_books(self) -> list[BookModel]:
+        size = self.get_count()
+        ids = struct.unpack_from(f">{size}q", self.data, self.offset)
+        self.offset += INT.size * size
+        lengths = struct.unpack_from(f">{size}I", self.data, self.offset)
+        self.offset += LENGTH.size * size
+        books = []
+        for book_id, length in zip(ids, lengths):
+            end = self.offset + length
+            books.append(BookModel(
+                title=self.data[self.offset:end].decode(), id=book_id
+                ))
+            self.offset = end
+        return books
+
+    def get_filters(self) -> dict:
+        (mask,) = FILTER_MASK.unpack_from(self.data, self.offset)
+        self.offset += FILTER_MASK.size
+        filters = {}
+        for bit, (name, kind) in enumerate(FILTERS):
+            if mask & (1 << bit):
+                filters[name] = (
+                    self.get_int() if kind is int else self.get_str()
+                    )
+        return filters
+
+
+class RemoteBookTable:
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        # Изменения сериализует сервер; блокировка нужна только
+        # по протоколу бэкенда (см. BookStorage._write)
+        self.lock = threading.Lock()
+        self.listeners: list = []
+        # Номер последнего события изменений сервера
+        self.seq = 0
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.send_lock = threading.Lock()
+        self.pending: dict[int, Future] = {}
+        self.request_ids = count()
+        # Соединение с сервером разорвано
+        self.closed = False
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        """Разбирает ответы сервера в отдельном потоке.
+        Как бы ни завершилось чтение, ожидающие запросы получают
+        ошибку, а новые запросы отклоняются: иначе они ждали бы
+        ответа вечно"""
+        stream = self.socket.makefile("rb")
+        try:
+            while True:
+                header = stream.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, request_id, status = HEADER.unpack(header)
+                data = stream.read(length)
+                if status == EVENT:
+                    self._event(Unpacker(data))
+                    continue
+                future = self.pending.pop(request_id, None)
+                if future is None:
+                    # Ответ на неизвестный запрос
+                    continue
+                if status == OK:
+                    future.set_result(Unpacker(data))
+                else:
+                    future.set_exception(ValueError(data.decode()))
+        except OSError:
+            pass
+        finally:
+            self.closed = True
+            error = ConnectionError("Сервер хранилища недоступен")
+            for request_id in list(self.pending):
+                future = self.pending.pop(request_id, None)
+                if future is not None:
+                    future.set_exception(error)
+
+    def _event(self, data: Unpacker):
+        seq = data.get_int()
+        if seq <= self.seq:
+            return
+        self.seq = seq
+        op, book_id = data.get_str(), data.get_int()
+        title, old_title = data.get_optional_str(), data.get_optional_str()
+        for listener in self.listeners:
+            # Ошибка подписчика не должна останавливать поток чтения
+            try:
+                listener(op, book_id, title, old_title)
+            except Exception as e:
+                print(f"Ошибка подписчика изменений: {e}")
+
+    def _call(self, op: int, data: Packer, callback=None) -> Unpacker:
+        if self.closed:
+            raise ConnectionError("Сервер хранилища недоступен")
+        future = Future()
+        if callback is not None:
+            # Выполняется в потоке чтения до разбора следующих ответов
+            future.add_done_callback(callback)
+        # Номер запроса - 4 байта (0 - события сервера)
+        request_id = next(self.request_ids) % 0xFFFFFFFF + 1
+        self.pending[request_id] = future
+        if self.closed:
+            # Поток чтения завершился, пока запрос регистрировался
+            self.pending.pop(request_id, None)
+            raise ConnectionError("Сервер хранилища недоступен")
+        frame = HEADER.pack(len(data.buffer), request_id, op) + data.buffer
+        try:
+            with self.send_lock:
+                self.socket.sendall(frame)
+        except OSError as e:
+            self.pending.pop(request_id, None)
+            raise ConnectionError("Сервер хранилища недоступен") from e
+        return future.result()
+
+    def subscribe(self, start=None) -> None:
+        """Подписка на изменения всех клиентов сервера: подписчики
+        listeners вызываются в потоке чтения. start(seq) получает номер
+        последнего события сервера до первого нового события"""
+        def started(future: Future):
+            if future.exception() is None:
+                self.seq = future.result().get_int()
+                if start is not None:
+                    start(self.seq)
+
+        self._call(SUBSCRIBE, Packer(), started)
+
+    def commit_future(self):
+        # Сервер отвечает на изменение, когда оно уже долговечно
+        return None
+
+    def add_book(self, book: BookModel) -> None:
+        data = Packer()
+        data.put_str(book.title)
+        book.id = self._call(ADD_BOOK, data).get_int()
+
+    def get_books(
+        self,
+        id: int | None = None,
+        title: str | None = None,
+        id__gt: int | None = None,
+        id__lt: int | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+            ) -> list[BookModel]:
+        data = Packer()
+        data.put_filters({
+            "id": id, "title": title, "id__gt": id__gt, "id__lt": id__lt,
+            "limit": limit, "after": after,
+            "title__startswith": title__startswith,
+            "title__istartswith": title__istartswith,
+            "title__contains": title__contains,
+            "title__icontains": title__icontains,
+        })
+        return self._call(GET_BOOKS, data).get_books()
+
+    def get_book(
+        self,
+        id: int | None = None,
+        title: str | None = None
+            ) -> BookModel | None:
+        data = Packer()
+        data.put_filters({"id": id, "title": title})
+        return self._call(GET_BOOK, data).get_book()
+
+    def get_books_by_ids(self, book_ids: list[int]) -> list[BookModel | None]:
+        data = Packer()
+        data.put_count(len(book_ids))
+        for book_id in book_ids:
+            data.put_int(book_id)
+        return self._call(GET_BOOKS_BY_IDS, data).get_optional_books()
+
+    def update_book(self, book_id: int, title: str) -> BookModel | None:
+        data = Packer()
+        data.put_int(book_id)
+        data.put_str(title)
+        return self._call(UPDATE_BOOK, data).get_book()
+
+    def delete_book(self, book_id: int) -> bool:
+        data = Packer()
+        data.put_int(book_id)
+        return self._call(DELETE_BOOK, data).get_flag()
+
+    def add_books(self, books: list[BookModel]) -> None:
+        data = Packer()
+        data.put_count(len(books))
+        for book in books:
+            data.put_str(book.title)
+        result = self._call(ADD_BOOKS, data)
+        for book in books:
+            book.id = result.get_int()
+
+    def update_books(
+        self,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        data = Packer()
+        data.put_count(len(updates))
+        for book_id, title in updates:
+            data.put_int(book_id)
+            data.put_str(title)
+        return self._call(UPDATE_BOOKS, data).get_optional_books()
+
+    def delete_books(self, book_ids: list[int]) -> list[bool]:
+        data = Packer()
+        data.put_count(len(book_ids))
+        for book_id in book_ids:
+            data.put_int(book_id)
+        result = self._call(DELETE_BOOKS, data)
+        return [result.get_flag() for _ in range(result.get_count())]
+
+    def apply_batch(
+        self,
+        books: list[BookModel],
+        updates: list[tuple[int, str]],
+        book_ids: list[int],
+            ) -> tuple[list[BookModel | None], list[bool]]:
+        # Данные: названия новых книг, пары (id, название), id
+        # удаляемых. Ответ: id новых книг, изменённые книги, признаки
+        # удаления
+        data = Packer()
+        data.put_count(len(books))
+        for book in books:
+            data.put_str(book.title)
+        data.put_count(len(updates))
+        for book_id, title in updates:
+            data.put_int(book_id)
+            data.put_str(title)
+        data.put_count(len(book_ids))
+        for book_id in book_ids:
+            data.put_int(book_id)
+        result = self._call(APPLY_BATCH, data)
+        for book in books:
+            book.id = result.get_int()
+        updated = result.get_optional_books()
+        return updated, [result.get_flag() for _ in range(result.get_count())]
+
+    def close(self) -> None:
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self.reader.join()
@@ -0,0 +1,194 @@
+# Поисковый индекс по названиям книг:
+# - префиксный поиск по отсортированным спискам различных названий
+#   (по самим названиям и по названиям в нижнем регистре);
+# - поиск подстроки по триграммному инвертированному индексу.
+#   Триграммы занимают больше памяти, чем сами названия, поэтому
+#   индекс включается отдельно (trigrams=True); без него подстрока
+#   ищется перебором строк таблицы (см. BookTable.get_books).
+# Индекс строится по различным названиям, а не по книгам:
+# id книг по названию берутся из хеш-индекса BookTable.
+# Строится целиком при загрузке снимка (одна сортировка) и обновляется
+# инкрементально, когда название появляется в таблице или исчезает из неё
+import threading
+from bisect import bisect_left
+from itertools import islice
+from typing import Callable, Iterable
+
+# Больше любого символа: верхняя граница диапазона строк с префиксом
+MAX_CHAR = "\U0010ffff"
+# Размер части отсортированного списка при построении. Часть
+# делится пополам, когда становится вдвое больше
+CHUNK_SIZE = 500
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SortedTitles:
+    """Различные названия по возрастанию key(title), разбитые на
+    отсортированные части: вставка и удаление сдвигают элементы одной
+    части, а не всего списка"""
+
+    def __init__(
+        self,
+        titles: Iterable[str] = (),
+        key: Callable[[str], str] | None = None
+            ):
+        self.key = key
+        values = sorted(titles, key=key)
+        self.chunks: list[list[str]] = [
+            values[start:start + CHUNK_SIZE]
+            for start in range(0, len(values), CHUNK_SIZE)
+        ]
+        # Ключ последнего названия каждой части
+        self.maxes: list[str] = [self._key(chunk[-1]) for chunk in self.chunks]
+        # Части меняются на месте, поэтому и чтение берёт блокировку.
+        # Под ней выполняются только поиск и срезы списков
+        self.lock = threading.Lock()
+
+    def _key(self, title: str) -> str:
+        return title if self.key is None else self.key(title)
+
+    def add(self, title: str) -> None:
+        key = self._key(title)
+        with self.lock:
+            chunks, maxes = self.chunks, self.maxes
+            if not chunks:
+                chunks.append([title])
+                maxes.append(key)
+                return
+            index = bisect_left(maxes, key)
+            if index == len(maxes):
+                index -= 1
+                maxes[index] = key
+            chunk = chunks[index]
+            chunk.insert(bisect_left(chunk, key, key=self.key), title)
+            if len(chunk) > 2 * CHUNK_SIZE:
+                chunks.insert(index + 1, chunk[CHUNK_SIZE:])
+                del chunk[CHUNK_SIZE:]
+                maxes.insert(index, self._key(chunk[-1]))
+
+    def remove(self, title: str) -> None:
+        key = self._key(title)
+        with self.lock:
+            chunks, maxes = self.chunks, self.maxes
+            # Названия с равным ключом (например, "ABC" и "abc" в нижнем
+            # регистре) могут продолжаться в следующей части
+            for index in range(bisect_left(maxes, key), len(chunks)):
+                chunk = chunks[index]
+                start = bisect_left(chunk, key, key=self.key)
+                for position in range(start, len(chunk)):
+                    if chunk[position] == title:
+                        del chunk[position]
+                        if chunk:
+                            maxes[index] = self._key(chunk[-1])
+                        else:
+                            del chunks[index]
+                            del maxes[index]
+                        return
+                    if self._key(chunk[position]) != key:
+                        return
+
+    def with_prefix(
+        self,
+        prefix: str,
+        max_count: int | None = None
+            ) -> list[str] | None:
+        """Названия, ключ которых начинается с prefix (уже приведённого
+        через key). None, если их больше max_count"""
+        end_key = prefix + MAX_CHAR
+        found = []
+        with self.lock:
+            chunks = self.chunks
+            index = bisect_left(self.maxes, prefix)
+            for chunk in islice(chunks, index, None):
+                start = bisect_left(chunk, prefix, key=self.key)
+                end = bisect_left(chunk, end_key, key=self.key)
+                found.extend(chunk[start:end])
+                if max_count is not None and len(found) > max_count:
+                    return None
+                if end < len(chunk):
+                    break
+        # Граница prefix + MAX_CHAR пропускает строки, продолжающиеся
+        # самим MAX_CHAR, поэтому префикс перепроверяется
+        if self.key is None:
+            return [title for title in found if title.startswith(prefix)]
+        key = self.key
+        return [title for title in found if key(title).startswith(prefix)]
+
+
+class TitleSearchIndex:
+
+    def __init__(self, titles: Iterable[str] = (), trigrams: bool = False):
+        titles = list(titles)
+        # Различные названия по возрастанию и по возрастанию
+        # в нижнем регистре (casefold). Второй список хранит исходные
+        # названия, поэтому casefold не копирует строк
+        self.sorted_titles = SortedTitles(titles)
+        self.sorted_folded = SortedTitles(titles, key=str.casefold)
+        # Триграмма названия в нижнем регистре -> названия с ней.
+        # None, если триграммный индекс не включён
+        self.trigrams: dict[str, set[str]] | None = None
+        if trigrams:
+            self.trigrams = {}
+            for title in titles:
+                self._add_trigrams(title)
+
+    def _add_trigrams(self, title: str) -> None:
+        for trigram in trigrams(title.casefold()):
+            self.trigrams.setdefault(trigram, set()).add(title)
+
+    def add(self, title: str) -> None:
+        self.sorted_titles.add(title)
+        self.sorted_folded.add(title)
+        if self.trigrams is not None:
+            self._add_trigrams(title)
+
+    def remove(self, title: str) -> None:
+        self.sorted_titles.remove(title)
+        self.sorted_folded.remove(title)
+        if self.trigrams is None:
+            return
+        for trigram in trigrams(title.casefold()):
+            titles = self.trigrams[trigram]
+            titles.discard(title)
+            if not titles:
+                del self.trigrams[trigram]
+
+    def startswith(
+        self,
+        prefix: str,
+        max_count: int | None = None
+            ) -> list[str] | None:
+        """Названия с префиксом; None, если их больше max_count"""
+        return self.sorted_titles.with_prefix(prefix, max_count)
+
+    def istartswith(
+        self,
+        prefix: str,
+        max_count: int | None = None
+            ) -> list[str] | None:
+        return self.sorted_folded.with_prefix(prefix.casefold(), max_count)
+
+    def contains(
+        self,
+        text: str,
+        ignore_case: bool = False
+            ) -> list[str] | None:
+        """Названия с подстрокой text. None, если триграммного индекса
+        нет или подстрока короче триграммы: тогда быстрее перебор"""
+        folded = text.casefold()
+        if self.trigrams is None or len(folded) < 3:
+            return None
+        # Кандидаты - пересечение списков триграмм, от самого короткого
+        postings = [self.trigrams.get(trigram) for trigram in trigrams(folded)]
+        if None in postings:
+            return []
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        if ignore_case:
+            return [
+                title for title in candidates if folded in title.casefold()
+            ]
+        return [title for title in candidates if text in title]
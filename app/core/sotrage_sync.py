@@ -1,58 +1,26 @@
-# Хранилище с книгами (таблица)
-# По-хорошему, следует использовать БД
-# Но для примера подойдёт и работа со списком
+# Синхронный фасад над общим бэкендом книг (см. app/core/storage.py)
+# Используется SOAP сервером, который работает в отдельном потоке:
+# чтение идёт напрямую из бэкенда, изменения защищены его блокировкой
+from app.core.backend import BookBackend
+from app.core.storage import BookModel, book_table
 
-# Модель книги в "БД"
+__all__ = ["BookModel", "BookStorage", "book_storage"]
 
 
-class BookModel:
-    def __init__(self, title: str, id: int = 0):
-        self.id: int = id
-        self.title: str = title
-
-    def __str__(self):
-        return f"Book(id={self.id} title={self.title})"
-
-    def __repr__(self):
-        return f"Book(id={self.id} title={self.title})"
-
-    @property
-    def json(self):
-        return {str(key): value for key, value in self.__dict__.items()}
-
-
-# Таблица с книгами
 class BookStorage:
 
-    def __init__(self):
-        self.books: list[BookModel] = []
-        self.index: int = 0
-        self.allowed_filters = {
-            "id__gt": lambda book, value: book.id > value,
-            "id__lt": lambda book, value: book.id < value,
-            "id": lambda book, value: book.id == value,
-            "title": lambda book, value: book.title == value,
-        }
-
-    def where(
-        self,
-        book,
-        **filters
-            ) -> bool:
-        for key, func in self.allowed_filters.items():
-            if key not in filters:
-                continue
-            value = filters.get(key)
-            if not value:
-                continue
-            if not func(book, value):
-                return False
-        return True
+    def __init__(self, backend: BookBackend):
+        self.backend = backend
+
+    def _commit(self) -> None:
+        # Ждём записи журнала на диск (group commit)
+        future = self.backend.commit_future()
+        if future is not None:
+            future.result()
 
     def add_book(self, book: BookModel) -> None:
-        book.id = self.index
-        self.index += 1
-        self.books.append(book)
+        self.backend.add_book(book)
+        self._commit()
 
     def get_books(
         self,
@@ -60,48 +28,68 @@ class BookStorage:
         title: str | None = None,
         id__gt: int | None = None,
         id__lt: int | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
             ) -> list[BookModel]:
-        return [
-            book
-            for book in self.books
-            if self.where(
-                book=book,
-                id=id,
-                title=title,
-                id__gt=id__gt,
-                id__lt=id__lt,
-                )
-        ]
+        return self.backend.get_books(
+            id=id, title=title, id__gt=id__gt, id__lt=id__lt,
+            limit=limit, after=after,
+            title__startswith=title__startswith,
+            title__istartswith=title__istartswith,
+            title__contains=title__contains,
+            title__icontains=title__icontains,
+            )
 
     def get_book(
         self,
         id: int | None = None,
         title: str | None = None
             ) -> BookModel | None:
-        if id is not None:
-            for book in self.books:
-                if book.id == id:
-                    return book
-            return None
-        if title is not None:
-            for book in self.books:
-                if book.title == title:
-                    return book
-            return None
+        return self.backend.get_book(id=id, title=title)
+
+    def get_books_by_ids(self, book_ids: list[int]) -> list[BookModel | None]:
+        return self.backend.get_books_by_ids(book_ids)
 
     def delete_book(self, book_id: int) -> bool:
-        for book in self.books:
-            if book.id == book_id:
-                self.books.remove(book)
-                return True
-        return False
+        success = self.backend.delete_book(book_id)
+        self._commit()
+        return success
 
     def update_book(self, book_id: int, title: str) -> BookModel | None:
-        for book in self.books:
-            if book.id == book_id:
-                book.title = title
-                return book
-        return None
+        book = self.backend.update_book(book_id, title)
+        self._commit()
+        return book
+
+    def add_books(self, books: list[BookModel]) -> None:
+        self.backend.add_books(books)
+        self._commit()
+
+    def update_books(
+        self,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        books = self.backend.update_books(updates)
+        self._commit()
+        return books
+
+    def delete_books(self, book_ids: list[int]) -> list[bool]:
+        success = self.backend.delete_books(book_ids)
+        self._commit()
+        return success
+
+    def apply_batch(
+        self,
+        books: list[BookModel],
+        updates: list[tuple[int, str]],
+        book_ids: list[int],
+            ) -> tuple[list[BookModel | None], list[bool]]:
+        result = self.backend.apply_batch(books, updates, book_ids)
+        self._commit()
+        return result
 
 
-book_storage = BookStorage()
+book_storage = BookStorage(book_table)
@@ -0,0 +1,316 @@
+# Бэкенд хранилища книг на SQLite.
+# Данные переживают перезапуск и могут не помещаться в память.
+# Вызовы блокирующие: асинхронный фасад выполняет их в пуле потоков
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from queue import Queue
+
+from app.core.search import MAX_CHAR
+from app.core.storage import ADD, UPDATE, DELETE, BookModel, decode_cursor
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS books_title ON books (title)",
+    # Индекс по названию в нижнем регистре для title__istartswith.
+    # casefold регистрируется в каждом соединении (см. _connect)
+    "CREATE INDEX IF NOT EXISTS books_title_folded ON books (casefold(title))",
+)
+# Триграммный полнотекстовый индекс для поиска подстроки.
+# Поддерживается триггерами при каждом изменении books
+SEARCH_SCHEMA = (
+    """CREATE VIRTUAL TABLE books_search USING fts5(
+        title, content='books', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER books_search_insert AFTER INSERT ON books BEGIN
+        INSERT INTO books_search (rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER books_search_delete AFTER DELETE ON books BEGIN
+        INSERT INTO books_search (books_search, rowid, title)
+        VALUES ('delete', old.id, old.title);
+    END""",
+    """CREATE TRIGGER books_search_update AFTER UPDATE ON books BEGIN
+        INSERT INTO books_search (books_search, rowid, title)
+        VALUES ('delete', old.id, old.title);
+        INSERT INTO books_search (rowid, title) VALUES (new.id, new.title);
+    END""",
+    # Индексируем книги, сохранённые до появления поиска
+    "INSERT INTO books_search (books_search) VALUES ('rebuild')",
+)
+SEARCH_MATCH = (
+    "id IN (SELECT rowid FROM books_search WHERE books_search MATCH ?)"
+)
+
+# Запросы - постоянные строки: sqlite3 кеширует подготовленные
+# выражения каждого соединения по тексту запроса
+INSERT_BOOK = "INSERT INTO books (title) VALUES (?)"
+UPDATE_BOOK = "UPDATE books SET title = ? WHERE id = ?"
+DELETE_BOOK = "DELETE FROM books WHERE id = ? RETURNING title"
+SELECT_BY_ID = "SELECT id, title FROM books WHERE id = ?"
+SELECT_BY_TITLE = (
+    "SELECT id, title FROM books WHERE title = ? ORDER BY id LIMIT 1"
+)
+# Список id передаётся одним параметром (JSON массив): текст запроса
+# не зависит от числа id, и лимит параметров SQLite не мешает
+SELECT_BY_IDS = (
+    "SELECT id, title FROM books "
+    "WHERE id IN (SELECT value FROM json_each(?))"
+)
+
+
+class SQLiteBookTable:
+    blocking = True
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        # Изменения сериализуем сами: SQLite допускает одного писателя
+        self.lock = threading.Lock()
+        self.listeners: list = []
+        self.pool: Queue[sqlite3.Connection] = Queue()
+        for _ in range(pool_size):
+            self.pool.put(self._connect())
+        with self._connection() as connection, connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'books_search'"
+                ).fetchone()
+            if not exists:
+                for statement in SEARCH_SCHEMA:
+                    connection.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=128,
+        )
+        connection.create_function(
+            "casefold", 1, str.casefold, deterministic=True
+            )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        """Берём соединение из пула и возвращаем после использования"""
+        connection = self.pool.get()
+        try:
+            yield connection
+        finally:
+            self.pool.put(connection)
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция изменения под блокировкой записи.
+        Изменения, добавленные в список changes, передаются
+        подписчикам после фиксации транзакции"""
+        changes = []
+        with self.lock:
+            with self._connection() as connection, connection:
+                yield connection, changes
+            for change in changes:
+                for listener in self.listeners:
+                    listener(*change)
+
+    @staticmethod
+    def _book(row) -> BookModel | None:
+        return BookModel(title=row[1], id=row[0]) if row else None
+
+    def add_book(self, book: BookModel) -> None:
+        with self._transaction() as (connection, changes):
+            cursor = connection.execute(INSERT_BOOK, (book.title,))
+            book.id = cursor.lastrowid
+            changes.append((ADD, book.id, book.title, None))
+
+    def get_books(
+        self,
+        id: int | None = None,
+        title: str | None = None,
+        id__gt: int | None = None,
+        id__lt: int | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+            ) -> list[BookModel]:
+        # Пустые значения фильтров игнорируются, как и в BookTable
+        filters = [
+            ("id = ?", id),
+            ("title = ?", title),
+            ("id > ?", id__gt),
+            ("id < ?", id__lt),
+        ]
+        clauses = [clause for clause, value in filters if value]
+        params = [value for _, value in filters if value]
+        if after:
+            clauses.append("id > ?")
+            params.append(decode_cursor(after))
+        folded_prefix = title__istartswith and title__istartswith.casefold()
+        folded_text = title__icontains and title__icontains.casefold()
+        # Префикс - диапазон по индексу названия
+        for column, prefix in (
+            ("title", title__startswith),
+            ("casefold(title)", folded_prefix),
+        ):
+            if prefix:
+                clauses.append(
+                    f"{column} >= ? AND {column} < ?"
+                    f" AND substr({column}, 1, ?) = ?"
+                    )
+                params.extend((prefix, prefix + MAX_CHAR, len(prefix), prefix))
+        # Подстрока: кандидаты из триграммного индекса (от 3 символов),
+        # затем точная проверка
+        for column, text in (
+            ("title", title__contains),
+            ("casefold(title)", folded_text),
+        ):
+            if text:
+                if len(text) >= 3:
+                    clauses.append(SEARCH_MATCH)
+                    params.append('"' + text.replace('"', '""') + '"')
+                clauses.append(f"instr({column}, ?) > 0")
+                params.append(text)
+        query = "SELECT id, title FROM books"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connection() as connection:
+            rows = connection.execute(query, params).fetchall()
+        return [BookModel(title=row[1], id=row[0]) for row in rows]
+
+    def get_book(
+        self,
+        id: int | None = None,
+        title: str | None = None
+            ) -> BookModel | None:
+        with self._connection() as connection:
+            if id is not None:
+                return self._book(
+                    connection.execute(SELECT_BY_ID, (id,)).fetchone()
+                    )
+            if title is not None:
+                return self._book(
+                    connection.execute(SELECT_BY_TITLE, (title,)).fetchone()
+                    )
+        return None
+
+    def get_books_by_ids(self, book_ids: list[int]) -> list[BookModel | None]:
+        with self._connection() as connection:
+            rows = dict(connection.execute(
+                SELECT_BY_IDS, (json.dumps(book_ids),)
+                ).fetchall())
+        return [
+            BookModel(title=rows[book_id], id=book_id)
+            if book_id in rows else None
+            for book_id in book_ids
+        ]
+
+    @staticmethod
+    def _update(connection, changes, book_id: int, title: str) -> bool:
+        # Прежнее название нужно подписчикам на изменения
+        row = connection.execute(SELECT_BY_ID, (book_id,)).fetchone()
+        if row is None:
+            return False
+        connection.execute(UPDATE_BOOK, (title, book_id))
+        changes.append((UPDATE, book_id, title, row[1]))
+        return True
+
+    @staticmethod
+    def _delete(connection, changes, book_id: int) -> bool:
+        row = connection.execute(DELETE_BOOK, (book_id,)).fetchone()
+        if row is None:
+            return False
+        changes.append((DELETE, book_id, None, row[0]))
+        return True
+
+    def update_book(self, book_id: int, title: str) -> BookModel | None:
+        with self._transaction() as (connection, changes):
+            updated = self._update(connection, changes, book_id, title)
+        if not updated:
+            return None
+        return BookModel(title=title, id=book_id)
+
+    def delete_book(self, book_id: int) -> bool:
+        with self._transaction() as (connection, changes):
+            return self._delete(connection, changes, book_id)
+
+    # Пакет выполняется одной транзакцией
+
+    def add_books(self, books: list[BookModel]) -> None:
+        with self._transaction() as (connection, changes):
+            self._add_all(connection, changes, books)
+
+    def update_books(
+        self,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        with self._transaction() as (connection, changes):
+            return self._update_all(connection, changes, updates)
+
+    def delete_books(self, book_ids: list[int]) -> list[bool]:
+        with self._transaction() as (connection, changes):
+            return self._delete_all(connection, changes, book_ids)
+
+    def apply_batch(
+        self,
+        books: list[BookModel],
+        updates: list[tuple[int, str]],
+        book_ids: list[int],
+            ) -> tuple[list[BookModel | None], list[bool]]:
+        with self._transaction() as (connection, changes):
+            self._add_all(connection, changes, books)
+            return (
+                self._update_all(connection, changes, updates),
+                self._delete_all(connection, changes, book_ids),
+            )
+
+    # Тела пакетных изменений. Выполняются в транзакции _transaction
+
+    def _add_all(self, connection, changes, books: list[BookModel]) -> None:
+        for book in books:
+            cursor = connection.execute(INSERT_BOOK, (book.title,))
+            book.id = cursor.lastrowid
+            changes.append((ADD, book.id, book.title, None))
+
+    def _update_all(
+        self,
+        connection,
+        changes,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        return [
+            BookModel(title=title, id=book_id)
+            if self._update(connection, changes, book_id, title)
+            else None
+            for book_id, title in updates
+        ]
+
+    def _delete_all(
+        self,
+        connection,
+        changes,
+        book_ids: list[int]
+            ) -> list[bool]:
+        return [
+            self._delete(connection, changes, book_id)
+            for book_id in book_ids
+        ]
+
+    def commit_future(self) -> None:
+        # Каждое изменение фиксируется своей транзакцией
+        return None
+
+    def close(self) -> None:
+        while not self.pool.empty():
+            self.pool.get().close()
@@ -2,11 +2,28 @@
 # По-хорошему, следует использовать БД
 # Но для примера подойдёт и работа со списком
 
-# Модель книги в "БД"
+# Модель книги в "БД".
+# Таблица хранит книги по колонкам, а наружу отдаёт
+# лёгкие представления строк без __dict__
 import asyncio
+import sys
+import threading
+from array import array
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_left, bisect_right, insort
+from functools import partial
+from heapq import merge
+from itertools import islice
+from math import isqrt
+from typing import Iterable, Iterator
+
+from app.core.backend import BookBackend
+from app.core.search import TitleSearchIndex
 
 
 class BookModel:
+    __slots__ = ("id", "title")
+
     def __init__(self, title: str, id: int = 0):
         self.id: int = id
         self.title: str = title
@@ -19,22 +36,87 @@ class BookModel:
 
     @property
     async def json(self):
-        return {str(key): value for key, value in self.__dict__.items()}
+        return {"id": self.id, "title": self.title}
 
 
-# Таблица с книгами
-class BookStorage:
+# Курсор постраничного получения (keyset по id).
+# Для клиента это непрозрачная строка
+def encode_cursor(book_id: int) -> str:
+    return urlsafe_b64encode(f"book:{book_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        prefix, _, book_id = urlsafe_b64decode(cursor).decode().partition(":")
+        if prefix != "book":
+            raise ValueError(cursor)
+        return int(book_id)
+    except ValueError as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+
+
+def next_cursor(books: list[BookModel], limit: int | None) -> str | None:
+    """Курсор следующей страницы, если текущая заполнена целиком"""
+    if limit and len(books) == limit:
+        return encode_cursor(books[-1].id)
+    return None
+
 
-    def __init__(self):
-        self.books: list[BookModel] = []
+# Виды изменений таблицы (см. журнал в app/core/journal.py)
+ADD, UPDATE, DELETE = "add", "update", "delete"
+
+
+# Таблица с книгами.
+# Одна на процесс: её используют и asyncio API (REST, GraphQL, gRPC,
+# Websocket), и SOAP сервер в отдельном потоке
+class BookTable:
+    # Работает в памяти, чтение не блокируется
+    blocking = False
+    # Порог удалённых строк, после которого колонки уплотняются
+    compact_threshold = 1024
+
+    def __init__(self, trigrams: bool = False):
+        # Колонки: отсортированные id (int64) и названия.
+        # Удалённая строка помечается названием None до уплотнения.
+        # Читатели берут кортеж колонок один раз за запрос
+        self.columns: tuple[array, list[str | None]] = (array("q"), [])
+        self.deleted: int = 0
+        # Хеш-индекс: название -> id, либо отсортированный array id,
+        # если книг с таким названием несколько
+        self.titles: dict[str, int | array] = {}
+        # Префиксный (и, если включён, триграммный) индекс
+        # различных названий
+        self.search = TitleSearchIndex(trigrams=trigrams)
         self.index: int = 0
         self.allowed_filters = {
             "id__gt": lambda book, value: book.id > value,
             "id__lt": lambda book, value: book.id < value,
             "id": lambda book, value: book.id == value,
             "title": lambda book, value: book.title == value,
+            "title__startswith": lambda book, value: (
+                book.title.startswith(value)
+            ),
+            "title__istartswith": lambda book, value: (
+                book.title.casefold().startswith(value.casefold())
+            ),
+            "title__contains": lambda book, value: value in book.title,
+            "title__icontains": lambda book, value: (
+                value.casefold() in book.title.casefold()
+            ),
         }
-        self.lock = asyncio.Lock()
+        # Блокировка только для изменений: чтение её не берёт.
+        # Изменения публикуются в таком порядке, чтобы читатель
+        # никогда не увидел id в индексе без самой книги
+        self.lock = threading.Lock()
+        # Журнал изменений (BookJournal), если включена персистентность
+        self.journal = None
+        # Подписчики на изменения (например, ChangeFeed.append).
+        # Вызываются под self.lock в порядке изменений:
+        # listener(op, id, title, old_title)
+        self.listeners: list = []
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) - self.deleted
 
     def where(
         self,
@@ -51,64 +133,628 @@ class BookStorage:
                 return False
         return True
 
-    async def add_book(self, book: BookModel) -> None:
-        async with self.lock:
+    def _index_title(self, title: str, book_id: int) -> None:
+        ids = self.titles.get(title)
+        if ids is None:
+            self.titles[title] = book_id
+            self.search.add(title)
+        elif isinstance(ids, int):
+            self.titles[title] = array("q", sorted((ids, book_id)))
+        else:
+            insort(ids, book_id)
+
+    def _unindex_title(self, title: str, book_id: int) -> None:
+        ids = self.titles.get(title)
+        if ids is None:
+            return
+        if isinstance(ids, int):
+            if ids == book_id:
+                del self.titles[title]
+                self.search.remove(title)
+            return
+        position = bisect_left(ids, book_id)
+        if position < len(ids) and ids[position] == book_id:
+            del ids[position]
+        if len(ids) == 1:
+            self.titles[title] = ids[0]
+
+    def _title_ids(self, title: str) -> list[int]:
+        ids = self.titles.get(title)
+        if ids is None:
+            return []
+        if isinstance(ids, int):
+            return [ids]
+        return list(ids)
+
+    def _search_ids(
+        self,
+        after_id: int | None,
+        limit: int | None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+            ) -> Iterable[int] | None:
+        """id книг больше after_id по поисковому фильтру названия,
+        по возрастанию; с limit - лениво. None, если поисковых фильтров
+        нет или перебрать колонки дешевле, чем индекс"""
+        if not (
+            title__startswith or title__istartswith
+            or title__contains or title__icontains
+        ):
+            return None
+        # При m подходящих названиях из n перебор колонок найдёт limit
+        # книг примерно за limit * n / m строк, а слияние списков id
+        # стоит не меньше m: индекс выгоднее, пока m * m <= limit * n
+        max_count = isqrt(limit * len(self.titles)) if limit else None
+        if title__startswith:
+            titles = self.search.startswith(title__startswith, max_count)
+        elif title__istartswith:
+            titles = self.search.istartswith(title__istartswith, max_count)
+        elif title__contains:
+            titles = self.search.contains(title__contains)
+        else:
+            titles = self.search.contains(title__icontains, ignore_case=True)
+        if titles is None:
+            return None
+        start = -1 if after_id is None else after_id
+        id_lists = []
+        for title in titles:
+            ids = self.titles.get(title)
+            if ids is None:
+                continue
+            if isinstance(ids, int):
+                if ids > start:
+                    id_lists.append((ids,))
+                continue
+            # Срез - копия: array может меняться в другом потоке
+            id_lists.append(ids[bisect_right(ids, start):])
+        if limit is None:
+            return sorted({
+                book_id for ids in id_lists for book_id in ids
+            })
+        return self._unique(merge(*id_lists))
+
+    @staticmethod
+    def _title_matcher(
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+            ):
+        """Проверка названия по всем поисковым фильтрам для перебора
+        колонок. None, если поисковых фильтров нет"""
+        checks = []
+        if title__startswith:
+            checks.append(lambda title: title.startswith(title__startswith))
+        if title__istartswith:
+            prefix = title__istartswith.casefold()
+            checks.append(lambda title: title.casefold().startswith(prefix))
+        if title__contains:
+            checks.append(lambda title: title__contains in title)
+        if title__icontains:
+            text = title__icontains.casefold()
+            checks.append(lambda title: text in title.casefold())
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        return lambda title: all(check(title) for check in checks)
+
+    @staticmethod
+    def _unique(ids: Iterator[int]) -> Iterator[int]:
+        # Книга, переименованная во время чтения, может попасть в списки
+        # обоих названий
+        previous = None
+        for book_id in ids:
+            if book_id != previous:
+                yield book_id
+            previous = book_id
+
+    @staticmethod
+    def _position(ids: array, book_id: int) -> int | None:
+        position = bisect_left(ids, book_id)
+        if position < len(ids) and ids[position] == book_id:
+            return position
+        return None
+
+    def _row(self, columns, book_id: int) -> BookModel | None:
+        ids, titles = columns
+        position = self._position(ids, book_id)
+        if position is None:
+            return None
+        title = titles[position]
+        if title is None:
+            return None
+        return BookModel(title=title, id=book_id)
+
+    def _compact(self) -> None:
+        """Пересобираем колонки без удалённых строк"""
+        ids, titles = self.columns
+        live = [
+            (book_id, title)
+            for book_id, title in zip(ids, titles)
+            if title is not None
+        ]
+        # Подменяем колонки целиком: читатели старого кортежа
+        # дочитают согласованный снимок
+        self.columns = (
+            array("q", (book_id for book_id, _ in live)),
+            [title for _, title in live],
+        )
+        self.deleted = 0
+
+    # Изменения колонок и индексов. Вызываются под self.lock
+
+    def _insert(self, book_id: int, title: str) -> str:
+        ids, titles = self.columns
+        title = sys.intern(title)
+        # Сначала название, затем id: по id читатель находит позицию.
+        # id выдаются по возрастанию, поэтому колонка остаётся
+        # отсортированной
+        titles.append(title)
+        ids.append(book_id)
+        self._index_title(title, book_id)
+        return title
+
+    def _replace(self, position: int, book_id: int, title: str) -> str:
+        titles = self.columns[1]
+        old_title = titles[position]
+        title = sys.intern(title)
+        if old_title != title:
+            # Новое название индексируем до замены, старое убираем
+            # после: читатель по названию перепроверяет title в where
+            self._index_title(title, book_id)
+            titles[position] = title
+            self._unindex_title(old_title, book_id)
+        return title
+
+    def _remove(self, position: int, book_id: int) -> None:
+        ids, titles = self.columns
+        self._unindex_title(titles[position], book_id)
+        titles[position] = None
+        self.deleted += 1
+        if (
+            self.deleted > self.compact_threshold
+            and self.deleted * 2 > len(ids)
+        ):
+            self._compact()
+
+    def _live_position(self, book_id: int) -> int | None:
+        ids, titles = self.columns
+        position = self._position(ids, book_id)
+        if position is None or titles[position] is None:
+            return None
+        return position
+
+    def _check_journal(self) -> None:
+        # После ошибки записи журнала изменения отклоняются,
+        # пока память не разошлась с диском сильнее
+        if self.journal is not None:
+            self.journal.check()
+
+    def _log(
+        self,
+        op: str,
+        book_id: int,
+        title: str | None = None,
+        old_title: str | None = None,
+            ) -> None:
+        if self.journal is not None:
+            self.journal.append(op, book_id, title)
+        for listener in self.listeners:
+            listener(op, book_id, title, old_title)
+
+    def apply(self, op: str, book_id: int, title: str | None = None) -> None:
+        """Применяет изменение из журнала, не записывая его повторно"""
+        with self.lock:
+            if op == ADD:
+                self._insert(book_id, title)
+                self.index = max(self.index, book_id + 1)
+                return
+            position = self._live_position(book_id)
+            if position is None:
+                return
+            if op == UPDATE:
+                self._replace(position, book_id, title)
+            elif op == DELETE:
+                self._remove(position, book_id)
+
+    def load(self, ids: array, titles: list[str], index: int) -> None:
+        """Заменяет содержимое таблицы снимком без удалённых строк"""
+        with self.lock:
+            # Индексы строятся целиком: id снимка идут по возрастанию,
+            # а поисковый индекс сортирует различные названия один раз
+            title_ids = {}
+            for book_id, title in zip(ids, titles):
+                found = title_ids.get(title)
+                if found is None:
+                    title_ids[title] = book_id
+                elif isinstance(found, int):
+                    title_ids[title] = array("q", (found, book_id))
+                else:
+                    found.append(book_id)
+            self.titles = title_ids
+            self.search = TitleSearchIndex(
+                title_ids, trigrams=self.search.trigrams is not None
+                )
+            self.columns = (ids, titles)
+            self.deleted = 0
+            self.index = index
+
+    def enable_trigrams(self) -> None:
+        """Включает триграммный индекс для title__contains
+        и title__icontains"""
+        with self.lock:
+            if self.search.trigrams is None:
+                self.search = TitleSearchIndex(self.titles, trigrams=True)
+
+    def commit_future(self):
+        """Future, который завершится, когда все уже выполненные
+        изменения будут записаны на диск. None, если ждать нечего"""
+        if self.journal is None:
+            return None
+        return self.journal.commit_future()
+
+    def add_book(self, book: BookModel) -> None:
+        with self.lock:
+            self._check_journal()
             book.id = self.index
             self.index += 1
-            self.books.append(book)
+            book.title = self._insert(book.id, book.title)
+            self._log(ADD, book.id, book.title)
 
-    async def get_books(
+    def get_books(
         self,
         id: int | None = None,
         title: str | None = None,
         id__gt: int | None = None,
         id__lt: int | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
             ) -> list[BookModel]:
-        async with self.lock:
-            return [
+        columns = self.columns
+        after_id = decode_cursor(after) if after else None
+        search = dict(
+            title__startswith=title__startswith,
+            title__istartswith=title__istartswith,
+            title__contains=title__contains,
+            title__icontains=title__icontains,
+        )
+        # Кандидаты берём из самого селективного индекса,
+        # остальные фильтры проверяем только на них.
+        # Книга могла быть удалена параллельно, поэтому _row может
+        # вернуть None
+        if id or title:
+            candidates = [id] if id else self._title_ids(title)
+            if after_id is not None:
+                candidates = candidates[bisect_right(candidates, after_id):]
+        else:
+            candidates = self._search_ids(after_id, limit, **search)
+        if candidates is not None:
+            books = (
                 book
-                for book in self.books
-                if self.where(
+                for book in map(partial(self._row, columns), candidates)
+                if book is not None and self.where(
                     book=book,
                     id=id,
                     title=title,
                     id__gt=id__gt,
                     id__lt=id__lt,
+                    **search,
+                    )
+            )
+            return list(islice(books, limit))
+        ids, titles = columns
+        start = bisect_right(ids, id__gt) if id__gt else 0
+        if after_id is not None:
+            start = max(start, bisect_right(ids, after_id))
+        end = bisect_left(ids, id__lt) if id__lt else len(ids)
+        # Поисковый фильтр без индекса проверяется на каждой строке
+        matches = self._title_matcher(**search)
+        if limit is None and matches is None:
+            return [
+                BookModel(title=book_title, id=book_id)
+                for book_id, book_title in zip(
+                    ids[start:end], titles[start:end]
                     )
+                if book_title is not None
             ]
+        # Иначе идём по позициям, не копируя весь диапазон.
+        # Название читается один раз: параллельное удаление может
+        # заменить его на None между двумя чтениями
+        def rows():
+            for position in range(start, end):
+                book_title = titles[position]
+                if book_title is None:
+                    continue
+                if matches is None or matches(book_title):
+                    yield BookModel(title=book_title, id=ids[position])
 
-    async def get_book(
+        return list(islice(rows(), limit))
+
+    def get_book(
         self,
         id: int | None = None,
         title: str | None = None
             ) -> BookModel | None:
-        async with self.lock:
-            if id is not None:
-                for book in self.books:
-                    if book.id == id:
-                        return book
-                return None
-            if title is not None:
-                for book in self.books:
-                    if book.title == title:
-                        return book
+        columns = self.columns
+        if id is not None:
+            return self._row(columns, id)
+        if title is not None:
+            for book_id in self._title_ids(title):
+                book = self._row(columns, book_id)
+                if book is not None and book.title == title:
+                    return book
+        return None
+
+    def get_books_by_ids(self, book_ids: list[int]) -> list[BookModel | None]:
+        columns = self.columns
+        return [self._row(columns, book_id) for book_id in book_ids]
+
+    def delete_book(self, book_id: int) -> bool:
+        with self.lock:
+            self._check_journal()
+            position = self._live_position(book_id)
+            if position is None:
+                return False
+            old_title = self.columns[1][position]
+            self._remove(position, book_id)
+            self._log(DELETE, book_id, old_title=old_title)
+            return True
+
+    def update_book(self, book_id: int, title: str) -> BookModel | None:
+        with self.lock:
+            self._check_journal()
+            position = self._live_position(book_id)
+            if position is None:
                 return None
+            old_title = self.columns[1][position]
+            title = self._replace(position, book_id, title)
+            self._log(UPDATE, book_id, title, old_title)
+            return BookModel(title=title, id=book_id)
+
+    # Пакетные изменения: весь пакет под одной блокировкой
+
+    def add_books(self, books: list[BookModel]) -> None:
+        with self.lock:
+            self._check_journal()
+            self._add_books(books)
+
+    def update_books(
+        self,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        with self.lock:
+            self._check_journal()
+            return self._update_books(updates)
+
+    def delete_books(self, book_ids: list[int]) -> list[bool]:
+        with self.lock:
+            self._check_journal()
+            return self._delete_books(book_ids)
+
+    def apply_batch(
+        self,
+        books: list[BookModel],
+        updates: list[tuple[int, str]],
+        book_ids: list[int],
+            ) -> tuple[list[BookModel | None], list[bool]]:
+        """Добавление, изменение и удаление одним пакетом: читатели
+        видят его результат сразу целиком, а журнал пишет его одним
+        пакетом на диск"""
+        with self.lock:
+            self._check_journal()
+            self._add_books(books)
+            return self._update_books(updates), self._delete_books(book_ids)
+
+    # Тела пакетных изменений. Вызываются под self.lock
+
+    def _add_books(self, books: list[BookModel]) -> None:
+        for book in books:
+            book.id = self.index
+            self.index += 1
+            book.title = self._insert(book.id, book.title)
+            self._log(ADD, book.id, book.title)
+
+    def _update_books(
+        self,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        result = []
+        for book_id, title in updates:
+            position = self._live_position(book_id)
+            if position is None:
+                result.append(None)
+                continue
+            old_title = self.columns[1][position]
+            title = self._replace(position, book_id, title)
+            self._log(UPDATE, book_id, title, old_title)
+            result.append(BookModel(title=title, id=book_id))
+        return result
+
+    def _delete_books(self, book_ids: list[int]) -> list[bool]:
+        result = []
+        for book_id in book_ids:
+            position = self._live_position(book_id)
+            if position is not None:
+                old_title = self.columns[1][position]
+                self._remove(position, book_id)
+                self._log(DELETE, book_id, old_title=old_title)
+            result.append(position is not None)
+        return result
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+
+
+# Асинхронный фасад над бэкендом для asyncio API.
+# Бэкенд выбирается при старте приложения (см. app/main.py)
+class BookStorage:
+
+    def __init__(self, backend: BookBackend):
+        self.backend = backend
+
+    async def _read(self, method, *args, **kwargs):
+        # Блокирующий бэкенд вызываем в пуле потоков,
+        # чтобы не останавливать event loop
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    async def _write(self, method, *args):
+        # То же для изменений, а также когда блокировку
+        # держит другой поток (SOAP)
+        if self.backend.blocking or self.backend.lock.locked():
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def _commit(self) -> None:
+        # Ждём записи журнала на диск (group commit), не блокируя event loop
+        future = self.backend.commit_future()
+        if future is not None:
+            await asyncio.wrap_future(future)
+
+    async def add_book(self, book: BookModel) -> None:
+        await self._write(self.backend.add_book, book)
+        await self._commit()
+
+    async def get_books(
+        self,
+        id: int | None = None,
+        title: str | None = None,
+        id__gt: int | None = None,
+        id__lt: int | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+            ) -> list[BookModel]:
+        return await self._read(
+            self.backend.get_books,
+            id=id, title=title, id__gt=id__gt, id__lt=id__lt,
+            limit=limit, after=after,
+            title__startswith=title__startswith,
+            title__istartswith=title__istartswith,
+            title__contains=title__contains,
+            title__icontains=title__icontains,
+            )
+
+    async def iter_books(
+        self,
+        id: int | None = None,
+        title: str | None = None,
+        id__gt: int | None = None,
+        id__lt: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+        chunk_size: int = 1000,
+            ):
+        """Ленивая выдача книг порциями по chunk_size.
+        Между порциями управление возвращается event loop"""
+        async for books in self.iter_book_chunks(
+                id=id, title=title, id__gt=id__gt, id__lt=id__lt,
+                after=after, title__startswith=title__startswith,
+                title__istartswith=title__istartswith,
+                title__contains=title__contains,
+                title__icontains=title__icontains,
+                chunk_size=chunk_size):
+            for book in books:
+                yield book
+
+    async def iter_book_chunks(
+        self,
+        id: int | None = None,
+        title: str | None = None,
+        id__gt: int | None = None,
+        id__lt: int | None = None,
+        after: str | None = None,
+        title__startswith: str | None = None,
+        title__istartswith: str | None = None,
+        title__contains: str | None = None,
+        title__icontains: str | None = None,
+        chunk_size: int = 1000,
+            ):
+        """Книги списками по chunk_size (одно чтение бэкенда на список)"""
+        while True:
+            books = await self._read(
+                self.backend.get_books,
+                id=id, title=title, id__gt=id__gt, id__lt=id__lt,
+                limit=chunk_size, after=after,
+                title__startswith=title__startswith,
+                title__istartswith=title__istartswith,
+                title__contains=title__contains,
+                title__icontains=title__icontains,
+                )
+            if books:
+                yield books
+            after = next_cursor(books, chunk_size)
+            if after is None:
+                return
+            await asyncio.sleep(0)
+
+    async def get_book(
+        self,
+        id: int | None = None,
+        title: str | None = None
+            ) -> BookModel | None:
+        return await self._read(self.backend.get_book, id=id, title=title)
+
+    async def get_books_by_ids(
+        self,
+        book_ids: list[int]
+            ) -> list[BookModel | None]:
+        return await self._read(self.backend.get_books_by_ids, book_ids)
 
     async def delete_book(self, book_id: int) -> bool:
-        async with self.lock:
-            for book in self.books:
-                if book.id == book_id:
-                    self.books.remove(book)
-                    return True
-        return False
+        success = await self._write(self.backend.delete_book, book_id)
+        await self._commit()
+        return success
 
     async def update_book(self, book_id: int, title: str) -> BookModel | None:
-        async with self.lock:
-            for book in self.books:
-                if book.id == book_id:
-                    book.title = title
-                    return book
-            return None
+        book = await self._write(self.backend.update_book, book_id, title)
+        await self._commit()
+        return book
+
+    async def add_books(self, books: list[BookModel]) -> None:
+        await self._write(self.backend.add_books, books)
+        await self._commit()
+
+    async def update_books(
+        self,
+        updates: list[tuple[int, str]]
+            ) -> list[BookModel | None]:
+        books = await self._write(self.backend.update_books, updates)
+        await self._commit()
+        return books
+
+    async def delete_books(self, book_ids: list[int]) -> list[bool]:
+        success = await self._write(self.backend.delete_books, book_ids)
+        await self._commit()
+        return success
+
+    async def apply_batch(
+        self,
+        books: list[BookModel],
+        updates: list[tuple[int, str]],
+        book_ids: list[int],
+            ) -> tuple[list[BookModel | None], list[bool]]:
+        result = await self._write(
+            self.backend.apply_batch, books, updates, book_ids
+            )
+        await self._commit()
+        return result
 
 
-book_storage = BookStorage()
+book_table = BookTable()
+book_storage = BookStorage(book_table)
@@ -0,0 +1,308 @@
+# Сервер хранилища книг для нескольких процессов (uvicorn --workers N).
+# Держит единственный бэкенд (memory или sqlite) и выполняет запросы
+# процессов сервера API (RemoteBookTable) по Unix сокету; протокол -
+# см. app/core/remote_storage.py. Изменения рассылаются подписанным
+# клиентам: из них каждый процесс строит свою ленту изменений.
+#
+# Запуск из корня репозитория:
+#   python -m app.core.storage_server /tmp/books-storage.sock
+#   python -m app.core.storage_server /tmp/books-storage.sock \
+#       --backend sqlite --path books.db
+import argparse
+import asyncio
+import os
+
+from app.core.journal import BookJournal
+from app.core.remote_storage import (
+    HEADER, OK, ERROR, EVENT,
+    ADD_BOOK, GET_BOOKS, GET_BOOK, UPDATE_BOOK, DELETE_BOOK,
+    ADD_BOOKS, UPDATE_BOOKS, DELETE_BOOKS, SUBSCRIBE, GET_BOOKS_BY_IDS,
+    APPLY_BATCH, Packer, Unpacker,
+)
+from app.core.sqlite_storage import SQLiteBookTable
+from app.core.storage import BookModel, BookTable
+
+# После изменений ответ ждёт записи журнала на диск
+MUTATIONS = {
+    ADD_BOOK, UPDATE_BOOK, DELETE_BOOK, ADD_BOOKS, UPDATE_BOOKS,
+    DELETE_BOOKS, APPLY_BATCH,
+}
+
+
+def frame(request_id: int, status: int, data: bytes) -> bytes:
+    return HEADER.pack(len(data), request_id, status) + data
+
+
+class Connection(asyncio.Protocol):
+    """Подключение клиента. Все запросы, пришедшие одним чтением
+    из сокета (конвейер), выполняются подряд, а ответы уходят
+    одной записью"""
+
+    def __init__(self, server: "StorageServer"):
+        self.server = server
+        self.transport: asyncio.Transport | None = None
+        self.buffer = bytearray()
+        self.output: list[bytes] = []
+        # Клиент получает события изменений
+        self.subscribed = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections.add(self)
+
+    def connection_lost(self, exc):
+        self.server.connections.discard(self)
+
+    def data_received(self, data: bytes):
+        buffer = self.buffer
+        buffer += data
+        offset = 0
+        while len(buffer) - offset >= HEADER.size:
+            length, request_id, op = HEADER.unpack_from(buffer, offset)
+            end = offset + HEADER.size + length
+            if len(buffer) < end:
+                break
+            self.server.handle(
+                self, request_id, op, bytes(buffer[offset + HEADER.size:end])
+                )
+            offset = end
+        del buffer[:offset]
+        self.flush()
+
+    def send(self, data: bytes):
+        if not self.output:
+            # Ответы, готовые позже (после записи журнала или
+            # в пуле потоков), отправляются в следующем проходе цикла
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.output.append(data)
+
+    def flush(self):
+        if self.output and not self.transport.is_closing():
+            self.transport.writelines(self.output)
+        self.output.clear()
+
+
+class StorageServer:
+
+    def __init__(self, backend, path: str):
+        self.backend = backend
+        self.path = path
+        self.connections: set[Connection] = set()
+        # Номер последнего изменения и последнего разосланного события
+        self.seq = 0
+        self.sent_seq = 0
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.server: asyncio.Server | None = None
+        self.operations = {
+            ADD_BOOK: self._add_book,
+            GET_BOOKS: self._get_books,
+            GET_BOOK: self._get_book,
+            GET_BOOKS_BY_IDS: self._get_books_by_ids,
+            UPDATE_BOOK: self._update_book,
+            DELETE_BOOK: self._delete_book,
+            ADD_BOOKS: self._add_books,
+            UPDATE_BOOKS: self._update_books,
+            DELETE_BOOKS: self._delete_books,
+            APPLY_BATCH: self._apply_batch,
+        }
+        backend.listeners.append(self._changed)
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if os.path.exists(self.path):
+            # Сокет остался от завершившегося сервера
+            os.unlink(self.path)
+        self.server = await self.loop.create_unix_server(
+            lambda: Connection(self), self.path
+            )
+
+    def _changed(self, op, book_id, title=None, old_title=None):
+        # Вызывается под блокировкой записи бэкенда (для sqlite -
+        # в потоке пула): номера событий идут в порядке изменений
+        self.seq += 1
+        data = Packer()
+        data.put_int(self.seq)
+        data.put_str(op)
+        data.put_int(book_id)
+        data.put_optional_str(title)
+        data.put_optional_str(old_title)
+        self.loop.call_soon_threadsafe(
+            self._broadcast, self.seq, frame(0, EVENT, data.buffer)
+            )
+
+    def _broadcast(self, seq: int, event: bytes):
+        self.sent_seq = seq
+        for connection in self.connections:
+            if connection.subscribed:
+                connection.send(event)
+
+    def handle(self, connection: Connection, request_id, op, data: bytes):
+        if op == SUBSCRIBE:
+            # Клиент получит все события после sent_seq
+            connection.subscribed = True
+            result = Packer()
+            result.put_int(self.sent_seq)
+            connection.send(frame(request_id, OK, result.buffer))
+        elif self.backend.blocking:
+            asyncio.create_task(self._respond_blocking(
+                connection, request_id, op, data
+                ))
+        else:
+            status, result = self._execute(op, data)
+            future = None
+            if op in MUTATIONS:
+                future = self.backend.commit_future()
+            if future is None:
+                connection.send(frame(request_id, status, result))
+            else:
+                asyncio.create_task(self._respond_committed(
+                    connection, request_id, status, result, future
+                    ))
+
+    async def _respond_blocking(self, connection, request_id, op, data):
+        status, result = await asyncio.to_thread(self._execute, op, data)
+        connection.send(frame(request_id, status, result))
+
+    @staticmethod
+    async def _respond_committed(
+        connection, request_id, status, result, future
+            ):
+        await asyncio.wrap_future(future)
+        connection.send(frame(request_id, status, result))
+
+    def _execute(self, op: int, data: bytes) -> tuple[int, bytes]:
+        operation = self.operations.get(op)
+        if operation is None:
+            return ERROR, f"Неизвестная операция: {op}".encode()
+        try:
+            return OK, bytes(operation(Unpacker(data)).buffer)
+        except Exception as e:
+            return ERROR, str(e).encode()
+
+    def _add_book(self, data: Unpacker) -> Packer:
+        book = BookModel(title=data.get_str())
+        self.backend.add_book(book)
+        result = Packer()
+        result.put_int(book.id)
+        return result
+
+    def _get_books(self, data: Unpacker) -> Packer:
+        result = Packer()
+        result.put_books(self.backend.get_books(**data.get_filters()))
+        return result
+
+    def _get_book(self, data: Unpacker) -> Packer:
+        result = Packer()
+        result.put_book(self.backend.get_book(**data.get_filters()))
+        return result
+
+    def _get_books_by_ids(self, data: Unpacker) -> Packer:
+        book_ids = [data.get_int() for _ in range(data.get_count())]
+        books = self.backend.get_books_by_ids(book_ids)
+        result = Packer()
+        result.put_count(len(books))
+        for book in books:
+            result.put_book(book)
+        return result
+
+    def _update_book(self, data: Unpacker) -> Packer:
+        book_id = data.get_int()
+        result = Packer()
+        result.put_book(self.backend.update_book(book_id, data.get_str()))
+        return result
+
+    def _delete_book(self, data: Unpacker) -> Packer:
+        result = Packer()
+        result.put_flag(self.backend.delete_book(data.get_int()))
+        return result
+
+    def _add_books(self, data: Unpacker) -> Packer:
+        books = [
+            BookModel(title=data.get_str()) for _ in range(data.get_count())
+        ]
+        self.backend.add_books(books)
+        result = Packer()
+        for book in books:
+            result.put_int(book.id)
+        return result
+
+    def _update_books(self, data: Unpacker) -> Packer:
+        updates = [
+            (data.get_int(), data.get_str())
+            for _ in range(data.get_count())
+        ]
+        books = self.backend.update_books(updates)
+        result = Packer()
+        result.put_count(len(books))
+        for book in books:
+            result.put_book(book)
+        return result
+
+    def _delete_books(self, data: Unpacker) -> Packer:
+        book_ids = [data.get_int() for _ in range(data.get_count())]
+        success = self.backend.delete_books(book_ids)
+        result = Packer()
+        result.put_count(len(success))
+        for deleted in success:
+            result.put_flag(deleted)
+        return result
+
+    def _apply_batch(self, data: Unpacker) -> Packer:
+        books = [
+            BookModel(title=data.get_str()) for _ in range(data.get_count())
+        ]
+        updates = [
+            (data.get_int(), data.get_str())
+            for _ in range(data.get_count())
+        ]
+        book_ids = [data.get_int() for _ in range(data.get_count())]
+        updated, success = self.backend.apply_batch(books, updates, book_ids)
+        result = Packer()
+        for book in books:
+            result.put_int(book.id)
+        result.put_count(len(updated))
+        for book in updated:
+            result.put_book(book)
+        result.put_count(len(success))
+        for deleted in success:
+            result.put_flag(deleted)
+        return result
+
+
+async def serve(args) -> None:
+    if args.backend == "memory":
+        backend = BookTable(trigrams=args.trigrams)
+        if args.journal:
+            BookJournal(args.journal, backend)
+    else:
+        backend = SQLiteBookTable(args.path)
+    server = StorageServer(backend, args.socket)
+    await server.start()
+    print(f"Сервер хранилища ({args.backend}): {args.socket}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        backend.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("socket", help="путь к Unix сокету")
+    parser.add_argument(
+        "--backend", choices=("memory", "sqlite"), default="memory"
+        )
+    parser.add_argument("--path", default="books.db", help="файл SQLite")
+    parser.add_argument("--journal", help="каталог журнала для memory")
+    parser.add_argument(
+        "--trigrams", action="store_true",
+        help="триграммный индекс для поиска подстроки в memory"
+        )
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
-from strawberry.fastapi import GraphQLRouter
+from strawberry.subscriptions import GRAPHQL_TRANSPORT_WS_PROTOCOL
+
+from .loaders import get_context
+from .persisted import PersistedQueryRouter, document_cache
 from .schema import schema
 
 
-router = GraphQLRouter(schema=schema)
+# Подписки (Subscription) - по протоколу graphql-transport-ws
+router = PersistedQueryRouter(
+    schema=schema,
+    context_getter=get_context,
+    cache=document_cache,
+    subscription_protocols=[GRAPHQL_TRANSPORT_WS_PROTOCOL],
+    )
@@ -0,0 +1,16 @@
+# Загрузчики данных GraphQL (DataLoader).
+# Создаются для каждого запроса (см. get_context): все id книг,
+# запрошенные в одной операции (поля book, books(ids) и их псевдонимы),
+# загружаются одним обращением к хранилищу, а кеш не переживает запрос
+from strawberry.dataloader import DataLoader
+
+from app.core.storage import BookModel, book_storage
+
+
+async def load_books(ids: list[int]) -> list[BookModel | None]:
+    return await book_storage.get_books_by_ids(ids)
+
+
+async def get_context() -> dict:
+    """Контекст запроса GraphQL (дополняет request и response)"""
+    return {"book_loader": DataLoader(load_fn=load_books)}
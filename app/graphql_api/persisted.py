@@ -0,0 +1,232 @@
+# Сохранённые запросы GraphQL (automatic persisted queries) и кеш
+# разобранных и проверенных документов.
+#
+# Клиент отправляет sha256 текста запроса в
+# extensions.persistedQuery.sha256Hash. Если запрос уже известен
+# серверу, текст можно не отправлять; иначе сервер отвечает ошибкой
+# PERSISTED_QUERY_NOT_FOUND и клиент повторяет запрос вместе с текстом.
+# Документы, прошедшие валидацию (в том числе ограничения глубины
+# и сложности), хранятся в LRU по хешу: повторный запрос не разбирается
+# и не проверяется заново
+import hashlib
+from collections import OrderedDict
+from collections.abc import Iterator
+
+from fastapi import HTTPException
+from graphql import GraphQLError
+from graphql.language import (
+    DocumentNode, FieldNode, InlineFragmentNode, OperationDefinitionNode,
+    SelectionSetNode,
+)
+from graphql.validation import ValidationContext, ValidationRule
+from strawberry.extensions import AddValidationRules, SchemaExtension
+from strawberry.extensions.utils import is_introspection_key
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLRequestData
+from strawberry.types import ExecutionResult
+
+# Размер кеша документов
+CACHE_SIZE = 1000
+# Максимальная вложенность полей запроса (books { id } - 2)
+MAX_DEPTH = 5
+# Максимальное число полей запроса (с учётом фрагментов и псевдонимов)
+MAX_COMPLEXITY = 200
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def persisted_hash(extensions: dict | None) -> str | None:
+    """sha256 из extensions.persistedQuery запроса"""
+    persisted = (extensions or {}).get("persistedQuery")
+    if not isinstance(persisted, dict):
+        return None
+    value = persisted.get("sha256Hash")
+    return value if isinstance(value, str) else None
+
+
+class DocumentCache:
+    """LRU проверенных документов: хеш -> (текст запроса, документ)"""
+
+    def __init__(self, capacity: int = CACHE_SIZE):
+        self.capacity = capacity
+        self.entries: OrderedDict[str, tuple[str, DocumentNode]] = (
+            OrderedDict()
+            )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> tuple[str, DocumentNode] | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, query: str, document: DocumentNode) -> None:
+        self.entries[key] = (query, document)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class CachedDocuments(SchemaExtension):
+    """Пропускает разбор и валидацию документов из кеша и сохраняет
+    в кеш документы, прошедшие валидацию"""
+
+    def __init__(self, cache: DocumentCache):
+        self.cache = cache
+
+    def on_parse(self) -> Iterator[None]:
+        # Экземпляр расширения общий для всех запросов схемы:
+        # execution_context читается до первой приостановки.
+        # Ключ - хеш текста, а не присланный клиентом: запросы
+        # по websocket не проходят проверку хеша в PersistedQueryRouter
+        context = self.execution_context
+        entry = self.cache.get(query_hash(context.query))
+        if entry is not None:
+            context.graphql_document = entry[1]
+        yield
+
+    def on_validate(self) -> Iterator[None]:
+        context = self.execution_context
+        key = query_hash(context.query)
+        entry = self.cache.entries.get(key)
+        cached = entry is not None and entry[1] is context.graphql_document
+        if cached:
+            # Документ уже проверен: валидация не выполняется
+            context.pre_execution_errors = []
+        yield
+        if not cached and not context.pre_execution_errors:
+            self.cache.put(key, context.query, context.graphql_document)
+
+
+class QueryLimiter(AddValidationRules):
+    """Отклоняет запросы глубже max_depth или с числом полей больше
+    max_complexity. Фрагменты раскрываются, псевдонимы считаются
+    отдельными полями, поля интроспекции не учитываются"""
+
+    def __init__(
+        self,
+        max_depth: int = MAX_DEPTH,
+        max_complexity: int = MAX_COMPLEXITY,
+            ):
+        class LimitRule(ValidationRule):
+            def enter_operation_definition(
+                self,
+                node: OperationDefinitionNode,
+                *args
+                    ):
+                name = node.name.value if node.name else "anonymous"
+                complexity, depth = measure(self.context, node.selection_set)
+                if depth > max_depth:
+                    self.report_error(GraphQLError(
+                        f"'{name}' exceeds maximum operation depth "
+                        f"of {max_depth}",
+                        [node],
+                        extensions={"code": "QUERY_TOO_DEEP"},
+                        ))
+                if complexity > max_complexity:
+                    self.report_error(GraphQLError(
+                        f"'{name}' exceeds maximum operation complexity "
+                        f"of {max_complexity} ({complexity} fields)",
+                        [node],
+                        extensions={"code": "QUERY_TOO_COMPLEX"},
+                        ))
+
+        super().__init__([LimitRule])
+
+
+def measure(
+    context: ValidationContext,
+    selection_set: SelectionSetNode | None,
+    visited: frozenset = frozenset(),
+        ) -> tuple[int, int]:
+    """Число полей и глубина выборки. Циклы фрагментов не раскрываются
+    (их отклоняет правило NoFragmentCycles)"""
+    if selection_set is None:
+        return 0, 0
+    total = depth = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            if is_introspection_key(selection.name.value):
+                continue
+            fields, field_depth = measure(
+                context, selection.selection_set, visited
+                )
+            total += 1 + fields
+            depth = max(depth, 1 + field_depth)
+            continue
+        if isinstance(selection, InlineFragmentNode):
+            fields, fragment_depth = measure(
+                context, selection.selection_set, visited
+                )
+        else:
+            name = selection.name.value
+            fragment = context.get_fragment(name)
+            if fragment is None or name in visited:
+                continue
+            fields, fragment_depth = measure(
+                context, fragment.selection_set, visited | {name}
+                )
+        total += fields
+        depth = max(depth, fragment_depth)
+    return total, depth
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """GraphQLRouter с поддержкой сохранённых запросов: текст запроса
+    по хешу берётся из кеша документов"""
+
+    def __init__(self, *args, cache: DocumentCache, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    def should_render_graphql_ide(self, request) -> bool:
+        # GET по хешу (без query) - запрос, а не открытие GraphiQL
+        return (
+            "extensions" not in request.query_params
+            and super().should_render_graphql_ide(request)
+            )
+
+    async def execute_single(
+        self,
+        request,
+        request_adapter,
+        sub_response,
+        context,
+        root_value,
+        request_data: GraphQLRequestData,
+            ) -> ExecutionResult:
+        key = persisted_hash(request_data.extensions)
+        if key is not None:
+            if request_data.query is None:
+                # Статистику кеша считает CachedDocuments.on_parse
+                entry = self.cache.entries.get(key)
+                if entry is None:
+                    # Клиент повторит запрос с текстом
+                    return ExecutionResult(data=None, errors=[GraphQLError(
+                        "PersistedQueryNotFound",
+                        extensions={"code": "PERSISTED_QUERY_NOT_FOUND"},
+                        )])
+                request_data.query = entry[0]
+            elif query_hash(request_data.query) != key:
+                raise HTTPException(400, "provided sha does not match query")
+        return await super().execute_single(
+            request, request_adapter, sub_response, context, root_value,
+            request_data,
+            )
+
+
+document_cache = DocumentCache()
@@ -1,7 +1,14 @@
+from collections.abc import AsyncGenerator
+from enum import Enum
+
 import strawberry
 
-from app.core.storage import BookModel, book_storage
+from app.core.changes import ChangeEvent
+from app.core.storage import ADD, BookModel, book_storage, encode_cursor
+from app.websocket_api.filters import parse_filters
 from app.websocket_api.manager import manager
+from .persisted import CachedDocuments, QueryLimiter, document_cache
+from .subscriptions import book_events
 
 
 @strawberry.type(  # (декоратор, объявляющий тип ввода)
@@ -17,6 +24,82 @@ class BookType:
     def from_model(cls, model: BookModel):
         return cls(id=strawberry.ID(str(model.id)), title=model.title)
 
+    @strawberry.field(  # (поле с вычисляемым значением)
+        description="Курсор книги для постраничного получения (after)"
+        )
+    def cursor(self) -> str:
+        return encode_cursor(int(self.id))
+
+
+@strawberry.enum(description="Вид изменения книги")
+class ChangeOp(Enum):
+    ADD = "add"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+@strawberry.type(
+    description="""Изменение книги
+    - seq: int - Номер события (возрастает)
+    - op: ChangeOp - Вид изменения
+    - id: strawberry.ID - Идентификатор книги
+    - title: str | None - Название (кроме удаления)
+    - oldTitle: str | None - Прежнее название (обновление и удаление)"""
+    )
+class BookChangeType:
+    seq: int
+    op: ChangeOp
+    id: strawberry.ID
+    title: str | None
+    old_title: str | None
+
+    @classmethod
+    def from_event(cls, event: ChangeEvent):
+        seq, op, book_id, title, old_title = event
+        return cls(
+            seq=seq,
+            op=ChangeOp(op),
+            id=strawberry.ID(str(book_id)),
+            title=title,
+            old_title=old_title,
+            )
+
+
+def parse_id(value: strawberry.ID) -> int:
+    """id книги из аргумента запроса. ID в GraphQL - строка,
+    а хранилище ищет по целым id"""
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Некорректный id книги: {value}") from None
+
+
+def book_from_event(event: ChangeEvent) -> BookType:
+    return BookType(id=strawberry.ID(str(event[2])), title=event[3])
+
+
+@strawberry.input(
+    description="""Фильтр изменений книг (все условия одновременно;
+    условия на название проверяются и по прежнему названию)
+    - id: int | None - Идентификатор книги
+    - idGt: int | None - Идентификатор больше указанного
+    - idLt: int | None - Идентификатор меньше указанного
+    - title: str | None - Название книги
+    - titleStartswith: str | None - Название начинается с
+    - titleIstartswith: str | None - То же без учёта регистра
+    - titleContains: str | None - Название содержит
+    - titleIcontains: str | None - То же без учёта регистра"""
+    )
+class BookChangeFilter:
+    id: int | None = None
+    id_gt: int | None = None
+    id_lt: int | None = None
+    title: str | None = None
+    title_startswith: str | None = None
+    title_istartswith: str | None = None
+    title_contains: str | None = None
+    title_icontains: str | None = None
+
 
 @strawberry.input(  # (декоратор, объявляющий тип ввода)
     description="""Данные для создания книги
@@ -36,11 +119,47 @@ class BookUpdateInput:
 
 @strawberry.type  # (декоратор, объявляющий тип)
 class Query:
+    @strawberry.field(
+        description="""Получить книгу по ID
+        - id: strawberry.ID - Идентификатор книги
+        """
+        )
+    @manager.notify(
+        "[INFO] GraphQL: Получение книги",
+        "book_updates"
+        )  # См. Websocket API
+    @manager.notify(
+        """[INFO] GraphQL: Получение книги:
+            function: {func_name},
+            id: {id},
+            return: {result},
+            error: {error}
+        """,
+        "admin_notifications"
+        )  # См. Websocket API
+    async def book(
+        self,
+        info: strawberry.Info,
+        id: strawberry.ID
+            ) -> BookType | None:
+        # Все книги операции загружаются одним запросом (см. loaders.py)
+        book = await info.context["book_loader"].load(parse_id(id))
+        return BookType.from_model(book) if book else None
+
     @strawberry.field(  # (декоратор, объявляющий поле)
         description="""Получить книги по фильтрам:
+        - ids: list[strawberry.ID] | None - Идентификаторы книг
+          (без других фильтров; отсутствующие книги пропускаются)
         - id: strawberry.ID | None - Идентификатор книги
         - title: str | None - Название книги
         - idGt: int | None - Идентификатор больше указанного
+        - idLt: int | None - Идентификатор меньше указанного
+        - limit: int | None - Максимальное количество книг
+        - after: str | None - Курсор книги, после которой продолжить
+        - titleStartswith: str | None - Название начинается с
+        - titleIstartswith: str | None - То же без учёта регистра
+        - titleContains: str | None - Название содержит
+        - titleIcontains: str | None - То же без учёта регистра
         """
         )
     @manager.notify(
@@ -50,10 +169,17 @@ class Query:
     @manager.notify(
         """[INFO] GraphQL: Получение списка всех книг:
             function: {func_name},
+            ids: {ids},
             id: {id},
             title: {title},
             idLt: {id_lt},
             idGt: {id_gt},
+            limit: {limit},
+            after: {after},
+            titleStartswith: {title_startswith},
+            titleIstartswith: {title_istartswith},
+            titleContains: {title_contains},
+            titleIcontains: {title_icontains},
             return: {result},
             error: {error}
         """,
@@ -61,17 +187,40 @@ class Query:
         )  # См. Websocket API
     async def books(
         self,
+        info: strawberry.Info,
+        ids: list[strawberry.ID] | None = None,
         id: strawberry.ID | None = None,
         title: str | None = None,
         id_gt: int | None = None,
-        id_lt: int | None = None
+        id_lt: int | None = None,
+        limit: int | None = None,
+        after: str | None = None,
+        title_startswith: str | None = None,
+        title_istartswith: str | None = None,
+        title_contains: str | None = None,
+        title_icontains: str | None = None
             ) -> list[BookType]:
+        if limit is not None and limit < 1:
+            raise ValueError("limit должен быть не меньше 1")
         filters = {
-            "id": id,
+            "id": parse_id(id) if id is not None else None,
             "title": title,
             "id__gt": id_gt,
-            "id__lt": id_lt
+            "id__lt": id_lt,
+            "limit": limit,
+            "after": after,
+            "title__startswith": title_startswith,
+            "title__istartswith": title_istartswith,
+            "title__contains": title_contains,
+            "title__icontains": title_icontains
         }
+        if ids is not None:
+            if any(value is not None for value in filters.values()):
+                raise ValueError("ids нельзя сочетать с другими фильтрами")
+            books = await info.context["book_loader"].load_many(
+                [parse_id(value) for value in ids]
+                )
+            return [BookType.from_model(book) for book in books if book]
         return [
             BookType(id=book.id, title=book.title)
             for book in await book_storage.get_books(**filters)
@@ -102,9 +251,15 @@ class Mutation:
         """,
         "admin_notifications"
         )  # См. Websocket API
-    async def add_book(self, input: BookCreateInput) -> BookType:
+    async def add_book(
+        self,
+        info: strawberry.Info,
+        input: BookCreateInput
+            ) -> BookType:
         book = BookModel(title=input.title)
         await book_storage.add_book(book)
+        # Книга уже известна: поля book и books(ids) её не загружают
+        info.context["book_loader"].prime(book.id, book)
         return BookType.from_model(book)
 
     @strawberry.mutation(
@@ -132,10 +287,12 @@ class Mutation:
         )  # См. Websocket API
     async def update_book(
         self,
+        info: strawberry.Info,
         id: strawberry.ID,
         input: BookUpdateInput
     ) -> BookType | None:
-        book = await book_storage.update_book(int(id), input.title)
+        book = await book_storage.update_book(parse_id(id), input.title)
+        info.context["book_loader"].prime(parse_id(id), book, force=True)
         return BookType.from_model(book) if book else None
 
     @strawberry.mutation(
@@ -156,8 +313,118 @@ class Mutation:
         """,
         "admin_notifications"
         )  # См. Websocket API
-    async def delete_book(self, id: int) -> bool:
-        return await book_storage.delete_book(int(id))
+    async def delete_book(self, info: strawberry.Info, id: int) -> bool:
+        success = await book_storage.delete_book(int(id))
+        info.context["book_loader"].prime(int(id), None, force=True)
+        return success
+
+    @strawberry.mutation(
+        description="""Создать несколько книг одним пакетом
+        - input: list[BookCreateInput] - Данные для создания
+        """
+        )
+    @manager.notify(
+        "[INFO] GraphQL: Пакетное создание книг",
+        "book_updates"
+        )  # См. Websocket API
+    @manager.notify(
+        """[INFO] GraphQL: Пакетное создание книг:
+            function: {func_name},
+            input: {input},
+            return: {result},
+            error: {error}
+        """,
+        "admin_notifications"
+        )  # См. Websocket API
+    async def add_books(
+        self,
+        info: strawberry.Info,
+        input: list[BookCreateInput]
+            ) -> list[BookType]:
+        books = [BookModel(title=book.title) for book in input]
+        await book_storage.add_books(books)
+        loader = info.context["book_loader"]
+        for book in books:
+            loader.prime(book.id, book)
+        return [BookType.from_model(book) for book in books]
 
+    @strawberry.mutation(
+        description="""Удалить несколько книг одним пакетом
+        - ids: list[ID] - Идентификаторы книг
+        """
+        )
+    @manager.notify(
+        "[INFO] GraphQL: Пакетное удаление книг",
+        "book_updates"
+        )  # См. Websocket API
+    @manager.notify(
+        """[INFO] GraphQL: Пакетное удаление книг:
+            function: {func_name},
+            ids: {ids},
+            return: {result},
+            error: {error}
+        """,
+        "admin_notifications"
+        )  # См. Websocket API
+    async def delete_books(
+        self,
+        info: strawberry.Info,
+        ids: list[strawberry.ID]
+            ) -> list[bool]:
+        book_ids = [parse_id(id) for id in ids]
+        success = await book_storage.delete_books(book_ids)
+        loader = info.context["book_loader"]
+        for book_id in book_ids:
+            loader.prime(book_id, None, force=True)
+        return success
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+
+@strawberry.type
+class Subscription:
+    @strawberry.subscription(
+        description="""Изменения книг (добавление, обновление, удаление)
+        - filter: BookChangeFilter | None - Только подходящие изменения
+        """
+        )
+    async def book_changed(
+        self,
+        filter: BookChangeFilter | None = None
+            ) -> AsyncGenerator[BookChangeType, None]:
+        filters = []
+        if filter is not None:
+            filters = parse_filters({
+                "id": filter.id,
+                "id__gt": filter.id_gt,
+                "id__lt": filter.id_lt,
+                "title": filter.title,
+                "title__startswith": filter.title_startswith,
+                "title__istartswith": filter.title_istartswith,
+                "title__contains": filter.title_contains,
+                "title__icontains": filter.title_icontains,
+            })
+        # Событие преобразуется один раз для всех подписчиков
+        with book_events.subscribe(
+                filters, BookChangeType.from_event) as subscriber:
+            while True:
+                yield await subscriber.get()
+
+    @strawberry.subscription(
+        description="""Добавленные книги. Книги, добавленные пакетом
+        (или пока клиент получал предыдущие), приходят одним списком
+        """
+        )
+    async def books_added(self) -> AsyncGenerator[list[BookType], None]:
+        with book_events.subscribe(
+                [], book_from_event, ops={ADD}) as subscriber:
+            while True:
+                yield await subscriber.get_many()
+
+
+# Ограничения глубины и сложности - правило валидации: запрос
+# отклоняется до выполнения, а документ из кеша его уже прошёл
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    subscription=Subscription,
+    extensions=[CachedDocuments(document_cache), QueryLimiter()],
+    )
@@ -0,0 +1,121 @@
+# Подписки GraphQL на изменения книг.
+# Источник - лента изменений (app/core/changes.py): в неё попадает
+# каждое изменение бэкенда хранилища, при BOOK_STORAGE=remote - всех
+# процессов сервера. BookEvents раздаёт события подписчикам:
+#   - фильтры подписчиков индексированы (SubscriptionIndex), поэтому
+#     событие проверяется только против подходящих фильтров;
+#   - событие преобразуется в объект ответа один раз для всех
+#     подписчиков с одним преобразованием (convert), а не в каждом;
+#   - у каждого подписчика своя ограниченная очередь. Подписчик,
+#     не успевающий читать, получает ошибку, и подписка завершается
+import asyncio
+from contextlib import contextmanager
+
+from graphql import GraphQLError
+
+from app.core.changes import ChangeEvent, change_feed
+from app.websocket_api.filters import SubscriptionIndex
+
+# Размер очереди каждого подписчика
+QUEUE_SIZE = 1000
+# Метка переполнения очереди
+OVERFLOW = object()
+
+
+class Subscriber:
+
+    def __init__(self, start: int, convert, ops: set | None):
+        # События до start (включительно) подписчик не получает
+        self.start = start
+        self.convert = convert
+        # Виды изменений (add, update, delete); None - все
+        self.ops = ops
+        self.queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+
+    async def get(self):
+        item = await self.queue.get()
+        if item is OVERFLOW:
+            raise GraphQLError(
+                "Подписчик не успевает получать события",
+                extensions={"code": "SUBSCRIBER_TOO_SLOW"},
+                )
+        return item
+
+    async def get_many(self) -> list:
+        """Все накопившиеся события (не меньше одного)"""
+        items = [await self.get()]
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is OVERFLOW:
+                self.queue.put_nowait(item)
+                break
+            items.append(item)
+        return items
+
+
+class BookEvents:
+
+    def __init__(self):
+        self.subscriptions = SubscriptionIndex()
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def publish(self, event: ChangeEvent):
+        """Подписчик ленты изменений. Вызывается в потоке изменения
+        под блокировкой бэкенда, поэтому только передаёт событие
+        в цикл событий"""
+        loop = self.loop
+        if loop is None or not self.has_subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._broadcast, event)
+        except RuntimeError:
+            # Цикл событий уже закрыт (остановка приложения)
+            pass
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self.subscriptions.everyone or self.subscriptions.filters)
+
+    def _broadcast(self, event: ChangeEvent):
+        seq, op = event[0], event[1]
+        items = {}
+        for subscriber in self.subscriptions.match(event):
+            if seq <= subscriber.start:
+                continue
+            if subscriber.ops is not None and op not in subscriber.ops:
+                continue
+            item = items.get(subscriber.convert)
+            if item is None:
+                item = items[subscriber.convert] = subscriber.convert(event)
+            try:
+                subscriber.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self._overflow(subscriber)
+
+    def _overflow(self, subscriber: Subscriber):
+        # Накопленные события не нужны: подписка завершится ошибкой
+        self.subscriptions.remove(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(OVERFLOW)
+
+    @contextmanager
+    def subscribe(
+        self,
+        filters: list[dict],
+        convert,
+        ops: set | None = None,
+            ):
+        """Подписчик на события после текущего. filters - как
+        в SubscriptionIndex (пустой список - все события), convert(event)
+        - объект, который получит подписчик"""
+        self.loop = asyncio.get_running_loop()
+        subscriber = Subscriber(change_feed.seq, convert, ops)
+        self.subscriptions.set(subscriber, filters)
+        try:
+            yield subscriber
+        finally:
+            self.subscriptions.remove(subscriber)
+
+
+book_events = BookEvents()
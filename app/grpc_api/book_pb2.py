@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nbook.proto\x12\x04\x62ook\"!\n\x04\x42ook\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\"~\n\nBookFilter\x12\x12\n\x05title\x18\x01 \x01(\tH\x00\x88\x01\x01\x12\x0f\n\x02id\x18\x02 \x01(\x05H\x01\x88\x01\x01\x12\x12\n\x05id_lt\x18\x03 \x01(\x05H\x02\x88\x01\x01\x12\x12\n\x05id_gt\x18\x04 \x01(\x05H\x03\x88\x01\x01\x42\x08\n\x06_titleB\x05\n\x03_idB\x08\n\x06_id_ltB\x08\n\x06_id_gt\"*\n\rBooksResponse\x12\x19\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\n.book.Book\"\x1e\n\rCreateRequest\x12\r\n\x05title\x18\x01 \x01(\t\"*\n\rUpdateRequest\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\"\x1b\n\rDeleteRequest\x12\n\n\x02id\x18\x01 \x01(\x05\"!\n\x0e\x44\x65leteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x32\xd7\x01\n\x0b\x42ookService\x12\x31\n\x08GetBooks\x12\x10.book.BookFilter\x1a\x13.book.BooksResponse\x12-\n\nCreateBook\x12\x13.book.CreateRequest\x1a\n.book.Book\x12-\n\nUpdateBook\x12\x13.book.UpdateRequest\x1a\n.book.Book\x12\x37\n\nDeleteBook\x12\x13.book.DeleteRequest\x1a\x14.book.DeleteResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nbook.proto\x12\x04\x62ook\"!\n\x04\x42ook\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\"\xae\x03\n\nBookFilter\x12\x12\n\x05title\x18\x01 \x01(\tH\x00\x88\x01\x01\x12\x0f\n\x02id\x18\x02 \x01(\x05H\x01\x88\x01\x01\x12\x12\n\x05id_lt\x18\x03 \x01(\x05H\x02\x88\x01\x01\x12\x12\n\x05id_gt\x18\x04 \x01(\x05H\x03\x88\x01\x01\x12\x12\n\x05limit\x18\x05 \x01(\x05H\x04\x88\x01\x01\x12\x12\n\x05\x61\x66ter\x18\x06 \x01(\tH\x05\x88\x01\x01\x12\x1d\n\x10title_startswith\x18\x07 \x01(\tH\x06\x88\x01\x01\x12\x1e\n\x11title_istartswith\x18\x08 \x01(\tH\x07\x88\x01\x01\x12\x1b\n\x0etitle_contains\x18\t \x01(\tH\x08\x88\x01\x01\x12\x1c\n\x0ftitle_icontains\x18\n \x01(\tH\t\x88\x01\x01\x12\x17\n\nchunk_size\x18\x0b \x01(\x05H\n\x88\x01\x01\x42\x08\n\x06_titleB\x05\n\x03_idB\x08\n\x06_id_ltB\x08\n\x06_id_gtB\x08\n\x06_limitB\x08\n\x06_afterB\x13\n\x11_title_startswithB\x14\n\x12_title_istartswithB\x11\n\x0f_title_containsB\x12\n\x10_title_icontainsB\r\n\x0b_chunk_size\"?\n\rBooksResponse\x12\x19\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\n.book.Book\x12\x13\n\x0bnext_cursor\x18\x02 \x01(\t\"\x1e\n\rCreateRequest\x12\r\n\x05title\x18\x01 \x01(\t\"*\n\rUpdateRequest\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\"\x1b\n\rDeleteRequest\x12\n\n\x02id\x18\x01 \x01(\x05\"!\n\x0e\x44\x65leteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"\xa1\x01\n\x0bSyncCommand\x12\x12\n\nrequest_id\x18\x01 \x01(\x03\x12%\n\x06\x63reate\x18\x02 \x01(\x0b\x32\x13.book.CreateRequestH\x00\x12%\n\x06update\x18\x03 \x01(\x0b\x32\x13.book.UpdateRequestH\x00\x12%\n\x06\x64\x65lete\x18\x04 \x01(\x0b\x32\x13.book.DeleteRequestH\x00\x42\t\n\x07\x63ommand\"\x80\x01\n\nSyncResult\x12\x12\n\nrequest_id\x18\x01 \x01(\x03\x12\x1a\n\x04\x62ook\x18\x02 \x01(\x0b\x32\n.book.BookH\x00\x12\'\n\x07\x64\x65leted\x18\x03 \x01(\x0b\x32\x14.book.DeleteResponseH\x00\x12\x0f\n\x05\x65rror\x18\x04 \x01(\tH\x00\x42\x08\n\x06result2\xfe\x02\n\x0b\x42ookService\x12\x31\n\x08GetBooks\x12\x10.book.BookFilter\x1a\x13.book.BooksResponse\x12-\n\nCreateBook\x12\x13.book.CreateRequest\x1a\n.book.Book\x12-\n\nUpdateBook\x12\x13.book.UpdateRequest\x1a\n.book.Book\x12\x37\n\nDeleteBook\x12\x13.book.DeleteRequest\x1a\x14.book.DeleteResponse\x12\x38\n\nBulkCreate\x12\x13.book.CreateRequest\x1a\x13.book.BooksResponse(\x01\x12\x36\n\x0bStreamBooks\x12\x10.book.BookFilter\x1a\x13.book.BooksResponse0\x01\x12\x33\n\x08\x42ookSync\x12\x11.book.SyncCommand\x1a\x10.book.SyncResult(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,18 +33,22 @@ if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_BOOK']._serialized_start=20
   _globals['_BOOK']._serialized_end=53
-  _globals['_BOOKFILTER']._serialized_start=55
-  _globals['_BOOKFILTER']._serialized_end=181
-  _globals['_BOOKSRESPONSE']._serialized_start=183
-  _globals['_BOOKSRESPONSE']._serialized_end=225
-  _globals['_CREATEREQUEST']._serialized_start=227
-  _globals['_CREATEREQUEST']._serialized_end=257
-  _globals['_UPDATEREQUEST']._serialized_start=259
-  _globals['_UPDATEREQUEST']._serialized_end=301
-  _globals['_DELETEREQUEST']._serialized_start=303
-  _globals['_DELETEREQUEST']._serialized_end=330
-  _globals['_DELETERESPONSE']._serialized_start=332
-  _globals['_DELETERESPONSE']._serialized_end=365
-  _globals['_BOOKSERVICE']._serialized_start=368
-  _globals['_BOOKSERVICE']._serialized_end=583
+  _globals['_BOOKFILTER']._serialized_start=56
+  _globals['_BOOKFILTER']._serialized_end=486
+  _globals['_BOOKSRESPONSE']._serialized_start=488
+  _globals['_BOOKSRESPONSE']._serialized_end=551
+  _globals['_CREATEREQUEST']._serialized_start=553
+  _globals['_CREATEREQUEST']._serialized_end=583
+  _globals['_UPDATEREQUEST']._serialized_start=585
+  _globals['_UPDATEREQUEST']._serialized_end=627
+  _globals['_DELETEREQUEST']._serialized_start=629
+  _globals['_DELETEREQUEST']._serialized_end=656
+  _globals['_DELETERESPONSE']._serialized_start=658
+  _globals['_DELETERESPONSE']._serialized_end=691
+  _globals['_SYNCCOMMAND']._serialized_start=694
+  _globals['_SYNCCOMMAND']._serialized_end=855
+  _globals['_SYNCRESULT']._serialized_start=858
+  _globals['_SYNCRESULT']._serialized_end=986
+  _globals['_BOOKSERVICE']._serialized_start=989
+  _globals['_BOOKSERVICE']._serialized_end=1371
 # @@protoc_insertion_point(module_scope)
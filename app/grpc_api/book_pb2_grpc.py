@@ -54,6 +54,21 @@ class BookServiceStub(object):
                 request_serializer=book__pb2.DeleteRequest.SerializeToString,
                 response_deserializer=book__pb2.DeleteResponse.FromString,
                 _registered_method=True)
+        self.BulkCreate = channel.stream_unary(
+                '/book.BookService/BulkCreate',
+                request_serializer=book__pb2.CreateRequest.SerializeToString,
+                response_deserializer=book__pb2.BooksResponse.FromString,
+                _registered_method=True)
+        self.StreamBooks = channel.unary_stream(
+                '/book.BookService/StreamBooks',
+                request_serializer=book__pb2.BookFilter.SerializeToString,
+                response_deserializer=book__pb2.BooksResponse.FromString,
+                _registered_method=True)
+        self.BookSync = channel.stream_stream(
+                '/book.BookService/BookSync',
+                request_serializer=book__pb2.SyncCommand.SerializeToString,
+                response_deserializer=book__pb2.SyncResult.FromString,
+                _registered_method=True)
 
 
 class BookServiceServicer(object):
@@ -83,6 +98,28 @@ class BookServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BulkCreate(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamBooks(self, request, context):
+        """Книги по фильтру порциями по chunk_size, без ограничения
+        размера ответа; next_cursor порции - курсор её последней книги
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BookSync(self, request_iterator, context):
+        """Поток команд создания, обновления и удаления; результаты
+        приходят в порядке команд
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_BookServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -106,6 +143,21 @@ def add_BookServiceServicer_to_server(servicer, server):
                     request_deserializer=book__pb2.DeleteRequest.FromString,
                     response_serializer=book__pb2.DeleteResponse.SerializeToString,
             ),
+            'BulkCreate': grpc.stream_unary_rpc_method_handler(
+                    servicer.BulkCreate,
+                    request_deserializer=book__pb2.CreateRequest.FromString,
+                    response_serializer=book__pb2.BooksResponse.SerializeToString,
+            ),
+            'StreamBooks': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamBooks,
+                    request_deserializer=book__pb2.BookFilter.FromString,
+                    response_serializer=book__pb2.BooksResponse.SerializeToString,
+            ),
+            'BookSync': grpc.stream_stream_rpc_method_handler(
+                    servicer.BookSync,
+                    request_deserializer=book__pb2.SyncCommand.FromString,
+                    response_serializer=book__pb2.SyncResult.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'book.BookService', rpc_method_handlers)
@@ -224,3 +276,84 @@ class BookService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def BulkCreate(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/book.BookService/BulkCreate',
+            book__pb2.CreateRequest.SerializeToString,
+            book__pb2.BooksResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamBooks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/book.BookService/StreamBooks',
+            book__pb2.BookFilter.SerializeToString,
+            book__pb2.BooksResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BookSync(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/book.BookService/BookSync',
+            book__pb2.SyncCommand.SerializeToString,
+            book__pb2.SyncResult.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,100 @@
+# Кеш закодированных сообщений Book для ответа GetBooks.
+# Ответ BooksResponse на проводе - это подряд идущие поля
+# "books" (тег, длина, байты Book) и поле next_cursor. Поле каждой
+# книги кодируется один раз и хранится по id, а ответ собирается
+# склейкой готовых байтов, без создания сообщений protobuf
+# в каждом запросе. Записи удаляются при обновлении и удалении книги
+# (подписка на ленту изменений), а при переполнении вытесняются
+# давно не запрошенные (LRU)
+import threading
+from collections import OrderedDict
+
+from app.core.changes import ChangeEvent
+from app.core.storage import UPDATE, DELETE, BookModel
+from app.grpc_api import book_pb2
+
+# Теги полей BooksResponse: books = 1 и next_cursor = 2 (length-delimited)
+BOOKS_TAG = b"\x0a"
+NEXT_CURSOR_TAG = b"\x12"
+# Записей в кеше по умолчанию. Запись занимает около 260 байт
+# (книга с названием в 20 символов), 100 000 записей - около 26 МБ.
+# Меняется переменной BOOK_GRPC_CACHE_SIZE (см. app/main.py)
+CAPACITY = 100_000
+
+
+def varint(value: int) -> bytes:
+    data = bytearray()
+    while value > 0x7F:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def length_delimited(tag: bytes, data: bytes) -> bytes:
+    return tag + varint(len(data)) + data
+
+
+class BookWireCache:
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        # id книги -> (название, поле books с сообщением Book)
+        self.entries: OrderedDict[int, tuple[str, bytes]] = OrderedDict()
+        # invalidate вызывается в потоке изменения, field - в цикле
+        # событий: порядок записей меняют оба. Книга кодируется
+        # вне блокировки
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, event: ChangeEvent):
+        """Подписчик ленты изменений (вызывается в потоке изменения)"""
+        if event[1] in (UPDATE, DELETE):
+            with self.lock:
+                self.entries.pop(event[2], None)
+
+    def field(self, book: BookModel) -> bytes:
+        entries = self.entries
+        with self.lock:
+            entry = entries.get(book.id)
+            # Название сверяется: книга могла измениться между чтением
+            # из хранилища и записью в кеш
+            if entry is not None and entry[0] == book.title:
+                self.hits += 1
+                entries.move_to_end(book.id)
+                return entry[1]
+            self.misses += 1
+        data = length_delimited(BOOKS_TAG, book_pb2.Book(
+            id=book.id, title=book.title
+            ).SerializeToString())
+        with self.lock:
+            entries[book.id] = (book.title, data)
+            if len(entries) > self.capacity:
+                entries.popitem(last=False)
+        return data
+
+    def books_response(
+        self,
+        books: list[BookModel],
+        next_cursor: str
+            ) -> bytes:
+        """Сериализованный BooksResponse (как SerializeToString)"""
+        field = self.field
+        parts = [field(book) for book in books]
+        if next_cursor:
+            parts.append(
+                length_delimited(NEXT_CURSOR_TAG, next_cursor.encode())
+                )
+        return b"".join(parts)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+book_wire_cache = BookWireCache()
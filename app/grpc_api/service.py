@@ -1,21 +1,59 @@
+import asyncio
+from itertools import groupby
+
 import grpc
 
 from app.grpc_api import book_pb2, book_pb2_grpc
-from app.core.storage import book_storage, BookModel
+from app.grpc_api.cache import book_wire_cache
+from app.core.storage import (
+    book_storage, BookModel, encode_cursor, next_cursor,
+)
+
+# Книг в одном сообщении StreamBooks по умолчанию
+STREAM_CHUNK = 1000
+# Сколько команд BookSync принимается вперёд, пока выполняются
+# предыдущие
+SYNC_WINDOW = 1000
+
+
+def book_filters(request) -> dict:
+    return {
+        'title': request.title or None,
+        'id': request.id or None,
+        'id__lt': request.id_lt or None,
+        'id__gt': request.id_gt or None,
+        'limit': request.limit or None,
+        'after': request.after or None,
+        'title__startswith': request.title_startswith or None,
+        'title__istartswith': request.title_istartswith or None,
+        'title__contains': request.title_contains or None,
+        'title__icontains': request.title_icontains or None
+    }
+
+
+def serialize_response(response) -> bytes:
+    # GetBooks возвращает уже сериализованный ответ (см. cache.py)
+    if isinstance(response, bytes):
+        return response
+    return response.SerializeToString()
 
 
 class BookService(book_pb2_grpc.BookServiceServicer):
     async def GetBooks(self, request, context):
-        filters = {
-            'title': request.title or None,
-            'id': request.id or None,
-            'id__lt': request.id_lt or None,
-            'id__gt': request.id_gt or None
-        }
-        books = await book_storage.get_books(**filters)
-        return book_pb2.BooksResponse(books=[
-            book_pb2.Book(id=book.id, title=book.title) for book in books
-        ])
+        # 0 - лимит не задан (значение по умолчанию в protobuf)
+        if request.limit < 0:
+            await context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT, "Invalid limit"
+                )
+        filters = book_filters(request)
+        try:
+            books = await book_storage.get_books(**filters)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        # Ответ склеивается из закодированных заранее книг
+        return book_wire_cache.books_response(
+            books, next_cursor(books, filters['limit']) or ''
+            )
 
     async def CreateBook(self, request, context):
         book = BookModel(title=request.title)
@@ -28,18 +66,201 @@ class BookService(book_pb2_grpc.BookServiceServicer):
             request.title
             )
         if not updated_book:
-            context.abort(grpc.StatusCode.NOT_FOUND, "Book not found")
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Book not found")
         return book_pb2.Book(id=updated_book.id, title=updated_book.title)
 
     async def DeleteBook(self, request, context):
         success = await book_storage.delete_book(request.id)
         if not success:
-            context.abort(grpc.StatusCode.NOT_FOUND, "Book not found")
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Book not found")
         return book_pb2.DeleteResponse(success=True)
 
+    async def BulkCreate(self, request_iterator, context):
+        # Книги из потока сохраняются одним пакетом
+        books = [
+            BookModel(title=request.title)
+            async for request in request_iterator
+        ]
+        await book_storage.add_books(books)
+        return book_pb2.BooksResponse(books=[
+            book_pb2.Book(id=book.id, title=book.title) for book in books
+        ])
+
+    async def StreamBooks(self, request, context):
+        # Книги читаются из хранилища порциями и сразу отправляются:
+        # весь результат не собирается в памяти ни на одной стороне
+        filters = book_filters(request)
+        limit = filters.pop('limit')
+        chunk_size = request.chunk_size or STREAM_CHUNK
+        if chunk_size < 0:
+            await context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT, "Invalid chunk_size"
+                )
+        if limit is not None and limit < 0:
+            await context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT, "Invalid limit"
+                )
+        if limit:
+            chunk_size = min(chunk_size, limit)
+        sent = 0
+        try:
+            async for books in book_storage.iter_book_chunks(
+                    chunk_size=chunk_size, **filters):
+                if limit:
+                    books = books[:limit - sent]
+                sent += len(books)
+                yield book_pb2.BooksResponse(
+                    books=[
+                        book_pb2.Book(id=book.id, title=book.title)
+                        for book in books
+                    ],
+                    next_cursor=encode_cursor(books[-1].id)
+                )
+                if limit and sent >= limit:
+                    return
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+    async def BookSync(self, request_iterator, context):
+        # Команды читаются отдельной задачей, пока выполняются
+        # предыдущие. Все накопившиеся команды одного вида подряд
+        # выполняются одним пакетом (add_books, update_books,
+        # delete_books); результаты идут в порядке команд.
+        # Последний элемент очереди - None в конце потока команд
+        # или исключение, если чтение потока оборвалось
+        commands = asyncio.Queue(SYNC_WINDOW)
+
+        async def read():
+            try:
+                async for command in request_iterator:
+                    await commands.put(command)
+            except Exception as e:
+                await commands.put(e)
+                return
+            await commands.put(None)
+
+        reader = asyncio.create_task(read())
+        try:
+            end = False
+            while end is False:
+                pending = [await commands.get()]
+                while not commands.empty():
+                    pending.append(commands.get_nowait())
+                if pending[-1] is None or isinstance(pending[-1], Exception):
+                    end = pending.pop()
+                for kind, group in groupby(
+                        pending, key=lambda c: c.WhichOneof('command')):
+                    for result in await self._sync(kind, list(group)):
+                        yield result
+            if end is not None:
+                raise end
+        finally:
+            reader.cancel()
+
+    @staticmethod
+    async def _sync(kind: str | None, commands: list) -> list:
+        """Результаты пакета команд одного вида"""
+        def error(command, message: str):
+            return book_pb2.SyncResult(
+                request_id=command.request_id, error=message
+                )
+
+        try:
+            if kind == 'create':
+                books = [
+                    BookModel(title=command.create.title)
+                    for command in commands
+                ]
+                await book_storage.add_books(books)
+                return [
+                    book_pb2.SyncResult(
+                        request_id=command.request_id,
+                        book=book_pb2.Book(id=book.id, title=book.title)
+                    )
+                    for command, book in zip(commands, books)
+                ]
+            if kind == 'update':
+                books = await book_storage.update_books([
+                    (command.update.id, command.update.title)
+                    for command in commands
+                ])
+                return [
+                    book_pb2.SyncResult(
+                        request_id=command.request_id,
+                        book=book_pb2.Book(id=book.id, title=book.title)
+                    )
+                    if book else error(command, "Book not found")
+                    for command, book in zip(commands, books)
+                ]
+            if kind == 'delete':
+                success = await book_storage.delete_books([
+                    command.delete.id for command in commands
+                ])
+                return [
+                    book_pb2.SyncResult(
+                        request_id=command.request_id,
+                        deleted=book_pb2.DeleteResponse(success=True)
+                    )
+                    if deleted else error(command, "Book not found")
+                    for command, deleted in zip(commands, success)
+                ]
+            return [error(command, "Empty command") for command in commands]
+        except ValueError as e:
+            return [error(command, str(e)) for command in commands]
+
+
+def add_book_service(service: BookService, server) -> None:
+    # Обработчики всех методов, как в сгенерированном
+    # add_BookServiceServicer_to_server, но ответ GetBooks сериализуется
+    # через serialize_response: сервис отдаёт готовые байты
+    handlers = {
+        'GetBooks': grpc.unary_unary_rpc_method_handler(
+            service.GetBooks,
+            request_deserializer=book_pb2.BookFilter.FromString,
+            response_serializer=serialize_response,
+            ),
+        'CreateBook': grpc.unary_unary_rpc_method_handler(
+            service.CreateBook,
+            request_deserializer=book_pb2.CreateRequest.FromString,
+            response_serializer=book_pb2.Book.SerializeToString,
+            ),
+        'UpdateBook': grpc.unary_unary_rpc_method_handler(
+            service.UpdateBook,
+            request_deserializer=book_pb2.UpdateRequest.FromString,
+            response_serializer=book_pb2.Book.SerializeToString,
+            ),
+        'DeleteBook': grpc.unary_unary_rpc_method_handler(
+            service.DeleteBook,
+            request_deserializer=book_pb2.DeleteRequest.FromString,
+            response_serializer=book_pb2.DeleteResponse.SerializeToString,
+            ),
+        'BulkCreate': grpc.stream_unary_rpc_method_handler(
+            service.BulkCreate,
+            request_deserializer=book_pb2.CreateRequest.FromString,
+            response_serializer=book_pb2.BooksResponse.SerializeToString,
+            ),
+        'StreamBooks': grpc.unary_stream_rpc_method_handler(
+            service.StreamBooks,
+            request_deserializer=book_pb2.BookFilter.FromString,
+            response_serializer=book_pb2.BooksResponse.SerializeToString,
+            ),
+        'BookSync': grpc.stream_stream_rpc_method_handler(
+            service.BookSync,
+            request_deserializer=book_pb2.SyncCommand.FromString,
+            response_serializer=book_pb2.SyncResult.SerializeToString,
+            ),
+    }
+    # Одна таблица обработчиков и для общего, и для зарегистрированного
+    # поиска метода: какой бы сервер ни использовал, GetBooks найдётся
+    # с нужным сериализатором
+    server.add_generic_rpc_handlers((
+        grpc.method_handlers_generic_handler('book.BookService', handlers),
+        ))
+    server.add_registered_method_handlers('book.BookService', handlers)
+
 
 def serve():
     server = grpc.aio.server()
-    book_pb2_grpc.add_BookServiceServicer_to_server(BookService(), server)
+    add_book_service(BookService(), server)
     server.add_insecure_port('[::]:50051')
     return server
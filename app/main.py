@@ -1,10 +1,20 @@
+import os
 from threading import Thread
 
 from fastapi import FastAPI
 
+from app.core.changes import change_feed
+from app.core.journal import BookJournal
+from app.core.remote_storage import RemoteBookTable
+from app.core.storage import book_storage, book_table
+from app.core.sqlite_storage import SQLiteBookTable
+from app.core.sotrage_sync import book_storage as book_storage_sync
 from app.rest_api.endpoints import router as book_rest_router
 from app.graphql_api.endpoints import router as book_graphql_router
+from app.graphql_api.subscriptions import book_events
 from app.websocket_api.endpoints import router as book_websocket_router
+from app.websocket_api.manager import manager
+from app.grpc_api.cache import book_wire_cache
 from app.grpc_api.service import serve as grpc_serve
 from app.soap_api.service import serve as soap_serve
 
@@ -12,8 +22,71 @@ from app.soap_api.service import serve as soap_serve
 app = FastAPI()
 
 
+def configure_storage():
+    # Выбор бэкенда хранилища через переменные окружения:
+    # BOOK_STORAGE=memory (по умолчанию), sqlite или remote,
+    # BOOK_STORAGE_PATH - путь к файлу базы SQLite,
+    # BOOK_STORAGE_JOURNAL - каталог журнала и снимков для memory,
+    # BOOK_STORAGE_TRIGRAMS=1 - триграммный индекс для поиска подстроки
+    # в memory,
+    # BOOK_STORAGE_SERVER - Unix сокет сервера хранилища для remote
+    # (общие данные для uvicorn --workers N)
+    backend_name = os.getenv("BOOK_STORAGE", "memory")
+    if backend_name == "memory":
+        backend = book_table
+        if os.getenv("BOOK_STORAGE_TRIGRAMS") == "1":
+            book_table.enable_trigrams()
+        journal_directory = os.getenv("BOOK_STORAGE_JOURNAL")
+        if journal_directory:
+            BookJournal(journal_directory, book_table)
+    elif backend_name == "sqlite":
+        backend = SQLiteBookTable(os.getenv("BOOK_STORAGE_PATH", "books.db"))
+    elif backend_name == "remote":
+        backend = RemoteBookTable(
+            os.getenv("BOOK_STORAGE_SERVER", "/tmp/books-storage.sock")
+            )
+    else:
+        raise ValueError(f"Неизвестный бэкенд хранилища: {backend_name}")
+    # Изменения попадают в ленту изменений (Websocket API)
+    backend.listeners.append(change_feed.append)
+    if backend_name == "remote":
+        # Изменения всех процессов; номера событий - как на сервере,
+        # поэтому клиент ленты может переподключиться к любому процессу
+        backend.subscribe(change_feed.restart)
+    # Оба фасада работают с одним бэкендом
+    book_storage.backend = backend
+    book_storage_sync.backend = backend
+    print(f"Хранилище книг: {backend_name}")
+
+
+def configure_notifications():
+    # Очередь уведомлений Websocket API (см. README, "Уведомления")
+    batch_window_ms = float(os.getenv("BOOK_NOTIFY_BATCH_WINDOW_MS", "20"))
+    manager.start(
+        queue_size=int(os.getenv("BOOK_NOTIFY_QUEUE_SIZE", "10000")),
+        overflow=os.getenv("BOOK_NOTIFY_OVERFLOW", "drop_oldest"),
+        client_queue_size=int(os.getenv("BOOK_NOTIFY_CLIENT_QUEUE", "1000")),
+        evict_after=float(os.getenv("BOOK_NOTIFY_EVICT_AFTER", "5")),
+        batch_window=batch_window_ms / 1000,
+        batch_size=int(os.getenv("BOOK_NOTIFY_BATCH_SIZE", "100")),
+        # Unix сокет брокера для uvicorn --workers N
+        broker=os.getenv("BOOK_NOTIFY_BROKER"),
+        )
+    change_feed.listeners.append(manager.publish_change)
+    # Подписки GraphQL (Subscription)
+    change_feed.listeners.append(book_events.publish)
+    # Кеш закодированных книг ответа gRPC GetBooks
+    book_wire_cache.capacity = int(
+        os.getenv("BOOK_GRPC_CACHE_SIZE", book_wire_cache.capacity)
+        )
+    change_feed.listeners.append(book_wire_cache.invalidate)
+
+
 @app.on_event("startup")
 async def startup_event():
+    configure_storage()
+    configure_notifications()
+
     # Запуск gRPC и SOAP сервера в фоне
     global grpc_server
     grpc_server = grpc_serve()
@@ -34,6 +107,8 @@ async def shutdown_event():
     print("gRPC сервер остановлен")
     soap_server.server_close()
     print("SOAP сервер остановлен")
+    await manager.stop()
+    book_storage.backend.close()
 # Подключение роутеров для работы с книгами
 
 # REST API
@@ -5,8 +5,9 @@ from app.rest_api.schemas import (
     BookCreate,
     BookUpdate,
     BookFilter,
+    BookBatch,
 )
-from app.core.storage import book_storage, BookModel
+from app.core.storage import book_storage, BookModel, next_cursor
 from app.websocket_api.manager import manager
 
 
@@ -26,6 +27,12 @@ router = APIRouter()
         title: {title},
         id__lt: {id__lt},
         id__gt: {id__gt},
+        limit: {limit},
+        after: {after},
+        title__startswith: {title__startswith},
+        title__istartswith: {title__istartswith},
+        title__contains: {title__contains},
+        title__icontains: {title__icontains},
         return: {result},
         error: {error}
     """,
@@ -34,15 +41,33 @@ router = APIRouter()
 async def get_books(
     title: str | None = Query(None, max_length=100),
     id__lt: int | None = Query(None),
-    id__gt: int | None = Query(None)
-        ) -> dict[str, list[BookResponse]]:
+    id__gt: int | None = Query(None),
+    limit: int | None = Query(None, ge=1),
+    after: str | None = Query(None),
+    title__startswith: str | None = Query(None, max_length=100),
+    title__istartswith: str | None = Query(None, max_length=100),
+    title__contains: str | None = Query(None, max_length=100),
+    title__icontains: str | None = Query(None, max_length=100),
+        ) -> dict[str, list[BookResponse] | str | None]:
     filters = BookFilter(
         title=title,
         id__lt=id__lt,
         id__gt=id__gt,
+        limit=limit,
+        after=after,
+        title__startswith=title__startswith,
+        title__istartswith=title__istartswith,
+        title__contains=title__contains,
+        title__icontains=title__icontains,
     )
-    books = await book_storage.get_books(**filters.model_dump())
-    return {"books": [BookResponse(**(await book.json)) for book in books]}
+    try:
+        books = await book_storage.get_books(**filters.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "books": [BookResponse(**(await book.json)) for book in books],
+        "next_cursor": next_cursor(books, limit),
+    }
 
 
 # 2. Добавление новой книги
@@ -134,3 +159,40 @@ async def update_book(
     if updated_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
     return {"book": BookResponse(**(await updated_book.json))}
+
+
+# 6. Пакетные изменения
+@router.post('/batch')
+@manager.notify(
+    "[INFO] REST: Пакетное изменение книг",
+    "book_updates"
+    )  # См. Websocket API
+@manager.notify(
+    """[INFO] REST: Пакетное изменение книг:
+        function: {func_name},
+        batch: {batch},
+        return: {result},
+        error: {error}
+    """,
+    "admin_notifications"
+    )  # См. Websocket API
+async def batch_books(
+    batch: BookBatch
+        ) -> dict[str, list[BookResponse | None] | list[bool]]:
+    # Весь пакет выполняется атомарно, с одной записью журнала
+    books_to_add = [BookModel(**book.model_dump()) for book in batch.create]
+    updated_books, deleted = await book_storage.apply_batch(
+        books_to_add,
+        [(book.id, book.title) for book in batch.update],
+        batch.delete,
+        )
+    return {
+        "created": [
+            BookResponse(**(await book.json)) for book in books_to_add
+        ],
+        "updated": [
+            BookResponse(**(await book.json)) if book else None
+            for book in updated_books
+        ],
+        "deleted": deleted,
+    }
@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # Схема для ответа
@@ -18,9 +18,28 @@ class BookUpdate(BaseModel):
     title: str
 
 
+# Схема изменения книги в пакете
+class BookBatchUpdate(BaseModel):
+    id: int
+    title: str
+
+
+# Схема пакетных изменений
+class BookBatch(BaseModel):
+    create: list[BookCreate] = []
+    update: list[BookBatchUpdate] = []
+    delete: list[int] = []
+
+
 # Схема фильтров
 class BookFilter(BaseModel):
     title: str | None = None
     id: int | None = None
     id__lt: int | None = None
     id__gt: int | None = None
+    limit: int | None = Field(None, ge=1)
+    after: str | None = None
+    title__startswith: str | None = None
+    title__istartswith: str | None = None
+    title__contains: str | None = None
+    title__icontains: str | None = None
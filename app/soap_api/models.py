@@ -5,4 +5,5 @@ class BookSOAP(ComplexModel):
     __namespace__ = 'books'
     id = Integer
     title = Unicode
+    cursor = Unicode
 
@@ -1,12 +1,24 @@
 # [file name]: app/soap_api/service.py
-from spyne import Application, ServiceBase, rpc
-from spyne import Integer, Unicode, Iterable, Boolean
+from spyne import Application, Fault, ServiceBase, rpc
+from spyne import Array, Integer, Unicode, Iterable, Boolean
 from spyne.protocol.soap import Soap11
 from spyne.server.wsgi import WsgiApplication
-from wsgiref.simple_server import make_server
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, make_server
 
 from app.soap_api.models import BookSOAP
 from app.core.sotrage_sync import book_storage, BookModel
+from app.core.storage import encode_cursor
+from app.websocket_api.manager import manager, NotifyTemplate
+
+
+# WSGI сервер, обрабатывающий каждый запрос в своём потоке:
+# общая таблица книг потокобезопасна
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    # При uvicorn --workers N порт слушают все процессы
+    # (как и gRPC сервер), соединения распределяет ядро
+    allow_reuse_port = True
 
 
 class BookServiceSOAP(ServiceBase):
@@ -17,11 +29,48 @@ class BookServiceSOAP(ServiceBase):
         book_storage.add_book(book)
         return BookSOAP(id=book.id, title=book.title)
 
-    @rpc(_returns=Iterable(BookSOAP))
-    def GetBooks(ctx):
-        """Получение списка книг через SOAP"""
-        books = book_storage.get_books()
-        return [BookSOAP(id=b.id, title=b.title) for b in books]
+    @rpc(Array(Unicode), _returns=Iterable(BookSOAP))
+    def AddBooks(ctx, titles):
+        """Добавление нескольких книг одним пакетом через SOAP"""
+        books = [BookModel(title=title) for title in titles or []]
+        book_storage.add_books(books)
+        return [BookSOAP(id=book.id, title=book.title) for book in books]
+
+    @rpc(
+        Integer, Unicode, Unicode, Unicode, Unicode, Unicode,
+        _returns=Iterable(BookSOAP)
+        )
+    def GetBooks(
+        ctx,
+        limit,
+        after,
+        title_startswith,
+        title_istartswith,
+        title_contains,
+        title_icontains,
+            ):
+        """Получение списка книг через SOAP.
+        limit и after (курсор книги) задают страницу,
+        title_* - поиск по началу названия или подстроке"""
+        if limit is not None and limit < 1:
+            raise Fault(
+                faultcode='Client', faultstring="limit должен быть не меньше 1"
+                )
+        try:
+            books = book_storage.get_books(
+                limit=limit,
+                after=after,
+                title__startswith=title_startswith,
+                title__istartswith=title_istartswith,
+                title__contains=title_contains,
+                title__icontains=title_icontains,
+                )
+        except ValueError as e:
+            raise Fault(faultcode='Client', faultstring=str(e))
+        return [
+            BookSOAP(id=b.id, title=b.title, cursor=encode_cursor(b.id))
+            for b in books
+        ]
 
     @rpc(Integer, _returns=BookSOAP)
     def GetBook(ctx, id):
@@ -41,6 +90,61 @@ class BookServiceSOAP(ServiceBase):
         return book_storage.delete_book(book_id=id)
 
 
+# Уведомления Websocket API об изменениях через SOAP.
+# Методы spyne нельзя обернуть декоратором manager.notify (spyne берёт
+# имена аргументов из кода функции), поэтому уведомления отправляются
+# из событий сервиса. Они вызываются в потоке SOAP сервера и передают
+# сообщение в цикл событий рассылки через publish_threadsafe
+SOAP_EVENTS = {
+    "AddBook": "Добавление новой книги",
+    "AddBooks": "Пакетное добавление книг",
+    "UpdateBook": "Обновление книги",
+    "DeleteBook": "Удаление книги",
+}
+SOAP_ADMIN_TEMPLATE = NotifyTemplate(
+    """[INFO] SOAP: {action}:
+        function: {func_name},
+        args: {args},
+        return: {result},
+        error: {error}
+    """
+    )
+
+
+def notify_soap(ctx, error=None):
+    action = SOAP_EVENTS.get(ctx.descriptor.name)
+    if action is None:
+        return
+    if manager.has_subscribers("book_updates"):
+        manager.publish_threadsafe(f"[INFO] SOAP: {action}", "book_updates")
+    if manager.has_subscribers("admin_notifications"):
+        result = error
+        if error is None:
+            result = ctx.out_object[0] if ctx.out_object else None
+        manager.publish_threadsafe(
+            SOAP_ADMIN_TEMPLATE.render((), {
+                'action': action,
+                'func_name': ctx.descriptor.name,
+                'args': list(ctx.in_object or ()),
+                'result': result,
+                'error': error,
+                }),
+            "admin_notifications"
+            )
+
+
+def notify_soap_error(ctx):
+    notify_soap(ctx, error=ctx.out_error)
+
+
+BookServiceSOAP.event_manager.add_listener(
+    'method_return_object', notify_soap
+    )
+BookServiceSOAP.event_manager.add_listener(
+    'method_exception_object', notify_soap_error
+    )
+
+
 def serve():
     """Запуск SOAP сервера"""
     application = Application(
@@ -54,5 +158,8 @@ def serve():
     application.interface.docs_style = 'restructured'
 
     wsgi_application = WsgiApplication(application)
-    server = make_server('localhost', 8001, wsgi_application)
+    server = make_server(
+        'localhost', 8001, wsgi_application,
+        server_class=ThreadingWSGIServer
+        )
     return server
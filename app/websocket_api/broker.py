@@ -0,0 +1,207 @@
+# Обмен уведомлениями между процессами (uvicorn --workers N).
+# Websocket подключения живут в памяти процесса, поэтому уведомление,
+# опубликованное в одном процессе, пересылается остальным через
+# брокер - небольшой сервер на Unix сокете. Брокером становится
+# процесс, первым захвативший файловую блокировку <путь>.lock,
+# остальные подключаются к нему. Если процесс-брокер завершился,
+# блокировку захватывает другой процесс. Брокер можно запустить
+# и отдельно:
+#   python -m app.websocket_api.broker /tmp/books-notify.sock
+#
+# Кадр: заголовок (длина текста - 4 байта, номер канала - 1 байт)
+# и текст уведомления в UTF-8. Брокер кадры не разбирает, а только
+# пересылает всем процессам, кроме отправителя
+import asyncio
+import fcntl
+import os
+import struct
+import sys
+
+HEADER = struct.Struct(">IB")
+# Каналы, уведомления которых пересылаются между процессами.
+# Лента изменений (book_changes) строится из изменений хранилища
+CHANNELS = ("book_updates", "admin_notifications")
+CHANNEL_NUMBERS = {channel: number for number, channel in enumerate(CHANNELS)}
+# Процесс, у которого в буфере отправки больше MAX_BUFFER байт,
+# не успевает читать: брокер отключает его (он переподключится)
+MAX_BUFFER = 16 * 1024 * 1024
+# Пауза перед повторным подключением к брокеру, с
+RECONNECT_DELAY = 0.2
+
+
+def encode_frame(message: str, channel: str) -> bytes:
+    data = message.encode()
+    return HEADER.pack(len(data), CHANNEL_NUMBERS[channel]) + data
+
+
+def decode_frame(frame: bytes) -> tuple[str, str]:
+    _, number = HEADER.unpack_from(frame)
+    return frame[HEADER.size:].decode(), CHANNELS[number]
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    header = await reader.readexactly(HEADER.size)
+    length, _ = HEADER.unpack(header)
+    return header + await reader.readexactly(length)
+
+
+def lock(path: str):
+    """Блокировка брокера: файл, пока он открыт, или None,
+    если брокер уже есть"""
+    lock_file = open(path + ".lock", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class Broker:
+    """Сервер, пересылающий кадры между процессами"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.peers: set[asyncio.StreamWriter] = set()
+        self.handlers: set[asyncio.Task] = set()
+        self.server: asyncio.Server | None = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            # Сокет остался от завершившегося брокера
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._serve, self.path)
+
+    async def stop(self):
+        if self.server is None:
+            return
+        self.server.close()
+        for peer in tuple(self.peers):
+            peer.close()
+        if self.handlers:
+            # Обработчики завершатся, дочитав закрытые соединения
+            await asyncio.wait(self.handlers, timeout=1)
+        self.peers.clear()
+        self.server = None
+
+    async def _serve(self, reader, writer):
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        self.peers.add(writer)
+        try:
+            while True:
+                frame = await read_frame(reader)
+                for peer in tuple(self.peers):
+                    if peer is writer:
+                        continue
+                    if peer.transport.get_write_buffer_size() > MAX_BUFFER:
+                        self.peers.discard(peer)
+                        peer.close()
+                        continue
+                    peer.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.peers.discard(writer)
+            self.handlers.discard(handler)
+            writer.close()
+
+
+class BrokerLink:
+    """Подключение процесса к брокеру. Кадры других процессов
+    передаются в deliver(message, channel)"""
+
+    def __init__(self, path: str, deliver):
+        self.path = path
+        self.deliver = deliver
+        self.writer: asyncio.StreamWriter | None = None
+        # Брокер, если он работает в этом процессе
+        self.broker: Broker | None = None
+        self.lock_file = None
+        self.task: asyncio.Task | None = None
+        self.stats = {"sent": 0, "received": 0, "not_sent": 0}
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.broker is not None:
+            await self.broker.stop()
+            self.broker = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def send(self, message: str, channel: str):
+        if channel not in CHANNEL_NUMBERS:
+            return
+        if not self.connected:
+            # Брокер недоступен: уведомление получат только
+            # клиенты этого процесса
+            self.stats["not_sent"] += 1
+            return
+        self.writer.write(encode_frame(message, channel))
+        self.stats["sent"] += 1
+
+    async def _connect(self):
+        while True:
+            try:
+                return await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                pass
+            if self.broker is None:
+                # Брокера нет: пробуем стать им
+                self.lock_file = lock(self.path)
+                if self.lock_file is not None:
+                    self.broker = Broker(self.path)
+                    await self.broker.start()
+                    continue
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _run(self):
+        while True:
+            reader, self.writer = await self._connect()
+            try:
+                while True:
+                    message, channel = decode_frame(await read_frame(reader))
+                    self.stats["received"] += 1
+                    try:
+                        await self.deliver(message, channel)
+                    except Exception as e:
+                        print(f"Ошибка рассылки в канал {channel}: {e}")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # Брокер завершился: подключаемся к новому
+                pass
+            finally:
+                self.writer.close()
+                self.writer = None
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def serve(path: str):
+    lock_file = lock(path)
+    if lock_file is None:
+        sys.exit(f"Брокер уже запущен: {path}")
+    broker = Broker(path)
+    await broker.start()
+    print(f"Брокер уведомлений: {path}")
+    try:
+        await broker.server.serve_forever()
+    finally:
+        await broker.stop()
+        lock_file.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(sys.argv[1]))
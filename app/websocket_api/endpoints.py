@@ -1,3 +1,6 @@
+import asyncio
+import json
+
 from fastapi import (
     APIRouter,
     WebSocket,
@@ -7,8 +10,14 @@ from fastapi import (
     Response
 )
 
+from .filters import parse_filters
 from .manager import manager
-from .handler import handle_message
+from .handler import (
+    handle_command,
+    handle_message,
+    is_command,
+    MAX_PIPELINE
+)
 
 router = APIRouter()
 
@@ -16,13 +25,14 @@ templates = templating.Jinja2Templates(directory="app/websocket_api/templates")
 
 
 @router.websocket("/book-updates")
-async def book_updates_websocket(websocket: WebSocket):
+async def book_updates_websocket(websocket: WebSocket, batch: bool = False):
     await websocket.accept()
     channel = "book_updates"
 
     try:
         # Регистрируем подключение
-        await manager.connect(websocket, channel)
+        # (?batch=true - уведомления пачками в виде JSON массива)
+        await manager.connect(websocket, channel, batch)
 
         # Подтверждение подключения
         await manager.send_personal_message(
@@ -36,30 +46,95 @@ async def book_updates_websocket(websocket: WebSocket):
             print(f"Получено сообщение: {data}")
     except WebSocketDisconnect:
         manager.disconnect(websocket, channel)
-        await manager.broadcast("Клиент отключился", channel)
+        await manager.publish("Клиент отключился", channel)
+
+
+@router.websocket("/book-changes")
+async def book_changes_websocket(
+    websocket: WebSocket,
+    since: int | None = None,
+    filters: str | None = None,
+        ):
+    # Лента изменений: JSON события с номером seq.
+    # После переподключения с ?since=<seq> приходят только
+    # пропущенные события (или полный снимок, если они уже вытеснены).
+    # Фильтры подписки передаются в ?filters=<json> или сообщением
+    # {"type": "subscribe", "filters": [{"id__gt": 10, "id__lt": 20}]}
+    await websocket.accept()
+    channel = "book_changes"
+
+    try:
+        try:
+            parsed = parse_filters(json.loads(filters)) if filters else None
+        except ValueError as e:
+            await websocket.close(code=1008, reason=str(e))
+            return
+        await manager.subscribe_changes(websocket, since, parsed)
+        while True:
+            data = await websocket.receive_text()
+            try:
+                command = json.loads(data)
+                if command.get("type") != "subscribe":
+                    raise ValueError("Ожидается команда subscribe")
+                count = manager.set_change_filters(
+                    websocket, command.get("filters") or []
+                    )
+                reply = {"type": "subscribed", "filters": count}
+            except (ValueError, AttributeError) as e:
+                reply = {"type": "error", "detail": str(e)}
+            # Через очередь подключения: ответ не перемешивается
+            # с событиями, которые отправляет writer
+            manager.reply(
+                websocket, channel, json.dumps(reply, ensure_ascii=False)
+                )
+    except WebSocketDisconnect:
+        manager.disconnect(websocket, channel)
 
 
 @router.websocket("/admin")
-async def admin_websocket(websocket: WebSocket):
+async def admin_websocket(websocket: WebSocket, batch: bool = False):
     await websocket.accept()
     channel = "admin_notifications"
 
     try:
-        await manager.connect(websocket, channel)
+        await manager.connect(websocket, channel, batch)
         await manager.send_personal_message(
             "Подключение установлено", websocket
             )
 
+        # JSON команды выполняются параллельно (не больше MAX_PIPELINE
+        # сразу), ответ с request_id получает только отправитель
+        pipeline = asyncio.Semaphore(MAX_PIPELINE)
+        tasks = set()
+
+        async def run(data: str):
+            try:
+                manager.reply(websocket, channel, await handle_command(data))
+            finally:
+                pipeline.release()
+
         while True:
             data = await websocket.receive_text()
+            if is_command(data):
+                await pipeline.acquire()
+                task = asyncio.create_task(run(data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                continue
             print(f"Получено сообщение: {data}")
             message = await handle_message(data)
-            await manager.broadcast(message, channel)
+            await manager.publish(message, channel)
             print(f"Сообщение отправлено: {message}")
     except WebSocketDisconnect:
         manager.disconnect(websocket, channel)
 
 
+@router.get("/stats")
+async def notification_stats():
+    """Состояние очереди уведомлений"""
+    return manager.statistics()
+
+
 @router.get("/")
 async def admin(request: Request, response: Response):
     return templates.TemplateResponse(request, "websocket_test.html")
@@ -0,0 +1,268 @@
+# Фильтры подписки на ленту изменений (см. app/core/changes.py).
+# Клиент присылает список фильтров в словаре BookFilter: событие
+# доставляется, если подходит хотя бы под один фильтр, а фильтр -
+# если выполнены все его условия. Условия на название проверяются
+# и по новому, и по прежнему названию: клиент узнаёт, что книга
+# ушла из выборки.
+# Фильтры индексируются по самому избирательному условию (хеш по id
+# и названию, префиксы, дерево интервалов id), поэтому событие
+# проверяется только против фильтров, которые могут подойти
+from app.core.changes import ChangeEvent
+
+# Допустимые условия и типы их значений
+FILTER_FIELDS = {
+    "id": int,
+    "id__gt": int,
+    "id__lt": int,
+    "title": str,
+    "title__startswith": str,
+    "title__istartswith": str,
+    "title__contains": str,
+    "title__icontains": str,
+}
+TITLE_CONDITIONS = {
+    "title": lambda title, value: title == value,
+    "title__startswith": lambda title, value: title.startswith(value),
+    "title__istartswith": lambda title, value: (
+        title.casefold().startswith(value)
+    ),
+    "title__contains": lambda title, value: value in title,
+    "title__icontains": lambda title, value: value in title.casefold(),
+}
+
+
+def parse_filters(filters) -> list[dict]:
+    """Проверяет фильтры клиента. Пустой список - все события"""
+    if isinstance(filters, dict):
+        filters = [filters]
+    if not isinstance(filters, list):
+        raise ValueError("Фильтры - объект или список объектов")
+    parsed = []
+    for conditions in filters:
+        if not isinstance(conditions, dict):
+            raise ValueError("Фильтр должен быть объектом")
+        result = {}
+        for name, value in conditions.items():
+            kind = FILTER_FIELDS.get(name)
+            if kind is None:
+                raise ValueError(f"Неизвестное условие фильтра: {name}")
+            if value is None:
+                continue
+            if not isinstance(value, kind) or isinstance(value, bool):
+                raise ValueError(f"Некорректное значение условия: {name}")
+            if name in ("title__istartswith", "title__icontains"):
+                value = value.casefold()
+            result[name] = value
+        parsed.append(result)
+    return parsed
+
+
+def matches(conditions: dict, book_id: int, titles: tuple) -> bool:
+    if "id" in conditions and book_id != conditions["id"]:
+        return False
+    if "id__gt" in conditions and book_id <= conditions["id__gt"]:
+        return False
+    if "id__lt" in conditions and book_id >= conditions["id__lt"]:
+        return False
+    checks = [
+        (TITLE_CONDITIONS[name], value)
+        for name, value in conditions.items()
+        if name in TITLE_CONDITIONS
+    ]
+    if not checks:
+        return True
+    return any(
+        all(check(title, value) for check, value in checks)
+        for title in titles
+        if title is not None
+    )
+
+
+class IntervalIndex:
+    """Отрезки [low, high] с поиском всех отрезков, содержащих точку.
+    Центрированное дерево отрезков перестраивается при первом поиске
+    после изменения: подписки меняются реже, чем приходят события"""
+
+    def __init__(self):
+        self.intervals: dict = {}
+        self.tree = None
+
+    def add(self, item, low: float, high: float) -> None:
+        if low > high:
+            # Пустой отрезок не содержит ни одной точки
+            return
+        self.intervals[item] = (low, high)
+        self.tree = None
+
+    def remove(self, item) -> None:
+        if self.intervals.pop(item, None) is not None:
+            self.tree = None
+
+    @classmethod
+    def _build(cls, items: list):
+        if not items:
+            return None
+        points = sorted(
+            point for _, (low, high) in items for point in (low, high)
+            )
+        center = points[len(points) // 2]
+        here, left, right = [], [], []
+        for item in items:
+            low, high = item[1]
+            if high < center:
+                left.append(item)
+            elif low > center:
+                right.append(item)
+            else:
+                here.append(item)
+        # Отрезки у центра: по возрастанию начала и по убыванию конца
+        by_low = sorted(
+            ((low, item) for item, (low, _) in here), key=lambda x: x[0]
+            )
+        by_high = sorted(
+            ((high, item) for item, (_, high) in here),
+            key=lambda x: x[0],
+            reverse=True,
+            )
+        return (
+            center, by_low, by_high, cls._build(left), cls._build(right)
+            )
+
+    def stab(self, point: int) -> list:
+        if self.tree is None:
+            self.tree = self._build(list(self.intervals.items()))
+        found = []
+        node = self.tree
+        while node is not None:
+            center, by_low, by_high, left, right = node
+            if point < center:
+                for low, item in by_low:
+                    if low > point:
+                        break
+                    found.append(item)
+                node = left
+            elif point > center:
+                for high, item in by_high:
+                    if high < point:
+                        break
+                    found.append(item)
+                node = right
+            else:
+                found.extend(item for _, item in by_low)
+                break
+        return found
+
+
+class SubscriptionIndex:
+    """Подписчики ленты изменений и их фильтры"""
+
+    def __init__(self):
+        # Подписчики без фильтров получают все события
+        self.everyone: set = set()
+        self.filters: dict = {}
+        # Индексы: значение условия -> множество (подписчик, № фильтра)
+        self.by_id: dict[int, set] = {}
+        self.by_title: dict[str, set] = {}
+        self.by_prefix: dict[str, set] = {}
+        self.by_iprefix: dict[str, set] = {}
+        self.ranges = IntervalIndex()
+        # Фильтры только с условиями на подстроку проверяются всегда
+        self.scan: set = set()
+
+    def _entries(self, key):
+        """Куда внесён каждый фильтр подписчика"""
+        for number, conditions in enumerate(self.filters.get(key, ())):
+            entry = (key, number)
+            if "id" in conditions:
+                yield entry, self.by_id, conditions["id"]
+            elif "title" in conditions:
+                yield entry, self.by_title, conditions["title"]
+            elif "title__startswith" in conditions:
+                yield entry, self.by_prefix, conditions["title__startswith"]
+            elif "title__istartswith" in conditions:
+                yield (
+                    entry, self.by_iprefix, conditions["title__istartswith"]
+                    )
+            elif "id__gt" in conditions or "id__lt" in conditions:
+                yield entry, self.ranges, None
+            else:
+                yield entry, self.scan, None
+
+    def set(self, key, filters: list[dict]) -> None:
+        """Заменяет фильтры подписчика. Пустой список - все события"""
+        self.remove(key)
+        if not filters or not all(filters):
+            # Фильтр без условий пропускает всё
+            self.everyone.add(key)
+            return
+        self.filters[key] = filters
+        for entry, index, value in self._entries(key):
+            if index is self.ranges:
+                conditions = filters[entry[1]]
+                self.ranges.add(
+                    entry,
+                    conditions.get("id__gt", float("-inf")) + 1,
+                    conditions.get("id__lt", float("inf")) - 1,
+                    )
+            elif index is self.scan:
+                self.scan.add(entry)
+            else:
+                index.setdefault(value, set()).add(entry)
+
+    def remove(self, key) -> None:
+        self.everyone.discard(key)
+        for entry, index, value in self._entries(key):
+            if index is self.ranges:
+                self.ranges.remove(entry)
+            elif index is self.scan:
+                self.scan.discard(entry)
+            else:
+                entries = index[value]
+                entries.discard(entry)
+                if not entries:
+                    del index[value]
+        self.filters.pop(key, None)
+
+    def accepts(self, key, event: ChangeEvent) -> bool:
+        """Подходит ли событие под фильтры одного подписчика"""
+        if key in self.everyone:
+            return True
+        _, _, book_id, title, old_title = event
+        titles = tuple(t for t in (title, old_title) if t is not None)
+        return any(
+            matches(conditions, book_id, titles)
+            for conditions in self.filters.get(key, ())
+        )
+
+    @staticmethod
+    def _prefixes(index: dict, titles) -> list:
+        found = []
+        for title in titles:
+            for end in range(len(title) + 1):
+                entries = index.get(title[:end])
+                if entries:
+                    found.extend(entries)
+        return found
+
+    def match(self, event: ChangeEvent) -> set:
+        """Подписчики, которым нужно доставить событие"""
+        _, _, book_id, title, old_title = event
+        titles = tuple(t for t in (title, old_title) if t is not None)
+        candidates = list(self.scan)
+        candidates.extend(self.by_id.get(book_id, ()))
+        for value in titles:
+            candidates.extend(self.by_title.get(value, ()))
+        if self.by_prefix:
+            candidates.extend(self._prefixes(self.by_prefix, titles))
+        if self.by_iprefix:
+            candidates.extend(self._prefixes(
+                self.by_iprefix, [value.casefold() for value in titles]
+                ))
+        if self.ranges.intervals:
+            candidates.extend(self.ranges.stab(book_id))
+        found = set(self.everyone)
+        for key, number in candidates:
+            if key not in found and matches(
+                    self.filters[key][number], book_id, titles):
+                found.add(key)
+        return found
@@ -1,17 +1,141 @@
-# Обработка сообщений от клиента
-from app.core.storage import book_storage, BookModel
+# Обработка сообщений от клиента.
+# Текстовые команды: ping и /add_book <название>.
+# JSON команды - протокол CRUD для внутренних инструментов:
+#   {"request_id": 1, "op": "add", "title": "Война и мир"}
+#   {"request_id": 2, "op": "get", "id": 0}
+#   {"request_id": 3, "op": "list", "filters": {"limit": 10}}
+#   {"request_id": 4, "op": "update", "id": 0, "title": "Анна Каренина"}
+#   {"request_id": 5, "op": "delete", "id": 0}
+#   {"request_id": 6, "op": "batch", "create": [{"title": "..."}],
+#    "update": [{"id": 1, "title": "..."}], "delete": [2, 3]}
+# Ответ: {"request_id": 1, "ok": true, "result": ...}
+# или {"request_id": 1, "ok": false, "error": "..."}.
+# Клиент может отправлять команды, не дожидаясь ответов: каждая
+# выполняется отдельной задачей, и ответы приходят по мере готовности
+import json
+
+from app.core.storage import book_storage, BookModel, next_cursor
+from app.rest_api.schemas import BookBatch, BookFilter
+
+# Сколько команд одного подключения выполняется одновременно.
+# Дальше чтение новых команд ждёт: клиент не может занять сервер
+# неограниченным числом задач
+MAX_PIPELINE = 100
 
 
 async def handle_message(message):
     if message == "ping":
         return "pong"
-    if '/add_book' in message:
-        args = message.split(' ')
-        if len(args) == 2:
+    if message.startswith('/add_book '):
+        # Название - всё после команды, в том числе с пробелами
+        title = message.partition(' ')[2].strip()
+        if title:
             try:
-                book = BookModel(title=args[1])
+                book = BookModel(title=title)
                 await book_storage.add_book(book)
                 return f'Книга "{book.title}" c ID {book.id} добавлена!'
             except Exception as e:
                 return f'Ошибка: {e}'
     return 'К сожалению мой функционал ограничен :('
+
+
+def is_command(message: str) -> bool:
+    """JSON команда протокола CRUD (а не текстовая команда)"""
+    return message.lstrip().startswith("{")
+
+
+def _book_id(command: dict) -> int:
+    book_id = command.get("id")
+    if not isinstance(book_id, int) or isinstance(book_id, bool):
+        raise ValueError("Ожидается целый id книги")
+    return book_id
+
+
+def _title(command: dict) -> str:
+    title = command.get("title")
+    if not isinstance(title, str) or not title:
+        raise ValueError("Ожидается непустое название книги")
+    return title
+
+
+async def _get(command: dict):
+    title = command.get("title")
+    if title is None:
+        book = await book_storage.get_book(id=_book_id(command))
+    else:
+        book = await book_storage.get_book(title=_title(command))
+    return await book.json if book else None
+
+
+async def _list(command: dict):
+    filters = BookFilter(**(command.get("filters") or {})).model_dump()
+    books = await book_storage.get_books(**filters)
+    return {
+        "books": [await book.json for book in books],
+        "next_cursor": next_cursor(books, filters["limit"]),
+    }
+
+
+async def _add(command: dict):
+    book = BookModel(title=_title(command))
+    await book_storage.add_book(book)
+    return await book.json
+
+
+async def _update(command: dict):
+    book = await book_storage.update_book(
+        _book_id(command), _title(command)
+        )
+    return await book.json if book else None
+
+
+async def _delete(command: dict):
+    return await book_storage.delete_book(_book_id(command))
+
+
+async def _batch(command: dict):
+    batch = BookBatch(
+        create=command.get("create") or [],
+        update=command.get("update") or [],
+        delete=command.get("delete") or [],
+        )
+    books = [BookModel(title=book.title) for book in batch.create]
+    updated, deleted = await book_storage.apply_batch(
+        books, [(book.id, book.title) for book in batch.update], batch.delete
+        )
+    return {
+        "created": [await book.json for book in books],
+        "updated": [await book.json if book else None for book in updated],
+        "deleted": deleted,
+    }
+
+
+COMMANDS = {
+    "get": _get,
+    "list": _list,
+    "add": _add,
+    "update": _update,
+    "delete": _delete,
+    "batch": _batch,
+}
+
+
+async def handle_command(message: str) -> str:
+    """Выполняет JSON команду и возвращает JSON ответ"""
+    request_id = None
+    try:
+        command = json.loads(message)
+        if not isinstance(command, dict):
+            raise ValueError("Команда должна быть JSON объектом")
+        request_id = command.get("request_id")
+        operation = COMMANDS.get(command.get("op"))
+        if operation is None:
+            raise ValueError(f"Неизвестная команда: {command.get('op')}")
+        response = {
+            "request_id": request_id,
+            "ok": True,
+            "result": await operation(command),
+        }
+    except Exception as e:
+        response = {"request_id": request_id, "ok": False, "error": str(e)}
+    return json.dumps(response, ensure_ascii=False)
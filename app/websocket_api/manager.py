@@ -1,74 +1,602 @@
-from asyncio import run
+import asyncio
+import json
+import time
+from concurrent.futures import CancelledError
 from functools import wraps
+from itertools import islice
+from string import Formatter
+
+from app.core.changes import ChangeEvent, change_feed, event_json
+from app.core.storage import book_storage
+from app.websocket_api.broker import BrokerLink
+from app.websocket_api.filters import SubscriptionIndex, parse_filters
+
+# Политики переполнения очереди уведомлений
+DROP_OLDEST = "drop_oldest"  # вытеснить самое старое уведомление
+DROP_NEWEST = "drop_newest"  # отбросить новое уведомление
+BLOCK = "block"  # ждать места в очереди
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+# Сколько секунд другой поток ждёт места в очереди при политике block.
+# Не дождавшись (например, рассылка остановлена), он отбрасывает
+# уведомление, а не висит
+BLOCK_TIMEOUT = 5.0
+
+# Большие значения (например, список всех книг) попадают в уведомление
+# сокращёнными: первые SUMMARY_ITEMS элементов, не длиннее SUMMARY_CHARS
+SUMMARY_ITEMS = 10
+SUMMARY_CHARS = 1000
+
+# Канал структурированных событий ленты изменений (app/core/changes.py)
+CHANGES = "book_changes"
+# Книг в одном кадре снимка
+SNAPSHOT_CHUNK = 1000
+
+formatter = Formatter()
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _brief(value) -> str:
+    if isinstance(value, dict):
+        items = ", ".join(
+            f"{key!r}: {_brief(item)}"
+            for key, item in islice(value.items(), SUMMARY_ITEMS)
+            )
+        if len(value) > SUMMARY_ITEMS:
+            items += f", ... всего {len(value)}"
+        return "{" + items + "}"
+    if (
+        isinstance(value, (list, tuple, set, frozenset))
+        and len(value) > SUMMARY_ITEMS
+    ):
+        items = ", ".join(map(repr, islice(value, SUMMARY_ITEMS)))
+        return f"[{items}, ... всего {len(value)}]"
+    return repr(value)
+
+
+def summarize(value) -> str:
+    """Строка значения для подстановки в уведомление"""
+    if isinstance(value, (dict, list, tuple, set, frozenset)):
+        text = _brief(value)
+    else:
+        text = str(value)
+    if len(text) > SUMMARY_CHARS:
+        text = text[:SUMMARY_CHARS] + "..."
+    return text
+
+
+class NotifyTemplate:
+    """Шаблон уведомления (синтаксис str.format), разобранный один раз
+    при декорировании"""
+
+    def __init__(self, message: str):
+        self.message = message
+        self.parts = []
+        auto_index = 0
+        for literal, field, spec, conversion in formatter.parse(message):
+            if field == "":
+                field = str(auto_index)
+                auto_index += 1
+            self.parts.append((literal, field, spec, conversion))
+        # Шаблон без подстановок - готовая строка
+        self.static = None
+        if all(field is None for _, field, _, _ in self.parts):
+            self.static = "".join(literal for literal, *_ in self.parts)
+
+    def render(self, args: tuple, values: dict) -> str:
+        if self.static is not None:
+            return self.static
+        chunks = []
+        for literal, field, spec, conversion in self.parts:
+            chunks.append(literal)
+            if field is None:
+                continue
+            value, _ = formatter.get_field(field, args, values)
+            if conversion:
+                value = formatter.convert_field(value, conversion)
+            chunks.append(format(summarize(value), spec))
+        return "".join(chunks)
+
+
+class Subscriber:
+    """Подключение к каналу с собственной очередью исходящих сообщений.
+    Сообщения отправляет отдельная задача writer"""
+
+    def __init__(self, websocket, queue_size: int, batch: bool = False):
+        self.websocket = websocket
+        # Клиент получает уведомления пачками: JSON массив в одном кадре
+        self.batch = batch
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        # Когда очередь поднялась выше порога (None - ниже порога)
+        self.over_since: float | None = None
+        self.writer: asyncio.Task | None = None
+        # Последнее отправленное событие ленты изменений
+        self.last_seq = 0
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[str, set] = {
-            "book_updates": set(),
-            "admin_notifications": set()
+    def __init__(
+        self,
+        queue_size: int = 10_000,
+        overflow: str = DROP_OLDEST,
+        client_queue_size: int = 1000,
+        client_high_water: int = 500,
+        evict_after: float = 5.0,
+        batch_window: float = 0.02,
+        batch_size: int = 100,
+            ):
+        # Канал -> подключение -> его очередь отправки
+        self.active_connections: dict[str, dict] = {
+            "book_updates": {},
+            "admin_notifications": {},
+            CHANGES: {},
+        }
+        # Фильтры подписчиков ленты изменений
+        self.subscriptions = SubscriptionIndex()
+        # Очередь каждого подключения ограничена client_queue_size.
+        # Клиент, чья очередь дольше evict_after секунд держится выше
+        # client_high_water (или переполнилась), отключается
+        self.client_queue_size = client_queue_size
+        self.client_high_water = client_high_water
+        self.evict_after = evict_after
+        # Для клиентов с batch уведомления канала копятся batch_window
+        # секунд (или до batch_size штук) и уходят одним кадром
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.batches: dict[str, list[str]] = {}
+        self.batch_timers: dict[str, asyncio.TimerHandle] = {}
+        # Уведомления не рассылаются в обработчике запроса:
+        # они кладутся в ограниченную очередь, которую разбирает
+        # фоновая задача (см. start)
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.queue: asyncio.Queue | None = None
+        self.dispatcher: asyncio.Task | None = None
+        # Цикл событий рассылки: через него публикуют другие потоки
+        self.loop: asyncio.AbstractEventLoop | None = None
+        # Связь с другими процессами сервера (см. broker.py)
+        self.link: BrokerLink | None = None
+        self.stats = {
+            "published": 0,
+            "delivered": 0,
+            "dropped_oldest": 0,
+            "dropped_newest": 0,
+            "failed": 0,
+            "evicted": 0,
+            "send_failed": 0,
+            "batches": 0,
+        }
+
+    def start(
+        self,
+        queue_size: int | None = None,
+        overflow: str | None = None,
+        client_queue_size: int | None = None,
+        evict_after: float | None = None,
+        batch_window: float | None = None,
+        batch_size: int | None = None,
+        broker: str | None = None,
+            ):
+        """Создаём очередь и запускаем фоновую рассылку.
+        Вызывается при старте приложения из работающего цикла событий.
+        broker - путь к Unix сокету брокера, если процессов несколько"""
+        if client_queue_size is not None:
+            self.client_queue_size = client_queue_size
+            self.client_high_water = client_queue_size // 2
+        if evict_after is not None:
+            self.evict_after = evict_after
+        if batch_window is not None:
+            self.batch_window = batch_window
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if overflow is not None:
+            if overflow not in OVERFLOW_POLICIES:
+                raise ValueError(
+                    f"Неизвестная политика переполнения: {overflow}"
+                    )
+            self.overflow = overflow
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if broker is not None and self.link is None:
+            self.link = BrokerLink(broker, self.broadcast)
+            self.link.start()
+        if self.dispatcher is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.queue_size)
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        """Останавливаем фоновую рассылку и задачи отправки"""
+        for subscribers in self.active_connections.values():
+            for subscriber in subscribers.values():
+                subscriber.writer.cancel()
+        for timer in self.batch_timers.values():
+            timer.cancel()
+        self.batch_timers.clear()
+        self.batches.clear()
+        if self.link is not None:
+            await self.link.stop()
+            self.link = None
+        if self.dispatcher is None:
+            return
+        self.dispatcher.cancel()
+        try:
+            await self.dispatcher
+        except asyncio.CancelledError:
+            pass
+        self.dispatcher = self.queue = self.loop = None
+
+    async def _dispatch(self):
+        while True:
+            message, channel = await self.queue.get()
+            try:
+                if self.link is not None:
+                    # Сначала другим процессам: своим клиентам
+                    # сообщение только ставится в очереди
+                    self.link.send(message, channel)
+                await self.broadcast(message, channel)
+                self.stats["delivered"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"Ошибка рассылки в канал {channel}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def publish(self, message: str, channel: str):
+        """Ставим уведомление в очередь рассылки.
+        Не ждёт доставки: при переполнении действует политика overflow"""
+        if self.dispatcher is None:
+            self.start()
+        if self.overflow == BLOCK:
+            self.stats["published"] += 1
+            await self.queue.put((message, channel))
+            return
+        self._put_nowait(message, channel)
+
+    def _put_nowait(self, message: str, channel: str):
+        self.stats["published"] += 1
+        item = (message, channel)
+        if self.queue.full():
+            if self.overflow == DROP_NEWEST:
+                self.stats["dropped_newest"] += 1
+                return
+            if self.overflow == BLOCK:
+                # Ждать места может только publish и publish_threadsafe
+                # из другого потока. Здесь (цикл событий рассылки)
+                # ждать нельзя, и новое уведомление отбрасывается
+                self.stats["dropped_newest"] += 1
+                return
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.stats["dropped_oldest"] += 1
+        self.queue.put_nowait(item)
+
+    def publish_threadsafe(self, message: str, channel: str):
+        """Ставим уведомление в очередь из другого потока (SOAP сервер).
+        Сообщение передаётся циклу событий рассылки; вызывающий поток
+        не ждёт доставки. При политике block он ждёт места в очереди
+        (не дольше BLOCK_TIMEOUT), поэтому уведомления одного потока
+        не обгоняют друг друга и не копятся вне очереди"""
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            if self.overflow != BLOCK or _running_loop() is loop:
+                loop.call_soon_threadsafe(self._put_nowait, message, channel)
+                return
+            future = asyncio.run_coroutine_threadsafe(
+                self.publish(message, channel), loop
+                )
+        except RuntimeError:
+            # Цикл событий уже закрыт (остановка приложения)
+            return
+        try:
+            future.result(BLOCK_TIMEOUT)
+        except TimeoutError:
+            future.cancel()
+            self.stats["dropped_newest"] += 1
+        except CancelledError:
+            pass
+
+    def publish_change(self, event: ChangeEvent):
+        """Подписчик ленты изменений. Вызывается в потоке изменения
+        под блокировкой бэкенда, поэтому только передаёт событие
+        в цикл событий рассылки"""
+        loop = self.loop
+        if loop is None or not self.has_subscribers(CHANGES):
+            return
+        try:
+            loop.call_soon_threadsafe(self._broadcast_change, event)
+        except RuntimeError:
+            pass
+
+    def _broadcast_change(self, event: ChangeEvent):
+        seq = event[0]
+        message = None
+        subscribers = self.active_connections[CHANGES]
+        # Только подписчики, чьи фильтры подходят под событие
+        for websocket in self.subscriptions.match(event):
+            subscriber = subscribers.get(websocket)
+            # Событие уже могло попасть к клиенту при переподключении
+            if subscriber is None or seq <= subscriber.last_seq:
+                continue
+            if message is None:
+                message = event_json(event)
+            subscriber.last_seq = seq
+            self._enqueue(subscriber, message, CHANGES)
+
+    async def subscribe_changes(
+        self,
+        websocket,
+        since: int | None = None,
+        filters: list[dict] | None = None,
+            ):
+        """Подключает клиента к ленте изменений.
+        since - последний полученный клиентом seq: клиент получит
+        только пропущенные события. Если они уже вытеснены из буфера,
+        сначала отправляется полный снимок книг.
+        filters - фильтры подписки (см. set_change_filters)"""
+        if since is not None and change_feed.since(since) is not None:
+            start = since
+        else:
+            start = change_feed.seq
+        if since is not None and start != since:
+            await self._send_snapshot(websocket, start)
+        else:
+            await websocket.send_text(json.dumps(
+                {"type": "hello", "seq": change_feed.seq}
+                ))
+        # Между регистрацией и постановкой пропущенных событий в очередь
+        # нет await: следующие события придут после них и без пропусков
+        await self.connect(websocket, CHANGES)
+        self.subscriptions.set(websocket, filters or [])
+        subscriber = self.active_connections[CHANGES][websocket]
+        subscriber.last_seq = start
+        events = change_feed.since(start)
+        if events is None:
+            # Пока отправлялся снимок, буфер успел обновиться целиком:
+            # клиент переподключится с since и получит новый снимок
+            self.disconnect(websocket, CHANGES)
+            await self._close(websocket, code=1013)
+            return
+        for event in events:
+            subscriber.last_seq = event[0]
+            if self.subscriptions.accepts(websocket, event):
+                self._enqueue(subscriber, event_json(event), CHANGES)
+
+    def set_change_filters(self, websocket, filters) -> int:
+        """Заменяет фильтры подписчика ленты изменений (условия
+        BookFilter: id, id__gt, id__lt, title, title__startswith, ...).
+        Возвращает число фильтров, ValueError - при ошибке в фильтрах"""
+        parsed = parse_filters(filters)
+        if websocket in self.active_connections[CHANGES]:
+            self.subscriptions.set(websocket, parsed)
+        return len(parsed)
+
+    @staticmethod
+    async def _send_snapshot(websocket, seq: int):
+        """Все книги кадрами по SNAPSHOT_CHUNK. Снимок читается после
+        события seq и может уже содержать часть следующих событий:
+        клиент применяет события как upsert и удаление по id"""
+        chunk = []
+        async for book in book_storage.iter_books(
+                chunk_size=SNAPSHOT_CHUNK):
+            chunk.append({"id": book.id, "title": book.title})
+            if len(chunk) == SNAPSHOT_CHUNK:
+                await websocket.send_text(json.dumps(
+                    {"type": "snapshot", "seq": seq, "books": chunk},
+                    ensure_ascii=False,
+                    ))
+                chunk = []
+        if chunk:
+            await websocket.send_text(json.dumps(
+                {"type": "snapshot", "seq": seq, "books": chunk},
+                ensure_ascii=False,
+                ))
+        await websocket.send_text(json.dumps(
+            {"type": "snapshot_end", "seq": seq}
+            ))
+
+    def has_subscribers(self, channel: str) -> bool:
+        # Подписчики других процессов неизвестны: при связи
+        # с брокером уведомления готовятся всегда
+        if self.link is not None and self.link.connected:
+            return True
+        return bool(self.active_connections.get(channel))
+
+    def statistics(self) -> dict:
+        """Счётчики очереди уведомлений и очередей подключений"""
+        channels = {}
+        for channel, subscribers in self.active_connections.items():
+            depths = [
+                subscriber.queue.qsize()
+                for subscriber in subscribers.values()
+            ]
+            channels[channel] = {
+                "subscribers": len(depths),
+                "queued": sum(depths),
+                "max_queue_depth": max(depths, default=0),
+                "over_high_water": sum(
+                    depth > self.client_high_water for depth in depths
+                    ),
+            }
+        return self.stats | {
+            "overflow": self.overflow,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "client_queue_size": self.client_queue_size,
+            "client_high_water": self.client_high_water,
+            "channels": channels,
+            "broker": self.link.stats if self.link else None,
         }
 
-    async def connect(self, websocket, channel: str):
-        """Регистрируем новое подключение к каналу"""
+    async def connect(self, websocket, channel: str, batch: bool = False):
+        """Регистрируем новое подключение к каналу.
+        batch - получать уведомления пачками (JSON массив в кадре)"""
         if channel not in self.active_connections:
-            self.active_connections[channel] = set()
-        self.active_connections[channel].add(websocket)
+            self.active_connections[channel] = {}
+        subscriber = Subscriber(websocket, self.client_queue_size, batch)
+        subscriber.writer = asyncio.create_task(
+            self._write(subscriber, channel)
+            )
+        self.active_connections[channel][websocket] = subscriber
 
     def disconnect(self, websocket, channel: str):
         """Удаляем подключение из канала"""
+        if channel == CHANGES:
+            self.subscriptions.remove(websocket)
         if channel in self.active_connections:
-            self.active_connections[channel].discard(websocket)
+            subscriber = self.active_connections[channel].pop(
+                websocket, None
+                )
+            if subscriber is not None:
+                subscriber.writer.cancel()
+
+    async def _write(self, subscriber: Subscriber, channel: str):
+        """Отправляет сообщения из очереди подключения по порядку"""
+        while True:
+            message = await subscriber.queue.get()
+            try:
+                await subscriber.websocket.send_text(message)
+            except Exception:
+                # Соединение разорвано: дальше отправлять некуда
+                self.stats["send_failed"] += 1
+                if channel == CHANGES:
+                    self.subscriptions.remove(subscriber.websocket)
+                self.active_connections[channel].pop(
+                    subscriber.websocket, None
+                    )
+                return
+
+    def _evict(self, subscriber: Subscriber, channel: str):
+        """Отключает клиента, который не успевает читать сообщения"""
+        self.disconnect(subscriber.websocket, channel)
+        self.stats["evicted"] += 1
+        asyncio.create_task(self._close(subscriber.websocket))
+
+    @staticmethod
+    async def _close(websocket, code: int = 1008):
+        try:
+            # 1008 - нарушение политики: клиент не читает сообщения
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _enqueue(self, subscriber: Subscriber, message: str, channel: str):
+        queue = subscriber.queue
+        if queue.qsize() > self.client_high_water:
+            now = time.monotonic()
+            if subscriber.over_since is None:
+                subscriber.over_since = now
+            elif now - subscriber.over_since > self.evict_after:
+                self._evict(subscriber, channel)
+                return
+        else:
+            subscriber.over_since = None
+        if queue.full():
+            self._evict(subscriber, channel)
+            return
+        queue.put_nowait(message)
 
     async def send_personal_message(self, message: str, websocket):
         """Отправляем сообщение конкретному подключению"""
         await websocket.send_text(message)
 
+    def reply(self, websocket, channel: str, message: str):
+        """Ответ одному подключению через его очередь: ответы
+        параллельных команд не перемешиваются с уведомлениями
+        в одной отправке и не обгоняют writer"""
+        subscriber = self.active_connections.get(channel, {}).get(websocket)
+        if subscriber is not None:
+            self._enqueue(subscriber, message, channel)
+
     async def broadcast(self, message: str, channel: str):
-        """Отправляем сообщение всем подписчикам канала"""
+        """Отправляем сообщение всем подписчикам канала.
+        Сообщение только ставится в очередь каждого подключения,
+        отправляют их задачи writer"""
         if channel in self.active_connections:
-            for connection in self.active_connections[channel]:
-                await connection.send_text(message)
+            # Копия: медленные клиенты удаляются во время обхода
+            subscribers = tuple(self.active_connections[channel].values())
+            batch = False
+            for subscriber in subscribers:
+                if subscriber.batch:
+                    batch = True
+                    continue
+                self._enqueue(subscriber, message, channel)
+            if batch:
+                self._add_to_batch(message, channel)
+
+    def _add_to_batch(self, message: str, channel: str):
+        messages = self.batches.setdefault(channel, [])
+        messages.append(message)
+        if len(messages) >= self.batch_size:
+            self._flush_batch(channel)
+        elif len(messages) == 1:
+            self.batch_timers[channel] = asyncio.get_running_loop().call_later(
+                self.batch_window, self._flush_batch, channel
+                )
+
+    def _flush_batch(self, channel: str):
+        """Отправляет накопленные уведомления канала одним кадром"""
+        timer = self.batch_timers.pop(channel, None)
+        if timer is not None:
+            timer.cancel()
+        messages = self.batches.pop(channel, None)
+        if not messages:
+            return
+        # Кадр сериализуется один раз для всех клиентов канала
+        frame = json.dumps(messages, ensure_ascii=False)
+        self.stats["batches"] += 1
+        for subscriber in tuple(self.active_connections[channel].values()):
+            if subscriber.batch:
+                self._enqueue(subscriber, frame, channel)
 
     def broadcast_sync(self, message: str, channel: str):
-        """Отправляем сообщение всем подписчикам канала"""
-        if channel in self.active_connections:
-            for connection in self.active_connections[channel]:
-                run(connection.send_text(message))
+        """Отправляем сообщение всем подписчикам канала из другого потока.
+        Сокеты принадлежат циклу событий рассылки, поэтому сообщение
+        только передаётся в его очередь"""
+        if self.has_subscribers(channel):
+            self.publish_threadsafe(message, channel)
 
     def notify(self, message: str, channel: str):
+        # Шаблон разбирается один раз; без подписчиков канала
+        # уведомление не форматируется вовсе
+        template = NotifyTemplate(message)
+
         def decorator(func):
+            func_name = func.__name__
+
+            async def send(args, kwargs, result, error):
+                await self.publish(
+                    template.render(
+                        args, kwargs | {
+                            'channel': channel,
+                            'message': message,
+                            'result': result,
+                            'args': args,
+                            'kwargs': kwargs,
+                            'func_name': func_name,
+                            'error': error
+                            }
+                        ), channel)
+
             @wraps(func)
             async def wrapper(*args, **kwargs):
                 try:
                     result = await func(*args, **kwargs)
-                    await self.broadcast(
-                        message.format(
-                            *args, **kwargs | {
-                                'channel': channel,
-                                'message': message,
-                                'result': result,
-                                'args': args,
-                                'kwargs': kwargs,
-                                'func_name': func.__name__,
-                                'error': None
-                                }
-                            ), channel)
-                    return result
                 except Exception as e:
-                    await self.broadcast(
-                        message.format(
-                            *args, **kwargs | {
-                                'channel': channel,
-                                'message': message,
-                                'result': e,
-                                'args': args,
-                                'kwargs': kwargs,
-                                'func_name': func.__name__,
-                                'error': e
-                                }
-                            ), channel)
+                    if self.has_subscribers(channel):
+                        await send(args, kwargs, e, e)
                     raise e
+                if self.has_subscribers(channel):
+                    await send(args, kwargs, result, None)
+                return result
             return wrapper
         return decorator
 
@@ -0,0 +1,126 @@
+# Бенчмарк задержки доставки уведомлений между процессами через брокер
+# (app/websocket_api/broker.py), как при uvicorn --workers N.
+# Брокер работает в основном процессе, отправитель и получатели -
+# в отдельных процессах с BrokerLink. В каждом уведомлении - время
+# отправки по CLOCK_MONOTONIC (общие часы всех процессов), получатели
+# считают задержку по каждому уведомлению
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.broker_latency --receivers 1 3 7 --messages 20000
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from app.websocket_api.broker import Broker, BrokerLink, HEADER
+
+CHANNEL = "book_updates"
+
+
+def percentile(values: list, share: float) -> float:
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def receiver(path: str, messages: int, ready, results):
+    async def main():
+        latencies = []
+        done = asyncio.Event()
+
+        async def deliver(message: str, channel: str):
+            latencies.append(time.monotonic_ns() - int(message[:20]))
+            if len(latencies) == messages:
+                done.set()
+
+        link = BrokerLink(path, deliver)
+        link.start()
+        while not link.connected:
+            await asyncio.sleep(0.01)
+        ready.put(True)
+        await done.wait()
+        await link.stop()
+        results.put(latencies)
+
+    asyncio.run(main())
+
+
+def sender(path: str, args, ready):
+    async def main():
+        link = BrokerLink(path, None)
+        link.start()
+        while not link.connected:
+            await asyncio.sleep(0.01)
+        padding = "x" * max(args.size - 21, 0)
+        start = time.perf_counter()
+        for number in range(args.messages):
+            link.send(f"{time.monotonic_ns():020d} {padding}", CHANNEL)
+            if number % args.burst == args.burst - 1:
+                # Темп отправки: пачками по burst уведомлений
+                await asyncio.sleep(args.pause)
+        await link.writer.drain()
+        ready.put(time.perf_counter() - start)
+        # Соединение держим, пока получатели дочитывают
+        await asyncio.sleep(args.messages / 10_000 + 1)
+        await link.stop()
+
+    asyncio.run(main())
+
+
+async def run_case(path: str, receivers: int, args) -> None:
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Queue(), context.Queue()
+    broker = Broker(path)
+    await broker.start()
+    processes = [
+        context.Process(
+            target=receiver, args=(path, args.messages, ready, results)
+            )
+        for _ in range(receivers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        await asyncio.to_thread(ready.get)
+    sending = context.Process(target=sender, args=(path, args, ready))
+    sending.start()
+    elapsed = await asyncio.to_thread(ready.get)
+    latencies = []
+    for _ in processes:
+        latencies.extend(await asyncio.to_thread(results.get))
+    for process in (*processes, sending):
+        await asyncio.to_thread(process.join)
+    await broker.stop()
+
+    latencies = sorted(value / 1000 for value in latencies)
+    print(
+        f"{receivers:>3} получателей | "
+        f"{args.messages / elapsed:10,.0f} увед/с | "
+        f"p50 {statistics.median(latencies):8.1f} мкс | "
+        f"p99 {percentile(latencies, 0.99):8.1f} мкс | "
+        f"max {latencies[-1]:9.1f} мкс"
+        )
+
+
+async def run(args) -> None:
+    print(
+        f"Уведомление {args.size} байт, кадр {args.size + HEADER.size} "
+        f"байт; пачки по {args.burst} каждые {args.pause * 1000:g} мс"
+        )
+    for receivers in args.receivers:
+        await run_case(args.path, receivers, args)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/tmp/broker_latency.sock")
+    parser.add_argument("--receivers", type=int, nargs="+", default=[1, 3, 7])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--pause", type=float, default=0.001)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Бенчмарк кеша документов GraphQL и сохранённых запросов.
+# Приложение FastAPI вызывается напрямую через ASGI (httpx), без сети,
+# чтобы в замер входила только обработка запроса: разбор тела, разбор
+# и валидация запроса GraphQL, выполнение и сериализация ответа.
+# Сравниваются три режима для одного и того же запроса books:
+#   - без кеша: GraphQLRouter со схемой без CachedDocuments
+#   - кеш: текст запроса, документ берётся из кеша по sha256 текста
+#   - сохранённый запрос: клиент отправляет только хеш
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.graphql_cache --books 1000 --limit 10
+import argparse
+import asyncio
+import time
+
+import httpx
+import strawberry
+from fastapi import FastAPI
+from strawberry.fastapi import GraphQLRouter
+
+from app.core.storage import BookModel, book_storage
+from app.graphql_api.loaders import get_context
+from app.graphql_api.persisted import (
+    PersistedQueryRouter, QueryLimiter, document_cache, query_hash,
+)
+from app.graphql_api.schema import Mutation, Query, schema
+
+QUERY = """
+query Books($limit: Int, $after: String) {
+  books(limit: $limit, after: $after) {
+    id
+    title
+    cursor
+  }
+}
+"""
+
+
+def create_app() -> FastAPI:
+    plain = strawberry.Schema(
+        query=Query, mutation=Mutation, extensions=[QueryLimiter()]
+        )
+    app = FastAPI()
+    app.include_router(
+        GraphQLRouter(schema=plain, context_getter=get_context),
+        prefix="/plain",
+        )
+    app.include_router(
+        PersistedQueryRouter(
+            schema=schema, context_getter=get_context, cache=document_cache
+            ),
+        prefix="/graphql",
+        )
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, body: dict, args):
+    """Запросов в секунду за args.duration секунд из args.tasks задач"""
+    response = await client.post(path, json=body)
+    assert "errors" not in response.json(), response.json()
+    deadline = time.perf_counter() + args.duration
+    counts = []
+
+    async def worker():
+        done = 0
+        while time.perf_counter() < deadline:
+            await client.post(path, json=body)
+            done += 1
+        counts.append(done)
+
+    await asyncio.gather(*(worker() for _ in range(args.tasks)))
+    return sum(counts) / args.duration
+
+
+async def run(args) -> None:
+    await book_storage.add_books([
+        BookModel(title=f"Книга {number}") for number in range(args.books)
+    ])
+    variables = {"limit": args.limit}
+    persisted = {"persistedQuery": {
+        "version": 1, "sha256Hash": query_hash(QUERY)
+    }}
+    modes = (
+        ("без кеша", "/plain", {"query": QUERY, "variables": variables}),
+        ("кеш документов", "/graphql",
+         {"query": QUERY, "variables": variables}),
+        ("сохранённый запрос", "/graphql",
+         {"variables": variables, "extensions": persisted}),
+    )
+    transport = httpx.ASGITransport(create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+            ) as client:
+        baseline = None
+        for name, path, body in modes:
+            rate = await measure(client, path, body, args)
+            baseline = baseline or rate
+            print(f"{name:20} | {rate:10,.0f} запр/с | x{rate / baseline:.2f}")
+    print(f"Кеш: {document_cache.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
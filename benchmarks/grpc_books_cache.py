@@ -0,0 +1,129 @@
+# Бенчмарк ответа gRPC GetBooks: прежний путь (сообщение Book на каждую
+# книгу и сериализация BooksResponse) против склейки закодированных
+# заранее книг (app/grpc_api/cache.py).
+# Для каждого размера замеряется отдельно сборка и сериализация ответа
+# и вызов GetBooks целиком через локальный сервер grpc.aio (клиент
+# в том же процессе). Кеш прогревается первым вызовом
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.grpc_books_cache --books 10000 100000
+import argparse
+import asyncio
+import time
+
+import grpc
+
+from app.core.storage import BookModel, BookTable, book_storage
+from app.grpc_api import book_pb2, book_pb2_grpc, service
+from app.grpc_api.cache import BookWireCache
+
+# Ответ на 100 000 книг больше ограничения grpc по умолчанию (4 МБ)
+OPTIONS = [
+    ("grpc.max_send_message_length", 64 * 1024 * 1024),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+]
+
+
+class LegacyBookService(service.BookService):
+    """GetBooks без кеша, как до появления cache.py"""
+
+    async def GetBooks(self, request, context):
+        filters = service.book_filters(request)
+        books = await book_storage.get_books(**filters)
+        return book_pb2.BooksResponse(
+            books=[
+                book_pb2.Book(id=book.id, title=book.title) for book in books
+            ],
+            next_cursor=service.next_cursor(books, filters['limit']) or ''
+        )
+
+
+def timed(function, repeat: int) -> float:
+    """Среднее время вызова в мс"""
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def call_time(port: int, size: int, repeat: int) -> float:
+    async with grpc.aio.insecure_channel(
+            f"127.0.0.1:{port}", options=OPTIONS) as channel:
+        stub = book_pb2_grpc.BookServiceStub(channel)
+        request = book_pb2.BookFilter(limit=size)
+        response = await stub.GetBooks(request)
+        assert len(response.books) == size
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await stub.GetBooks(request)
+        return (time.perf_counter() - start) / repeat * 1000
+
+
+async def start_server(register, service_instance) -> tuple:
+    server = grpc.aio.server(options=OPTIONS)
+    register(service_instance, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    return server, port
+
+
+async def run(args) -> None:
+    table = BookTable()
+    table.add_books([
+        BookModel(title=f"Книга номер {number}")
+        for number in range(max(args.books))
+    ])
+    book_storage.backend = table
+    legacy, legacy_port = await start_server(
+        book_pb2_grpc.add_BookServiceServicer_to_server, LegacyBookService()
+        )
+    cached, cached_port = await start_server(
+        service.add_book_service, service.BookService()
+        )
+    try:
+        print(f"{'книг':>8} | {'путь':14} | {'сериализация':>14} | "
+              f"{'вызов GetBooks':>14}")
+        for size in args.books:
+            books = await book_storage.get_books(limit=size)
+            cache = BookWireCache()
+            cursor = service.next_cursor(books, size) or ''
+
+            def legacy_encode():
+                return book_pb2.BooksResponse(
+                    books=[
+                        book_pb2.Book(id=book.id, title=book.title)
+                        for book in books
+                    ],
+                    next_cursor=cursor,
+                ).SerializeToString()
+
+            def cached_encode():
+                return cache.books_response(books, cursor)
+
+            assert legacy_encode() == cached_encode()
+            for name, encode, port in (
+                ("сообщения", legacy_encode, legacy_port),
+                ("кеш", cached_encode, cached_port),
+            ):
+                encode_ms = timed(encode, args.repeat)
+                call_ms = await call_time(port, size, args.repeat)
+                print(f"{size:>8} | {name:14} | {encode_ms:11.2f} мс | "
+                      f"{call_ms:11.2f} мс")
+    finally:
+        await legacy.stop(0)
+        await cached.stop(0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--books", type=int, nargs="+", default=[10_000, 100_000]
+        )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Бенчмарк накладных расходов декоратора ConnectionManager.notify
+# на один запрос при 0, 1 и 1000 подписчиках канала.
+# Декорируется обработчик, возвращающий список книг (как GET /rest/),
+# двумя декораторами, как в REST API. Подписчики - заглушки
+# websocket с мгновенной отправкой, поэтому в замер входит вся работа
+# цикла событий: форматирование, очередь и рассылка по очередям
+# подключений. Для сравнения замеряется прежний декоратор, который
+# форматировал сообщение в каждом запросе
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.notify_overhead --books 1000
+import argparse
+import asyncio
+import time
+from functools import wraps
+
+from app.websocket_api.manager import ConnectionManager
+
+TEMPLATE = """[INFO] REST: Получение списка всех книг:
+    function: {func_name},
+    title: {title},
+    limit: {limit},
+    return: {result},
+    error: {error}
+"""
+
+
+class StubWebSocket:
+    async def send_text(self, message: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def legacy_notify(manager: ConnectionManager, message: str, channel: str):
+    """Прежний декоратор: форматирование в каждом запросе"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            result = await func(*args, **kwargs)
+            await manager.publish(
+                message.format(
+                    *args, **kwargs | {
+                        'channel': channel,
+                        'message': message,
+                        'result': result,
+                        'args': args,
+                        'kwargs': kwargs,
+                        'func_name': func.__name__,
+                        'error': None
+                        }
+                    ), channel)
+            return result
+        return wrapper
+    return decorator
+
+
+async def measure(handler, requests: int) -> float:
+    """Среднее время запроса в микросекундах. После каждого запроса
+    цикл событий успевает разослать уведомления, как между
+    запросами настоящего сервера"""
+    start = time.perf_counter()
+    for _ in range(requests):
+        await handler(title=None, limit=None)
+        await asyncio.sleep(0)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def run(args) -> None:
+    books = [
+        {"id": book_id, "title": f"Книга {book_id}"}
+        for book_id in range(args.books)
+    ]
+
+    async def get_books(title=None, limit=None):
+        return {"books": books, "next_cursor": None}
+
+    baseline = await measure(get_books, args.requests)
+    print(f"без декоратора: {baseline:10.1f} мкс/запрос")
+
+    for subscribers in (0, 1, 1000):
+        for name, decorate in (
+            ("notify", ConnectionManager.notify),
+            ("прежний", legacy_notify),
+        ):
+            manager = ConnectionManager(client_queue_size=args.requests)
+            manager.start()
+            for _ in range(subscribers):
+                await manager.connect(StubWebSocket(), "admin_notifications")
+            handler = decorate(
+                manager, "[INFO] REST: Получение списка всех книг",
+                "book_updates"
+                )(decorate(manager, TEMPLATE, "admin_notifications")(
+                    get_books
+                    ))
+            elapsed = await measure(handler, args.requests)
+            await manager.stop()
+            print(
+                f"{subscribers:>5} подписчиков | {name:8} | "
+                f"{elapsed:10.1f} мкс/запрос | "
+                f"накладные расходы {elapsed - baseline:10.1f} мкс"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Бенчмарк конкуренции: пропускная способность чтения
+# из BookStorage под параллельной нагрузкой на запись.
+# Читают asyncio задачи в цикле событий (как REST и GraphQL), а пишут
+# отдельные потоки через синхронный фасад (как SOAP сервер), поэтому
+# запись идёт одновременно с чтением, а не по очереди с ним
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.storage_contention --books 100000 --readers 8
+#
+# Режим "чтение под lock" оборачивает чтение в блокировку таблицы,
+# как это было до перехода на чтение без блокировки: цикл событий
+# ждёт, пока поток записи её отпустит. Режим "без записи" - чтение
+# без потоков записи, для сравнения
+import argparse
+import asyncio
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+from app.core.storage import BookStorage, BookTable, BookModel
+from app.core.sotrage_sync import BookStorage as BookStorageSync
+
+
+def fill(table: BookTable, count: int) -> None:
+    for i in range(count):
+        table.add_book(BookModel(title=f"Книга {i % 1000}"))
+
+
+async def reader(storage, stop, counter, locked: bool, span: int):
+    rnd = random.Random()
+    table = storage.backend
+    while not stop.is_set():
+        lock = table.lock if locked else nullcontext()
+        low = rnd.randrange(max(table.index - span, 1))
+        with lock:
+            await storage.get_books(id__gt=low, id__lt=low + span)
+        with lock:
+            await storage.get_book(rnd.randrange(table.index))
+        with lock:
+            await storage.get_books(title=f"Книга {rnd.randrange(1000)}")
+        counter[0] += 3
+        await asyncio.sleep(0)
+
+
+def write(storage, rnd) -> None:
+    storage.add_book(BookModel(title=f"Книга {rnd.randrange(1000)}"))
+    storage.update_book(
+        rnd.randrange(storage.backend.index), f"Книга {rnd.randrange(1000)}"
+        )
+    storage.delete_book(rnd.randrange(storage.backend.index))
+
+
+def thread_writer(storage: BookStorageSync, stop, counter, rate: float):
+    # rate - записей в секунду на поток (0 - без ограничения).
+    # Без ограничения потоки записи забирают почти весь GIL
+    # и замеряется в основном он, а не блокировка таблицы
+    rnd = random.Random()
+    start = time.perf_counter()
+    written = 0
+    while not stop.is_set():
+        write(storage, rnd)
+        written += 3
+        counter[0] += 3
+        if rate:
+            delay = start + written / rate - time.perf_counter()
+            if delay > 0:
+                stop.wait(delay)
+
+
+async def run(
+    args,
+    locked: bool,
+    writers: int
+        ) -> tuple[float, float]:
+    table = BookTable()
+    fill(table, args.books)
+    storage = BookStorage(table)
+    stop = asyncio.Event()
+    thread_stop = threading.Event()
+    reads, writes = [0], [0]
+    threads = [
+        threading.Thread(
+            target=thread_writer,
+            args=(BookStorageSync(table), thread_stop, writes,
+                  args.write_rate)
+            )
+        for _ in range(writers)
+    ]
+    tasks = [
+        asyncio.create_task(reader(storage, stop, reads, locked, args.span))
+        for _ in range(args.readers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    thread_stop.set()
+    await asyncio.gather(*tasks)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return reads[0] / elapsed, writes[0] / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=8)
+    # Потоки записи
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--write-rate", type=float, default=20_000)
+    parser.add_argument("--span", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for mode, locked, writers in (
+        ("без записи", False, 0),
+        ("чтение под lock", True, args.writers),
+        ("чтение без lock", False, args.writers),
+    ):
+        reads, writes = asyncio.run(run(args, locked, writers))
+        print(
+            f"{mode:16} | чтений/с: {reads:12.0f}"
+            f" | записей/с: {writes:10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
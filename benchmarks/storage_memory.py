@@ -0,0 +1,70 @@
+# Бенчмарк памяти: байт на книгу в колоночной BookTable
+# по сравнению с прежней схемой (объект с __dict__ на каждую книгу,
+# словарь id -> книга, список id и индекс название -> set id)
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.storage_memory --books 1000000
+import argparse
+import gc
+import tracemalloc
+
+from app.core.storage import BookTable, BookModel
+
+
+class LegacyBookModel:
+    def __init__(self, title: str, id: int = 0):
+        self.id: int = id
+        self.title: str = title
+
+
+def legacy_table(titles):
+    books, ids, index = {}, [], {}
+    for book_id, title in enumerate(titles):
+        book = LegacyBookModel(title=title, id=book_id)
+        books[book_id] = book
+        ids.append(book_id)
+        index.setdefault(title, set()).add(book_id)
+    return books, ids, index
+
+
+def compact_table(titles):
+    table = BookTable()
+    for title in titles:
+        table.add_book(BookModel(title=title))
+    return table
+
+
+def measure(build, titles) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build(titles)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument(
+        "--distinct", type=int, default=0,
+        help="число различных названий (0 - все названия уникальны)"
+        )
+    args = parser.parse_args()
+
+    # Названия создаются заранее и не входят в замер
+    distinct = args.distinct or args.books
+    pool = [f"Книга {i}" for i in range(distinct)]
+    titles = [pool[i % distinct] for i in range(args.books)]
+
+    for name, build in (
+        ("прежняя модель", legacy_table),
+        ("BookTable", compact_table),
+    ):
+        size = measure(build, titles)
+        print(f"{name:16} | байт на книгу: {size / args.books:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
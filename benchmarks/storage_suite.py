@@ -0,0 +1,328 @@
+# Набор микробенчмарков хранилища книг (app/core/storage.py и
+# app/core/sotrage_sync.py) с проверкой на регрессию.
+# Замеряются вставка, get_book по id и по названию, get_books со всеми
+# сочетаниями фильтров, обновление, удаление и смешанная нагрузка
+# из параллельных asyncio задач. Вставка и загрузка снимка
+# (BookTable.load) замеряются и на уникальных названиях: каждое из них
+# новое для индексов. Результат (операций в секунду) сохраняется в JSON
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.storage_suite run --output new.json
+#   python -m benchmarks.storage_suite run --rows 1000 100000 1000000
+#
+# Сравнение с базовым прогоном: код возврата 1, если хотя бы одна
+# метрика стала медленнее больше чем на порог или пропала
+# из нового прогона
+#   python -m benchmarks.storage_suite compare base.json new.json
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from array import array
+from itertools import combinations
+
+from app.core.storage import BookStorage, BookTable, BookModel, encode_cursor
+from app.core.sotrage_sync import BookStorage as BookStorageSync
+
+DISTINCT_TITLES = 1000
+# Ширина диапазона id и размер страницы в фильтрах get_books
+SPAN = 100
+LIMIT = 50
+# Сколько книг добавляется и удаляется в замерах изменений
+CHANGES = 10_000
+# Сочетания фильтров get_books (кроме поиска по id - это get_book)
+RANGE_FILTERS = ("title", "id__gt", "id__lt", "limit")
+SEARCH_FILTERS = {
+    "title__startswith": "Книга 12",
+    "title__istartswith": "книга 12",
+    "title__contains": "нига 12",
+    "title__icontains": "НИГА 12",
+}
+
+
+def title(number: int) -> str:
+    return f"Книга {number % DISTINCT_TITLES}"
+
+
+def unique_title(number: int) -> str:
+    return f"Книга номер {number}"
+
+
+def measure(operation, arguments: list, min_time: float) -> float:
+    """Вызывает operation по кругу с аргументами из списка,
+    пока не пройдёт min_time. Возвращает операций в секунду"""
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for argument in arguments:
+            operation(*argument)
+        count += len(arguments)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+async def measure_async(operation, arguments: list, min_time: float):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for argument in arguments:
+            await operation(*argument)
+        count += len(arguments)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+def once(operation, arguments: list) -> float:
+    """Однократный проход по аргументам (для изменяющих операций)"""
+    start = time.perf_counter()
+    for argument in arguments:
+        operation(*argument)
+    return len(arguments) / (time.perf_counter() - start)
+
+
+async def once_async(operation, arguments: list) -> float:
+    start = time.perf_counter()
+    for argument in arguments:
+        await operation(*argument)
+    return len(arguments) / (time.perf_counter() - start)
+
+
+def load_rate(titles: list[str]) -> float:
+    """Строк в секунду при загрузке снимка в пустую таблицу"""
+    ids = array("q", range(len(titles)))
+    start = time.perf_counter()
+    BookTable().load(ids, titles, len(titles))
+    return len(titles) / (time.perf_counter() - start)
+
+
+def filter_cases(rows: int, rnd: random.Random) -> dict[str, list]:
+    """Аргументы get_books для каждого сочетания фильтров"""
+    cases = {}
+    for size in range(1, len(RANGE_FILTERS) + 1):
+        for names in combinations(RANGE_FILTERS, size):
+            arguments = []
+            for _ in range(64):
+                low = rnd.randrange(max(rows - SPAN, 1))
+                filters = {
+                    "title": title(rnd.randrange(DISTINCT_TITLES)),
+                    "id__gt": low,
+                    "id__lt": low + SPAN,
+                    "limit": LIMIT,
+                }
+                if "id__gt" not in names:
+                    # Без нижней границы диапазон берётся от начала
+                    filters["id__lt"] = SPAN
+                elif "id__lt" not in names:
+                    filters["id__gt"] = rows - SPAN
+                arguments.append({name: filters[name] for name in names})
+            cases["+".join(names)] = arguments
+    cases["after+limit"] = [
+        {"after": encode_cursor(rnd.randrange(rows)), "limit": LIMIT}
+        for _ in range(64)
+    ]
+    for name, value in SEARCH_FILTERS.items():
+        cases[name] = [{name: value, "limit": LIMIT}]
+    return cases
+
+
+async def mixed(storage: BookStorage, tasks: int, rnd: random.Random):
+    """Параллельные задачи: 80% чтений и 20% обновлений"""
+    rows = storage.backend.index
+    operations = 2000
+
+    async def worker(seed: int) -> None:
+        worker_rnd = random.Random(seed)
+        for _ in range(operations):
+            book_id = worker_rnd.randrange(rows)
+            choice = worker_rnd.random()
+            if choice < 0.4:
+                await storage.get_book(id=book_id)
+            elif choice < 0.8:
+                await storage.get_books(id__gt=book_id, limit=LIMIT)
+            else:
+                await storage.update_book(book_id, title(book_id + 1))
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(rnd.random()) for _ in range(tasks)))
+    return tasks * operations / (time.perf_counter() - start)
+
+
+async def run_size(rows: int, args) -> dict[str, float]:
+    rnd = random.Random(args.seed)
+    table = BookTable()
+    storage = BookStorage(table)
+    storage_sync = BookStorageSync(table)
+    results = {}
+
+    def report(name: str, value: float) -> None:
+        results[name] = round(value, 1)
+        print(f"{rows:>9} | {name:44} | {value:14,.1f} оп/с")
+
+    # Вставка: основная часть таблицы через синхронный фасад,
+    # затем ещё CHANGES книг через асинхронный
+    report("sync.add_book", once(
+        storage_sync.add_book,
+        [(BookModel(title=title(i)),) for i in range(rows)]
+        ))
+    changes = min(rows, CHANGES)
+    report("async.add_book", await once_async(
+        storage.add_book,
+        [(BookModel(title=title(i)),) for i in range(changes)]
+        ))
+    total = table.index
+    report("sync.add_book.unique_titles", once(
+        BookStorageSync(BookTable()).add_book,
+        [(BookModel(title=unique_title(i)),) for i in range(rows)]
+        ))
+    report("load.repeated_titles", load_rate(
+        [title(i) for i in range(rows)]
+        ))
+    report("load.unique_titles", load_rate(
+        [unique_title(i) for i in range(rows)]
+        ))
+
+    ids = [(rnd.randrange(total),) for _ in range(1000)]
+    titles = [(None, title(rnd.randrange(DISTINCT_TITLES)))
+              for _ in range(1000)]
+    report("sync.get_book.id", measure(
+        storage_sync.get_book, ids, args.min_time
+        ))
+    report("sync.get_book.title", measure(
+        storage_sync.get_book, titles, args.min_time
+        ))
+    report("async.get_book.id", await measure_async(
+        storage.get_book, ids, args.min_time
+        ))
+    report("async.get_book.title", await measure_async(
+        storage.get_book, titles, args.min_time
+        ))
+
+    for name, filters in filter_cases(total, rnd).items():
+        report(f"sync.get_books.{name}", measure(
+            lambda kwargs: storage_sync.get_books(**kwargs),
+            [(kwargs,) for kwargs in filters],
+            args.min_time,
+            ))
+    report("async.get_books.id__gt+limit", await measure_async(
+        lambda kwargs: storage.get_books(**kwargs),
+        [({"id__gt": book_id, "limit": LIMIT},) for (book_id,) in ids],
+        args.min_time,
+        ))
+
+    updates = [
+        (rnd.randrange(total), title(rnd.randrange(DISTINCT_TITLES)))
+        for _ in range(changes)
+    ]
+    report("sync.update_book", once(storage_sync.update_book, updates))
+    report("async.update_book", await once_async(
+        storage.update_book, updates
+        ))
+
+    report(f"async.mixed.{args.tasks}_tasks", await mixed(
+        storage, args.tasks, rnd
+        ))
+
+    deleted = rnd.sample(range(total), 2 * changes)
+    report("sync.delete_book", once(
+        storage_sync.delete_book,
+        [(book_id,) for book_id in deleted[:changes]]
+        ))
+    report("async.delete_book", await once_async(
+        storage.delete_book,
+        [(book_id,) for book_id in deleted[changes:]]
+        ))
+    return results
+
+
+def run(args) -> int:
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "min_time": args.min_time,
+        },
+        "results": {},
+    }
+    for rows in args.rows:
+        report["results"][str(rows)] = asyncio.run(run_size(rows, args))
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены: {args.output}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.base, encoding="utf-8") as file:
+        base = json.load(file)["results"]
+    with open(args.new, encoding="utf-8") as file:
+        new = json.load(file)["results"]
+    regressions = missing = 0
+    for rows, metrics in base.items():
+        for name, old in metrics.items():
+            value = new.get(rows, {}).get(name)
+            if value is None:
+                # Пропавший замер - тоже провал: иначе регрессию можно
+                # скрыть, переименовав или убрав метрику
+                missing += 1
+                print(f"{rows:>9} | {name:44} | {old:14,.1f} -> "
+                      f"{'нет':>14} | НЕТ В НОВОМ ПРОГОНЕ")
+                continue
+            if not old:
+                continue
+            change = value / old - 1
+            regressed = change < -args.threshold
+            regressions += regressed
+            mark = "РЕГРЕССИЯ" if regressed else ""
+            print((
+                f"{rows:>9} | {name:44} | {old:14,.1f} -> "
+                f"{value:14,.1f} | {change:+7.1%} {mark}"
+                ).rstrip())
+    if regressions:
+        print(f"Метрик с регрессией больше {args.threshold:.0%}: "
+              f"{regressions}")
+    if missing:
+        print(f"Метрик нет в новом прогоне: {missing}")
+    return 1 if regressions or missing else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="запустить замеры")
+    run_parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000, 100_000, 1_000_000]
+        )
+    run_parser.add_argument(
+        "--min-time", type=float, default=0.2,
+        help="минимальное время замера одной операции, с"
+        )
+    run_parser.add_argument("--tasks", type=int, default=8)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default="storage_suite.json")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser(
+        "compare", help="сравнить два прогона"
+        )
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="допустимое замедление (0.1 - на 10%%)"
+        )
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# Бенчмарк пропускной способности общего хранилища при 1..N процессах
+# сервера API (uvicorn --workers N). Запускается сервер хранилища
+# (app/core/storage_server.py), каждый процесс-клиент работает через
+# асинхронный фасад BookStorage с RemoteBookTable и выполняет
+# смешанную нагрузку из параллельных asyncio задач: 40% get_book,
+# 40% get_books и 20% update_book. Для сравнения замеряется один
+# процесс с таблицей в своей памяти (данные не общие)
+#
+# Запуск из корня репозитория:
+#   python -m benchmarks.storage_workers --workers 1 2 4 8
+#   python -m benchmarks.storage_workers --backend sqlite --path bench.db
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+from app.core.remote_storage import RemoteBookTable
+from app.core.storage import BookModel, BookStorage, BookTable
+from benchmarks.storage_suite import LIMIT, title
+
+CHUNK = 10_000
+
+
+async def mixed(storage: BookStorage, rows: int, args, seed: int) -> int:
+    """Операций за args.duration секунд из args.tasks задач"""
+    deadline = time.perf_counter() + args.duration
+    counts = []
+
+    async def worker(worker_seed: float) -> None:
+        rnd = random.Random(worker_seed)
+        done = 0
+        while time.perf_counter() < deadline:
+            book_id = rnd.randrange(rows)
+            choice = rnd.random()
+            if choice < 0.4:
+                await storage.get_book(id=book_id)
+            elif choice < 0.8:
+                await storage.get_books(id__gt=book_id, limit=LIMIT)
+            else:
+                await storage.update_book(book_id, title(book_id + 1))
+            await asyncio.sleep(0)
+            done += 1
+        counts.append(done)
+
+    rnd = random.Random(seed)
+    await asyncio.gather(*(worker(rnd.random()) for _ in range(args.tasks)))
+    return sum(counts)
+
+
+def client(path: str, rows: int, args, seed: int, start, results):
+    async def main():
+        backend = RemoteBookTable(path)
+        start.wait()
+        results.put(await mixed(BookStorage(backend), rows, args, seed))
+        backend.close()
+
+    asyncio.run(main())
+
+
+def load(backend, rows: int) -> None:
+    for low in range(0, rows, CHUNK):
+        backend.add_books([
+            BookModel(title=title(number))
+            for number in range(low, min(low + CHUNK, rows))
+        ])
+
+
+def start_server(args) -> subprocess.Popen:
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    command = [
+        sys.executable, "-m", "app.core.storage_server", args.socket,
+        "--backend", args.backend, "--path", args.path,
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    while not os.path.exists(args.socket):
+        if server.poll() is not None:
+            sys.exit("Сервер хранилища не запустился")
+        time.sleep(0.05)
+    return server
+
+
+def report(name: str, operations: int, args) -> None:
+    print(f"{name:24} | {operations / args.duration:12,.0f} оп/с")
+
+
+def run(args) -> None:
+    table = BookTable()
+    load(table, args.rows)
+    operations = asyncio.run(mixed(BookStorage(table), args.rows, args, 0))
+    report("1 процесс, своя память", operations, args)
+
+    server = start_server(args)
+    try:
+        backend = RemoteBookTable(args.socket)
+        load(backend, args.rows)
+        backend.close()
+        context = multiprocessing.get_context("spawn")
+        for workers in args.workers:
+            start, results = context.Event(), context.Queue()
+            processes = [
+                context.Process(target=client, args=(
+                    args.socket, args.rows, args, seed, start, results
+                    ))
+                for seed in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            start.set()
+            operations = sum(results.get() for _ in processes)
+            for process in processes:
+                process.join()
+            report(f"{workers} процессов, сервер", operations, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--tasks", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--socket", default="/tmp/storage_workers.sock")
+    parser.add_argument(
+        "--backend", choices=("memory", "sqlite"), default="memory"
+        )
+    parser.add_argument("--path", default="storage_workers.db")
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
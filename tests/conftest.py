@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.remote_storage import RemoteBookTable
+from app.core.sotrage_sync import book_storage as book_storage_sync
+from app.core.sqlite_storage import SQLiteBookTable
+from app.core.storage import BookTable, book_storage
+from app.core.storage_server import StorageServer
+
+
+@pytest.fixture
+def table(monkeypatch) -> BookTable:
+    """Пустая таблица в памяти за обоими фасадами хранилища"""
+    table = BookTable()
+    monkeypatch.setattr(book_storage, "backend", table)
+    monkeypatch.setattr(book_storage_sync, "backend", table)
+    return table
+
+
+@pytest.fixture
+def storage_server(tmp_path) -> str:
+    """Сервер хранилища с BookTable в отдельном потоке. Путь к сокету"""
+    path = str(tmp_path / "storage.sock")
+    loop = asyncio.new_event_loop()
+    server = StorageServer(BookTable(), path)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield path
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    server.server.close()
+    loop.run_until_complete(server.server.wait_closed())
+    loop.close()
+
+
+@pytest.fixture
+def remote_table(storage_server):
+    """RemoteBookTable, подключённый к серверу хранилища"""
+    table = RemoteBookTable(storage_server)
+    yield table
+    table.close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "remote"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield BookTable()
+    elif request.param == "sqlite":
+        table = SQLiteBookTable(str(tmp_path / "books.db"))
+        yield table
+        table.close()
+    else:
+        yield request.getfixturevalue("remote_table")
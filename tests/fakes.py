@@ -0,0 +1,20 @@
+import asyncio
+
+
+class FakeWebSocket:
+    """Подключение, которое запоминает отправленные кадры.
+    Пока paused не установлен, отправка ждёт (медленный клиент)"""
+
+    def __init__(self, paused: bool = False):
+        self.sent: list[str] = []
+        self.closed: int | None = None
+        self.resumed = asyncio.Event()
+        if not paused:
+            self.resumed.set()
+
+    async def send_text(self, message: str):
+        await self.resumed.wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed = code
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.websocket_api.endpoints import router
+from app.websocket_api.handler import handle_command
+
+
+def run(command: dict) -> dict:
+    return json.loads(asyncio.run(handle_command(json.dumps(command))))
+
+
+def test_crud_commands(table):
+    added = run({"request_id": 1, "op": "add", "title": "Книга"})
+    assert added == {
+        "request_id": 1, "ok": True, "result": {"id": 0, "title": "Книга"}
+    }
+    assert run({"op": "update", "id": 0, "title": "Новая"})["result"] == {
+        "id": 0, "title": "Новая"
+    }
+    assert run({"op": "get", "title": "Новая"})["result"]["id"] == 0
+    listed = run({"op": "list", "filters": {"limit": 1}})["result"]
+    assert listed["books"] == [{"id": 0, "title": "Новая"}]
+    assert listed["next_cursor"]
+    assert run({"op": "delete", "id": 0})["result"] is True
+    assert run({"op": "get", "id": 0})["result"] is None
+
+
+@pytest.mark.parametrize("command, error", [
+    ({"request_id": 7, "op": "drop"}, "Неизвестная команда: drop"),
+    ({"request_id": 7, "op": "get", "id": "0"}, "Ожидается целый id книги"),
+    ({"request_id": 7, "op": "add", "title": ""},
+     "Ожидается непустое название книги"),
+])
+def test_command_errors(table, command, error):
+    assert run(command) == {"request_id": 7, "ok": False, "error": error}
+
+
+def test_pipelined_commands_over_websocket(table):
+    app = FastAPI()
+    app.include_router(router, prefix="/websocket")
+    with TestClient(app).websocket_connect("/websocket/admin") as websocket:
+        assert websocket.receive_text() == "Подключение установлено"
+        # Команды отправляются, не дожидаясь ответов
+        for number in range(10):
+            websocket.send_text(json.dumps({
+                "request_id": number, "op": "add", "title": f"Книга {number}"
+            }))
+        responses = [json.loads(websocket.receive_text()) for _ in range(10)]
+    assert sorted(response["request_id"] for response in responses) == (
+        list(range(10))
+    )
+    assert all(response["ok"] for response in responses)
+    assert len(table) == 10
+
+
+def test_list_rejects_negative_limit(table):
+    response = run({"op": "list", "filters": {"limit": -1}})
+    assert not response["ok"]
+    assert "limit" in response["error"]
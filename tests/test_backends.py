@@ -0,0 +1,60 @@
+import asyncio
+
+from app.core.sqlite_storage import SQLiteBookTable
+from app.core.storage import BookModel, BookStorage, next_cursor
+
+
+def add(backend, *titles: str) -> list[int]:
+    books = [BookModel(title=title) for title in titles]
+    backend.add_books(books)
+    return [book.id for book in books]
+
+
+def ids(books: list[BookModel]) -> list[int]:
+    return [book.id for book in books]
+
+
+def test_filters(backend):
+    added = add(backend, "Война и мир", "Мир", "война", "Анна")
+    assert ids(backend.get_books(title__istartswith="ВОЙНА")) == [
+        added[0], added[2]
+    ]
+    assert ids(backend.get_books(title__contains="мир")) == [added[0]]
+    assert ids(backend.get_books(id__gt=added[1], id__lt=added[3])) == [
+        added[2]
+    ]
+    assert backend.get_book(title="Мир").id == added[1]
+
+
+def test_pages(backend):
+    added = add(backend, *(f"Книга {number}" for number in range(5)))
+    first = backend.get_books(limit=3)
+    second = backend.get_books(limit=3, after=next_cursor(first, 3))
+    assert ids(first) == added[:3]
+    assert ids(second) == added[3:]
+
+
+def test_changes(backend):
+    added = add(backend, "Первая", "Вторая")
+    assert backend.update_book(added[0], "Новая").title == "Новая"
+    assert backend.update_book(10**6, "Нет") is None
+    assert backend.delete_book(added[1])
+    assert not backend.delete_book(added[1])
+    assert [
+        (book.id, book.title) if book else None
+        for book in backend.get_books_by_ids([added[0], added[1]])
+    ] == [(added[0], "Новая"), None]
+
+
+def test_sqlite_keeps_books(tmp_path):
+    path = str(tmp_path / "books.db")
+    table = SQLiteBookTable(path)
+    added = add(table, "Книга")
+    table.close()
+    table = SQLiteBookTable(path)
+    try:
+        storage = BookStorage(table)
+        book = asyncio.run(storage.get_book(id=added[0]))
+        assert book.title == "Книга"
+    finally:
+        table.close()
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from app.core import journal as journal_module
+from app.core.journal import BookJournal
+from app.core.storage import BookModel, BookTable
+from app.websocket_api.handler import handle_command
+
+
+def test_apply_batch(backend):
+    backend.add_books([BookModel(title="Первая"), BookModel(title="Вторая")])
+    first_id = backend.get_book(title="Первая").id
+    second_id = backend.get_book(title="Вторая").id
+    new = [BookModel(title="Третья")]
+    updated, deleted = backend.apply_batch(
+        new, [(first_id, "Первая, исправленная"), (10**6, "Нет")],
+        [second_id, 10**6],
+        )
+    assert new[0].id > second_id
+    assert [(book.id, book.title) if book else None for book in updated] == [
+        (first_id, "Первая, исправленная"), None
+    ]
+    assert deleted == [True, False]
+    assert [book.title for book in backend.get_books()] == [
+        "Первая, исправленная", "Третья"
+    ]
+
+
+def test_apply_batch_is_one_critical_section_and_one_commit(
+    tmp_path, monkeypatch
+        ):
+    table = BookTable()
+    BookJournal(str(tmp_path), table, snapshot_every=10**9)
+    table.add_books([BookModel(title="Книга")])
+    table.commit_future().result()
+    fsyncs = []
+    fsync = journal_module.os.fsync
+
+    def counted_fsync(fd):
+        fsyncs.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(journal_module.os, "fsync", counted_fsync)
+    acquired = []
+    lock = table.lock
+
+    class CountingLock:
+        def __enter__(self):
+            acquired.append(True)
+            return lock.__enter__()
+
+        def __exit__(self, *exc):
+            return lock.__exit__(*exc)
+
+    table.lock = CountingLock()
+    table.apply_batch([BookModel(title="Новая")], [(0, "Другая")], [0])
+    table.commit_future().result()
+    assert len(acquired) == 1
+    assert len(fsyncs) == 1
+
+
+def test_websocket_batch_command(table):
+    table.add_books([BookModel(title="Первая"), BookModel(title="Вторая")])
+    response = json.loads(asyncio.run(handle_command(json.dumps({
+        "request_id": 1,
+        "op": "batch",
+        "create": [{"title": "Третья"}],
+        "update": [{"id": 0, "title": "Первая*"}],
+        "delete": [1, 5],
+    }))))
+    assert response == {"request_id": 1, "ok": True, "result": {
+        "created": [{"id": 2, "title": "Третья"}],
+        "updated": [{"id": 0, "title": "Первая*"}],
+        "deleted": [True, False],
+    }}
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.websocket_api import broker as broker_module
+from app.websocket_api.broker import BrokerLink, decode_frame, encode_frame
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(broker_module, "RECONNECT_DELAY", 0.01)
+
+
+class Worker:
+    """Процесс сервера: его связь с брокером и полученные уведомления"""
+
+    def __init__(self, path: str):
+        self.received = []
+        self.link = BrokerLink(path, self.deliver)
+
+    async def deliver(self, message: str, channel: str):
+        self.received.append((message, channel))
+
+
+async def wait_for(condition, timeout: float = 2):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def test_frame_round_trip():
+    frame = encode_frame("Книга добавлена", "admin_notifications")
+    assert decode_frame(frame) == ("Книга добавлена", "admin_notifications")
+
+
+def test_notifications_reach_other_workers(tmp_path):
+    path = str(tmp_path / "notify.sock")
+
+    async def main():
+        workers = [Worker(path) for _ in range(3)]
+        for worker in workers:
+            worker.link.start()
+        await wait_for(lambda: all(w.link.connected for w in workers))
+        brokers = [w for w in workers if w.link.broker is not None]
+        assert len(brokers) == 1
+        workers[0].link.send("первое", "book_updates")
+        # Лента изменений между процессами не пересылается
+        workers[0].link.send("событие", "book_changes")
+        await wait_for(lambda: all(w.received for w in workers[1:]))
+        assert [w.received for w in workers] == [
+            [], [("первое", "book_updates")], [("первое", "book_updates")]
+        ]
+
+        # Процесс-брокер завершился: брокером становится другой
+        await brokers[0].link.stop()
+        rest = [w for w in workers if w is not brokers[0]]
+        await wait_for(lambda: any(w.link.broker for w in rest))
+        await asyncio.sleep(0.1)
+        await wait_for(lambda: all(w.link.connected for w in rest))
+        assert sum(w.link.broker is not None for w in rest) == 1
+        rest[0].link.send("второе", "book_updates")
+        await wait_for(lambda: len(rest[1].received) == 2)
+        assert rest[1].received[-1] == ("второе", "book_updates")
+        for worker in rest:
+            await worker.link.stop()
+
+    asyncio.run(main())
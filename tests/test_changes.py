@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.changes import ChangeFeed
+from app.core.storage import BookModel
+from app.websocket_api import manager as manager_module
+from app.websocket_api.endpoints import router
+from app.websocket_api.manager import CHANGES, ConnectionManager
+from tests.fakes import FakeWebSocket
+
+
+@pytest.fixture
+def feed(table, monkeypatch) -> ChangeFeed:
+    """Лента изменений таблицы на 3 события"""
+    feed = ChangeFeed(capacity=3)
+    table.listeners.append(feed.append)
+    monkeypatch.setattr(manager_module, "change_feed", feed)
+    return feed
+
+
+def frames(websocket: FakeWebSocket) -> list[dict]:
+    return [json.loads(frame) for frame in websocket.sent]
+
+
+def test_since_returns_missed_events(table, feed):
+    table.add_books([BookModel(title="Первая"), BookModel(title="Вторая")])
+    table.update_book(0, "Новая")
+    assert [event[0] for event in feed.since(1)] == [2, 3]
+    assert feed.since(3) == []
+    assert feed.since(4) is None
+    table.delete_book(1)
+    # Событие 1 вытеснено: продолжить с 0 нельзя
+    assert feed.since(0) is None
+    assert feed.since(1)[-1] == (4, "delete", 1, None, "Вторая")
+
+
+def test_resume_sends_only_missed_events(table, feed):
+    async def main():
+        manager = ConnectionManager()
+        manager.start()
+        feed.listeners.append(manager.publish_change)
+        table.add_books([BookModel(title="Первая"), BookModel(title="Вторая")])
+        table.update_book(1, "Новая")
+        client = FakeWebSocket()
+        await manager.subscribe_changes(client, since=1)
+        table.delete_book(0)
+        await asyncio.sleep(0.01)
+        assert [
+            (frame["type"], frame.get("seq")) for frame in frames(client)
+        ] == [("hello", 3), ("change", 2), ("change", 3), ("change", 4)]
+        assert frames(client)[2]["old_title"] == "Вторая"
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_resume_after_eviction_sends_snapshot(table, feed):
+    async def main():
+        manager = ConnectionManager()
+        table.add_books([
+            BookModel(title=f"Книга {number}") for number in range(5)
+        ])
+        client = FakeWebSocket()
+        await manager.subscribe_changes(client, since=1)
+        await asyncio.sleep(0)
+        sent = frames(client)
+        assert sent[0] == {
+            "type": "snapshot", "seq": 5,
+            "books": [
+                {"id": number, "title": f"Книга {number}"}
+                for number in range(5)
+            ],
+        }
+        assert sent[1:] == [{"type": "snapshot_end", "seq": 5}]
+        manager.disconnect(client, CHANGES)
+
+    asyncio.run(main())
+
+
+def test_subscribe_replies_go_through_queue(table, feed, monkeypatch):
+    app = FastAPI()
+    app.include_router(router, prefix="/websocket")
+    monkeypatch.setattr(
+        manager_module.manager, "send_personal_message", None
+        )
+    with TestClient(app).websocket_connect(
+            "/websocket/book-changes") as websocket:
+        assert json.loads(websocket.receive_text())["type"] == "hello"
+        websocket.send_text(json.dumps(
+            {"type": "subscribe", "filters": [{"id__gt": 10}]}
+            ))
+        assert json.loads(websocket.receive_text()) == {
+            "type": "subscribed", "filters": 1
+        }
+        websocket.send_text(json.dumps({"type": "ping"}))
+        assert json.loads(websocket.receive_text()) == {
+            "type": "error", "detail": "Ожидается команда subscribe"
+        }
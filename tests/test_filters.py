@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from app.websocket_api.filters import SubscriptionIndex, parse_filters
+
+TITLES = ("Война", "война и мир", "Мир", "Анна", "Анна Каренина", "")
+CONDITIONS = (
+    lambda rnd: {"id": rnd.randrange(10)},
+    lambda rnd: {"id__gt": rnd.randrange(10)},
+    lambda rnd: {"id__lt": rnd.randrange(10)},
+    lambda rnd: {"id__gt": rnd.randrange(5), "id__lt": rnd.randrange(5, 10)},
+    lambda rnd: {"title": rnd.choice(TITLES)},
+    lambda rnd: {"title__startswith": rnd.choice(TITLES)[:2]},
+    lambda rnd: {"title__istartswith": rnd.choice(TITLES)[:3]},
+    lambda rnd: {"title__contains": rnd.choice(TITLES)[1:3]},
+    lambda rnd: {"title__icontains": rnd.choice(TITLES)[1:3]},
+)
+
+
+def random_filters(rnd: random.Random) -> list[dict]:
+    filters = []
+    for _ in range(rnd.randint(0, 2)):
+        conditions = {}
+        for make in rnd.sample(CONDITIONS, rnd.randint(1, 2)):
+            conditions |= make(rnd)
+        filters.append(conditions)
+    return parse_filters(filters)
+
+
+def test_index_matches_every_filter():
+    rnd = random.Random(1)
+    index = SubscriptionIndex()
+    subscribers = list(range(50))
+    for subscriber in subscribers:
+        index.set(subscriber, random_filters(rnd))
+    # Часть подписчиков меняет фильтры или отписывается
+    for subscriber in rnd.sample(subscribers, 10):
+        index.set(subscriber, random_filters(rnd))
+    for subscriber in rnd.sample(subscribers, 10):
+        index.remove(subscriber)
+        subscribers.remove(subscriber)
+    for seq in range(500):
+        old_title = rnd.choice(TITLES + (None,))
+        event = (
+            seq, "update", rnd.randrange(10), rnd.choice(TITLES), old_title
+        )
+        expected = {
+            subscriber for subscriber in subscribers
+            if index.accepts(subscriber, event)
+        }
+        assert set(index.match(event)) == expected
+
+
+@pytest.mark.parametrize("filters", [
+    "id", [1], [{"year": 1}], [{"id": "1"}], [{"id__gt": True}],
+])
+def test_invalid_filters(filters):
+    with pytest.raises(ValueError):
+        parse_filters(filters)
@@ -0,0 +1,144 @@
+import json
+from collections import OrderedDict
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.storage import BookModel
+from app.graphql_api.endpoints import router
+from app.graphql_api.persisted import document_cache, query_hash
+
+
+@pytest.fixture
+def client(table) -> TestClient:
+    table.add_books([
+        BookModel(title=f"Книга {number}") for number in range(5)
+    ])
+    app = FastAPI()
+    app.include_router(router, prefix="/graphql")
+    return TestClient(app)
+
+
+@pytest.fixture
+def documents(monkeypatch):
+    """Пустой кеш документов"""
+    monkeypatch.setattr(document_cache, "entries", OrderedDict())
+    monkeypatch.setattr(document_cache, "hits", 0)
+    monkeypatch.setattr(document_cache, "misses", 0)
+    return document_cache
+
+
+def persisted(sha256: str) -> dict:
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+
+
+def test_book_fields_load_in_one_batch(client, table, monkeypatch):
+    calls = []
+    get_books_by_ids = table.get_books_by_ids
+
+    def spy(book_ids):
+        calls.append(list(book_ids))
+        return get_books_by_ids(book_ids)
+
+    monkeypatch.setattr(table, "get_books_by_ids", spy)
+    response = client.post("/graphql", json={"query": """{
+        first: book(id: 0) { title }
+        second: book(id: 2) { title }
+        books(ids: [1, 2, 9]) { id title }
+    }"""})
+    assert response.json()["data"] == {
+        "first": {"title": "Книга 0"},
+        "second": {"title": "Книга 2"},
+        "books": [
+            {"id": "1", "title": "Книга 1"}, {"id": "2", "title": "Книга 2"}
+        ],
+    }
+    # Повторный id загружается один раз
+    assert len(calls) == 1
+    assert sorted(calls[0]) == [0, 1, 2, 9]
+
+
+def test_ids_with_other_filters_is_error(client):
+    response = client.post("/graphql", json={
+        "query": "{ books(ids: [1], limit: 1) { id } }"
+    })
+    assert response.json()["errors"][0]["message"] == (
+        "ids нельзя сочетать с другими фильтрами"
+    )
+
+
+def test_persisted_query_round_trip(client, documents):
+    query = "{ book(id: 1) { title } }"
+    extensions = persisted(query_hash(query))
+    missing = client.post("/graphql", json={"extensions": extensions})
+    assert missing.json()["errors"][0]["extensions"] == {
+        "code": "PERSISTED_QUERY_NOT_FOUND"
+    }
+    # Клиент повторяет запрос с текстом, дальше текст не нужен
+    client.post("/graphql", json={"query": query, "extensions": extensions})
+    response = client.post("/graphql", json={"extensions": extensions})
+    assert response.json() == {"data": {"book": {"title": "Книга 1"}}}
+    response = client.get(
+        "/graphql", params={"extensions": json.dumps(extensions)}
+        )
+    assert response.json() == {"data": {"book": {"title": "Книга 1"}}}
+    assert documents.hits == 2
+
+
+def test_persisted_hash_mismatch(client, documents):
+    response = client.post("/graphql", json={
+        "query": "{ book(id: 1) { title } }",
+        "extensions": persisted(query_hash("{ books { id } }")),
+    })
+    assert response.status_code == 400
+    assert documents.entries == {}
+
+
+@pytest.mark.parametrize("query, code", [
+    ("{ books { id } }", None),
+    ("query Deep { a { b { c { d { e { f } } } } } }", "QUERY_TOO_DEEP"),
+    (
+        "query Wide { " + " ".join(
+            f"b{number}: books {{ id title }}" for number in range(70)
+        ) + " }",
+        "QUERY_TOO_COMPLEX",
+    ),
+])
+def test_query_limits(client, documents, query, code):
+    errors = client.post("/graphql", json={"query": query}).json().get(
+        "errors", []
+        )
+    codes = [error.get("extensions", {}).get("code") for error in errors]
+    if code is None:
+        assert codes == []
+        assert query_hash(query) in documents.entries
+    else:
+        assert code in codes
+        assert query_hash(query) not in documents.entries
+
+
+def test_books_by_id(client):
+    response = client.post("/graphql", json={
+        "query": '{ books(id: "3") { id title } }'
+    })
+    assert response.json() == {
+        "data": {"books": [{"id": "3", "title": "Книга 3"}]}
+    }
+
+
+@pytest.mark.parametrize("query", [
+    '{ books(id: "x") { id } }',
+    '{ book(id: "x") { id } }',
+    '{ books(ids: ["1", "x"]) { id } }',
+])
+def test_non_numeric_id_is_error(client, query):
+    errors = client.post("/graphql", json={"query": query}).json()["errors"]
+    assert errors[0]["message"] == "Некорректный id книги: x"
+
+
+def test_books_limit_must_be_positive(client):
+    errors = client.post("/graphql", json={
+        "query": "{ books(limit: -1) { id } }"
+    }).json()["errors"]
+    assert errors[0]["message"] == "limit должен быть не меньше 1"
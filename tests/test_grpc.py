@@ -0,0 +1,212 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+import grpc
+import pytest
+
+from app.core.changes import ChangeFeed
+from app.core.storage import BookModel
+from app.grpc_api import book_pb2, book_pb2_grpc, service
+from app.grpc_api.cache import BookWireCache
+
+
+async def call(method: str, request):
+    server = grpc.aio.server()
+    service.add_book_service(service.BookService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = book_pb2_grpc.BookServiceStub(channel)
+            return await getattr(stub, method)(request)
+    finally:
+        await server.stop(0)
+
+
+async def stream(method: str, request) -> list:
+    """Все сообщения потокового ответа"""
+    server = grpc.aio.server()
+    service.add_book_service(service.BookService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = book_pb2_grpc.BookServiceStub(channel)
+            return [
+                response async for response in
+                getattr(stub, method)(request)
+            ]
+    finally:
+        await server.stop(0)
+
+
+@pytest.fixture
+def cache(monkeypatch) -> BookWireCache:
+    cache = BookWireCache()
+    monkeypatch.setattr(service, "book_wire_cache", cache)
+    return cache
+
+
+def test_get_books_from_cached_bytes(table, cache):
+    table.add_books([
+        BookModel(title=f"Книга {number}") for number in range(5)
+    ])
+    request = book_pb2.BookFilter(limit=3)
+    first = asyncio.run(call("GetBooks", request))
+    assert [(book.id, book.title) for book in first.books] == [
+        (0, "Книга 0"), (1, "Книга 1"), (2, "Книга 2")
+    ]
+    assert first.next_cursor
+    second = asyncio.run(call("GetBooks", request))
+    assert second == first
+    assert cache.stats == {"size": 3, "hits": 3, "misses": 3}
+
+
+def test_cached_bytes_match_protobuf():
+    books = [BookModel(title="Война и мир", id=300), BookModel(title="", id=0)]
+    expected = book_pb2.BooksResponse(
+        books=[book_pb2.Book(id=book.id, title=book.title) for book in books],
+        next_cursor="курсор",
+    ).SerializeToString()
+    assert BookWireCache().books_response(books, "курсор") == expected
+
+
+def test_cache_evicts_least_recently_used():
+    cache = BookWireCache(capacity=2)
+    first, second, third = (
+        BookModel(title=f"Книга {number}", id=number) for number in range(3)
+    )
+    cache.field(first)
+    cache.field(second)
+    cache.field(first)
+    cache.field(third)
+    assert list(cache.entries) == [0, 2]
+
+
+def test_changed_book_is_encoded_again(table, cache):
+    feed = ChangeFeed()
+    table.listeners.append(feed.append)
+    feed.listeners.append(cache.invalidate)
+    table.add_book(BookModel(title="Старое"))
+    asyncio.run(call("GetBooks", book_pb2.BookFilter()))
+    table.update_book(0, "Новое")
+    assert 0 not in cache.entries
+    response = asyncio.run(call("GetBooks", book_pb2.BookFilter()))
+    assert [book.title for book in response.books] == ["Новое"]
+
+
+def test_other_methods_registered(table, cache):
+    book = asyncio.run(
+        call("CreateBook", book_pb2.CreateRequest(title="Книга"))
+        )
+    assert (book.id, book.title) == (0, "Книга")
+
+
+@pytest.mark.parametrize("method, request_", [
+    ("UpdateBook", book_pb2.UpdateRequest(id=5, title="Книга")),
+    ("DeleteBook", book_pb2.DeleteRequest(id=5)),
+])
+def test_missing_book_is_not_found(table, method, request_):
+    with pytest.raises(grpc.aio.AioRpcError) as error:
+        asyncio.run(call(method, request_))
+    assert error.value.code() == grpc.StatusCode.NOT_FOUND
+
+
+@pytest.mark.parametrize("method", ["GetBooks", "StreamBooks"])
+def test_negative_limit_is_invalid(table, method):
+    async def request():
+        if method == "GetBooks":
+            return await call(method, book_pb2.BookFilter(limit=-1))
+        return await stream(method, book_pb2.BookFilter(limit=-1))
+
+    with pytest.raises(grpc.aio.AioRpcError) as error:
+        asyncio.run(request())
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_stream_books_in_chunks(table):
+    table.add_books([
+        BookModel(title=f"Книга {number}") for number in range(5)
+    ])
+    responses = asyncio.run(stream(
+        "StreamBooks", book_pb2.BookFilter(chunk_size=2, limit=4)
+        ))
+    assert [[book.id for book in r.books] for r in responses] == [
+        [0, 1], [2, 3]
+    ]
+    rest = asyncio.run(stream(
+        "StreamBooks", book_pb2.BookFilter(after=responses[-1].next_cursor)
+        ))
+    assert [book.id for r in rest for book in r.books] == [4]
+
+
+def sync_commands() -> list:
+    return [
+        book_pb2.SyncCommand(
+            request_id=1, create=book_pb2.CreateRequest(title="Первая")
+            ),
+        book_pb2.SyncCommand(
+            request_id=2, create=book_pb2.CreateRequest(title="Вторая")
+            ),
+        book_pb2.SyncCommand(
+            request_id=3, update=book_pb2.UpdateRequest(id=0, title="Новая")
+            ),
+        book_pb2.SyncCommand(
+            request_id=4, delete=book_pb2.DeleteRequest(id=7)
+            ),
+    ]
+
+
+def test_book_sync_results_in_command_order(table):
+    results = asyncio.run(stream("BookSync", iter(sync_commands())))
+    assert [
+        (result.request_id, result.WhichOneof("result")) for result in results
+    ] == [(1, "book"), (2, "book"), (3, "book"), (4, "error")]
+    assert results[2].book.title == "Новая"
+
+
+def test_book_sync_stops_when_commands_fail(table):
+    async def commands():
+        for command in sync_commands()[:2]:
+            yield command
+        raise RuntimeError("поток оборвался")
+
+    async def run() -> list:
+        results = []
+        with pytest.raises(RuntimeError):
+            async for result in service.BookService().BookSync(
+                    commands(), None):
+                results.append(result)
+        return results
+
+    results = asyncio.run(asyncio.wait_for(run(), 5))
+    assert [result.request_id for result in results] == [1, 2]
+
+
+
+def test_invalidation_from_writer_thread():
+    cache = BookWireCache()
+    book = BookModel(title="Книга", id=1)
+    cache.field(book)
+    threads = []
+
+    class UpdatedAfterRead(OrderedDict):
+        """Записи кеша: книга изменяется в потоке записи сразу
+        после чтения её записи"""
+
+        def get(self, key, default=None):
+            entry = super().get(key, default)
+            thread = threading.Thread(target=cache.invalidate, args=(
+                (1, "update", key, "Новое", book.title),
+                ))
+            thread.start()
+            thread.join(0.1)
+            threads.append(thread)
+            return entry
+
+    cache.entries = UpdatedAfterRead(cache.entries)
+    assert cache.field(book) == BookWireCache().field(book)
+    for thread in threads:
+        thread.join()
+    assert 1 not in cache.entries
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from app.core import journal as journal_module
+from app.core.journal import BookJournal
+from app.core.storage import BookModel, BookTable
+
+
+def books(table: BookTable) -> list[tuple[int, str]]:
+    return [(book.id, book.title) for book in table.get_books()]
+
+
+def reopen(directory) -> BookTable:
+    table = BookTable()
+    BookJournal(str(directory), table)
+    return table
+
+
+def test_recovers_snapshot_and_journal_tail(tmp_path):
+    table = BookTable()
+    journal = BookJournal(str(tmp_path), table, snapshot_every=10**9)
+    table.add_books([
+        BookModel(title=f"Книга {number}") for number in range(5)
+    ])
+    journal.snapshot()
+    table.update_book(1, "Другая")
+    table.delete_book(3)
+    table.add_book(BookModel(title="Последняя"))
+    table.commit_future().result()
+    expected = books(table)
+
+    # Без close: снимок и хвост журнала после него
+    recovered = reopen(tmp_path)
+    assert books(recovered) == expected
+    recovered.add_book(BookModel(title="Новая"))
+    assert recovered.get_book(id=6).title == "Новая"
+    recovered.close()
+    assert books(reopen(tmp_path)) == [*expected, (6, "Новая")]
+
+
+def test_torn_record_is_dropped(tmp_path):
+    table = BookTable()
+    BookJournal(str(tmp_path), table, snapshot_every=10**9)
+    table.add_book(BookModel(title="Целая"))
+    table.add_book(BookModel(title="Оборванная"))
+    table.commit_future().result()
+    [wal] = [name for name in os.listdir(tmp_path) if name.endswith(".wal")]
+    path = tmp_path / wal
+    os.truncate(path, os.path.getsize(path) - 3)
+    assert books(reopen(tmp_path)) == [(0, "Целая")]
+
+
+def test_snapshot_writes_outside_table_lock(tmp_path, monkeypatch):
+    table = BookTable()
+    journal = BookJournal(str(tmp_path), table, snapshot_every=10**9)
+    table.add_book(BookModel(title="Книга"))
+    held = []
+    fsync = os.fsync
+
+    def checked_fsync(fd):
+        held.append(table.lock.locked())
+        fsync(fd)
+
+    monkeypatch.setattr(journal_module.os, "fsync", checked_fsync)
+    journal.snapshot()
+    assert held and not any(held)
+
+
+def test_write_error_rejects_further_changes(tmp_path, monkeypatch):
+    table = BookTable()
+    BookJournal(str(tmp_path), table, snapshot_every=10**9)
+    table.add_book(BookModel(title="Записана"))
+    table.commit_future().result()
+
+    def failing_fsync(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(journal_module.os, "fsync", failing_fsync)
+    table.add_book(BookModel(title="Не записана"))
+    with pytest.raises(OSError):
+        table.commit_future().result()
+    with pytest.raises(OSError, match="Журнал не записан"):
+        table.update_book(0, "Отклонено")
+    assert books(table) == [(0, "Записана"), (1, "Не записана")]
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+
+from app.websocket_api import manager as manager_module
+from app.websocket_api.manager import (
+    BLOCK, DROP_NEWEST, DROP_OLDEST, ConnectionManager, NotifyTemplate,
+)
+from tests.fakes import FakeWebSocket
+
+
+async def blocked_manager(queue_size: int):
+    """Менеджер с политикой block, рассылка которого ждёт release"""
+    manager = ConnectionManager(queue_size=queue_size, overflow=BLOCK)
+    manager.start()
+    delivered = []
+    release = asyncio.Event()
+
+    async def broadcast(message, channel):
+        await release.wait()
+        delivered.append(message)
+
+    manager.broadcast = broadcast
+    return manager, delivered, release
+
+
+def publish_from_thread(manager, messages: list[str]) -> threading.Thread:
+    def publish():
+        for message in messages:
+            manager.publish_threadsafe(message, "book_updates")
+
+    thread = threading.Thread(target=publish)
+    thread.start()
+    return thread
+
+
+def test_block_policy_makes_thread_wait_in_order():
+    async def main():
+        manager, delivered, release = await blocked_manager(queue_size=2)
+        tasks = len(asyncio.all_tasks())
+        messages = [str(number) for number in range(6)]
+        thread = publish_from_thread(manager, messages)
+        await asyncio.sleep(0.2)
+        # Одно уведомление у рассылки, два в очереди, поток ждёт места
+        assert thread.is_alive()
+        assert manager.queue.full()
+        assert len(asyncio.all_tasks()) <= tasks + 1
+        release.set()
+        await asyncio.to_thread(thread.join)
+        await manager.queue.join()
+        assert delivered == messages
+        assert manager.stats["dropped_newest"] == 0
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_block_policy_thread_gives_up(monkeypatch):
+    monkeypatch.setattr(manager_module, "BLOCK_TIMEOUT", 0.05)
+
+    async def main():
+        manager, delivered, release = await blocked_manager(queue_size=1)
+        thread = publish_from_thread(manager, ["1", "2", "3"])
+        await asyncio.to_thread(thread.join)
+        assert manager.stats["dropped_newest"] == 1
+        release.set()
+        await manager.queue.join()
+        assert delivered == ["1", "2"]
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_block_policy_in_loop_thread_does_not_spawn_tasks():
+    async def main():
+        manager, _, release = await blocked_manager(queue_size=1)
+        await manager.publish("1", "book_updates")
+        await manager.publish("2", "book_updates")
+        tasks = len(asyncio.all_tasks())
+        manager.publish_threadsafe("3", "book_updates")
+        await asyncio.sleep(0)
+        assert len(asyncio.all_tasks()) == tasks
+        assert manager.stats["dropped_newest"] == 1
+        release.set()
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_slow_client_is_evicted():
+    async def main():
+        manager = ConnectionManager(client_queue_size=4, client_high_water=2)
+        fast, slow = FakeWebSocket(), FakeWebSocket(paused=True)
+        await manager.connect(fast, "book_updates")
+        await manager.connect(slow, "book_updates")
+        for number in range(6):
+            await manager.broadcast(str(number), "book_updates")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert fast.sent == [str(number) for number in range(6)]
+        assert slow.closed == 1008
+        assert list(manager.active_connections["book_updates"]) == [fast]
+        assert manager.stats["evicted"] == 1
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_template_matches_format():
+    template = NotifyTemplate("{} вызвана: {title!r}, {result}")
+    assert template.render(("get_book",), {
+        "title": "Война", "result": None
+    }) == "get_book вызвана: 'Война', None"
+    assert NotifyTemplate("Без подстановок").static == "Без подстановок"
+
+
+def test_long_values_are_summarized():
+    text = NotifyTemplate("{result}").render((), {"result": list(range(50))})
+    assert text == "[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ... всего 50]"
+
+
+def test_notify_skips_formatting_without_subscribers(monkeypatch):
+    manager = ConnectionManager()
+    rendered = []
+    monkeypatch.setattr(
+        NotifyTemplate, "render",
+        lambda self, args, values: rendered.append(values) or "",
+        )
+
+    @manager.notify("{result}", "book_updates")
+    async def handler():
+        return "ответ"
+
+    async def main():
+        assert await handler() == "ответ"
+        assert rendered == []
+        await manager.connect(FakeWebSocket(), "book_updates")
+        await handler()
+        assert [values["result"] for values in rendered] == ["ответ"]
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_batch_clients_get_one_frame():
+    async def main():
+        manager = ConnectionManager(batch_window=0.01, batch_size=3)
+        single, batched = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(single, "book_updates")
+        await manager.connect(batched, "book_updates", batch=True)
+        for number in range(4):
+            await manager.broadcast(str(number), "book_updates")
+        await asyncio.sleep(0.05)
+        assert single.sent == ["0", "1", "2", "3"]
+        # Полная пачка уходит сразу, остаток - по истечении окна
+        assert [json.loads(frame) for frame in batched.sent] == [
+            ["0", "1", "2"], ["3"]
+        ]
+        assert manager.stats["batches"] == 2
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_drop_policies_keep_queue_bounded():
+    async def main(overflow: str) -> list[str]:
+        manager, delivered, release = await blocked_manager(queue_size=2)
+        manager.overflow = overflow
+        for number in range(5):
+            # Публикация не ждёт рассылки, даже когда очередь полна
+            await manager.publish(str(number), "book_updates")
+            await asyncio.sleep(0)
+        release.set()
+        await manager.queue.join()
+        await manager.stop()
+        return delivered
+
+    # "0" уже у рассылки, в очереди остаются два уведомления
+    assert asyncio.run(main(DROP_OLDEST)) == ["0", "3", "4"]
+    assert asyncio.run(main(DROP_NEWEST)) == ["0", "1", "2"]
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.storage import (
+    BookModel, book_storage, decode_cursor, encode_cursor,
+)
+from app.rest_api.endpoints import router
+
+
+@pytest.fixture
+def client(table) -> TestClient:
+    table.add_books([
+        BookModel(title=f"Книга {number}") for number in range(5)
+    ])
+    app = FastAPI()
+    app.include_router(router, prefix="/rest")
+    return TestClient(app)
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    with pytest.raises(ValueError):
+        decode_cursor("не курсор")
+
+
+def test_pages_follow_cursor(client):
+    pages, params = [], {"limit": 2}
+    while True:
+        page = client.get("/rest/", params=params).json()
+        pages.append([book["id"] for book in page["books"]])
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+    assert pages == [[0, 1], [2, 3], [4]]
+
+
+def test_invalid_cursor_is_bad_request(client):
+    response = client.get("/rest/", params={"after": "не курсор"})
+    assert response.status_code == 400
+
+
+def test_iter_book_chunks(table):
+    table.add_books([
+        BookModel(title=f"Книга {number}") for number in range(5)
+    ])
+
+    async def chunks() -> list:
+        return [
+            [book.id for book in books]
+            async for books in book_storage.iter_book_chunks(
+                id__gt=1, chunk_size=2)
+        ]
+
+    assert asyncio.run(chunks()) == [[2, 3], [4]]
@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.remote_storage import RemoteBookTable
+from app.core.storage import BookModel
+
+
+@pytest.fixture
+def other_worker(storage_server):
+    """Второй процесс сервера, подключённый к тому же хранилищу"""
+    table = RemoteBookTable(storage_server)
+    yield table
+    table.close()
+
+
+def test_workers_share_books(remote_table, other_worker):
+    book = BookModel(title="Книга")
+    remote_table.add_book(book)
+    assert other_worker.get_book(id=book.id).title == "Книга"
+    other_worker.update_book(book.id, "Новая")
+    assert remote_table.get_books(title="Новая")[0].id == book.id
+
+
+def test_pipelined_calls_from_threads(remote_table):
+    def add(number: int) -> int:
+        book = BookModel(title=f"Книга {number}")
+        remote_table.add_book(book)
+        assert remote_table.get_book(id=book.id).title == book.title
+        return book.id
+
+    with ThreadPoolExecutor(8) as pool:
+        ids = list(pool.map(add, range(200)))
+    assert sorted(ids) == list(range(200))
+
+
+def test_changes_of_other_workers(remote_table, other_worker):
+    events = []
+    received = threading.Event()
+
+    def listener(*event):
+        events.append(event)
+        received.set()
+
+    remote_table.listeners.append(listener)
+    remote_table.subscribe()
+    other_worker.add_book(BookModel(title="Книга"))
+    assert received.wait(2)
+    assert events == [("add", 0, "Книга", None)]
+
+
+def test_server_errors_are_raised(remote_table):
+    with pytest.raises(ValueError):
+        remote_table.get_books(after="не курсор")
+
+
+def test_listener_error_keeps_reader(remote_table, other_worker):
+    received = threading.Event()
+
+    def broken(*event):
+        raise RuntimeError("ошибка подписчика")
+
+    remote_table.listeners.extend([broken, lambda *event: received.set()])
+    remote_table.subscribe()
+    other_worker.add_book(BookModel(title="Книга"))
+    assert received.wait(2)
+    assert remote_table.get_book(id=0).title == "Книга"
+
+
+# Поток чтения завершается с необработанным исключением
+@pytest.mark.filterwarnings(
+    "ignore::pytest.PytestUnhandledThreadExceptionWarning"
+    )
+def test_calls_fail_after_reader_stops(remote_table, other_worker):
+    def broken(data):
+        raise RuntimeError("ошибка разбора")
+
+    remote_table._event = broken
+    remote_table.subscribe()
+    other_worker.add_book(BookModel(title="Книга"))
+    remote_table.reader.join(2)
+    assert remote_table.closed
+    with pytest.raises(ConnectionError):
+        remote_table.get_book(id=0)
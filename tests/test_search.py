@@ -0,0 +1,110 @@
+import random
+from array import array
+
+import pytest
+
+from app.core import search
+from app.core.storage import BookModel, BookTable, encode_cursor
+
+FILTERS = (
+    "title__startswith",
+    "title__istartswith",
+    "title__contains",
+    "title__icontains",
+)
+WORDS = ("ab", "AB", "Ab", "abc", "b", "Straße", "STRASSE", "ßa", "x")
+
+
+def random_title(rnd: random.Random) -> str:
+    return "".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 3)))
+
+
+def expected(live: dict, key: str, value: str, after=None, limit=None):
+    check = BookTable().allowed_filters[key]
+    books = [
+        (book_id, title) for book_id, title in sorted(live.items())
+        if (after is None or book_id > after)
+        and check(BookModel(title=title, id=book_id), value)
+    ]
+    return books[:limit] if limit else books
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Маленькие части, чтобы проверить деление и удаление частей
+    monkeypatch.setattr(search, "CHUNK_SIZE", 4)
+
+
+@pytest.mark.parametrize("trigrams", [False, True])
+def test_search_matches_full_scan(trigrams):
+    rnd = random.Random(1)
+    table = BookTable(trigrams=trigrams)
+    live = {}
+    for step in range(2000):
+        action = rnd.random()
+        if action < 0.5 or not live:
+            book = BookModel(title=random_title(rnd))
+            table.add_book(book)
+            live[book.id] = book.title
+        elif action < 0.75:
+            book_id = rnd.choice(list(live))
+            live[book_id] = random_title(rnd)
+            table.update_book(book_id, live[book_id])
+        else:
+            book_id = rnd.choice(list(live))
+            table.delete_book(book_id)
+            del live[book_id]
+        if step % 100:
+            continue
+        for key in FILTERS:
+            value = random_title(rnd)[:rnd.randint(1, 4)]
+            for limit in (None, 1, 3):
+                after = rnd.choice([None, *list(live)[:5]])
+                books = table.get_books(
+                    limit=limit,
+                    after=None if after is None else encode_cursor(after),
+                    **{key: value},
+                    )
+                assert [(book.id, book.title) for book in books] == (
+                    expected(live, key, value, after, limit)
+                    )
+
+
+@pytest.mark.parametrize("trigrams", [False, True])
+def test_load_builds_index(trigrams):
+    titles = ["Bb", "aB", "ab", "Abc", "ab", "b"]
+    table = BookTable(trigrams=trigrams)
+    table.load(array("q", range(len(titles))), titles, len(titles))
+    live = dict(enumerate(titles))
+    for key in FILTERS:
+        for value in ("a", "ab", "B", "abc"):
+            books = table.get_books(**{key: value})
+            assert [(book.id, book.title) for book in books] == (
+                expected(live, key, value)
+                )
+    table.add_book(BookModel(title="ABx"))
+    assert [book.id for book in table.get_books(title__istartswith="ab")] == [
+        1, 2, 3, 4, 6
+    ]
+
+
+def test_limit_stops_in_id_order():
+    table = BookTable()
+    table.add_books([
+        BookModel(title=f"Книга {number % 7}") for number in range(100)
+    ])
+    books = table.get_books(title__startswith="Книга", limit=5)
+    assert [book.id for book in books] == [0, 1, 2, 3, 4]
+    books = table.get_books(
+        title__startswith="Книга 3", limit=2, after=encode_cursor(3)
+        )
+    assert [book.id for book in books] == [10, 17]
+
+
+def test_trigrams_are_opt_in():
+    table = BookTable()
+    table.add_book(BookModel(title="Война и мир"))
+    assert table.search.trigrams is None
+    table.enable_trigrams()
+    assert table.search.contains("И МИР", ignore_case=True) == ["Война и мир"]
+    assert [book.id for book in table.get_books(title__contains="и м")] == [0]
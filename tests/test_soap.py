@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from spyne import Application
+from spyne.protocol.soap import Soap11
+from spyne.server.null import NullServer
+
+from app.soap_api import service
+from app.websocket_api.manager import ConnectionManager
+from tests.fakes import FakeWebSocket
+
+
+@pytest.fixture
+def soap(table):
+    """Клиент SOAP сервиса без HTTP"""
+    application = Application(
+        [service.BookServiceSOAP], "book_service",
+        in_protocol=Soap11(), out_protocol=Soap11(),
+        )
+    return NullServer(application, ostr=False).service
+
+
+def test_soap_changes_reach_websocket_clients(soap, monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr(service, "manager", manager)
+
+    async def main():
+        manager.start()
+        client = FakeWebSocket()
+        await manager.connect(client, "book_updates")
+        # Вызовы SOAP выполняются в потоке сервера, не в цикле событий
+        book = await asyncio.to_thread(soap.AddBook, "Книга")
+        await asyncio.to_thread(soap.UpdateBook, book.id, "Новая")
+        await asyncio.to_thread(soap.GetBook, book.id)
+        await manager.queue.join()
+        await asyncio.sleep(0)
+        assert client.sent == [
+            "[INFO] SOAP: Добавление новой книги",
+            "[INFO] SOAP: Обновление книги",
+        ]
+        await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_soap_without_subscribers_publishes_nothing(soap, monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr(service, "manager", manager)
+
+    async def main():
+        manager.start()
+        await asyncio.to_thread(soap.AddBook, "Книга")
+        assert manager.stats["published"] == 0
+        await manager.stop()
+
+    asyncio.run(main())
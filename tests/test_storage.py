@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from array import array
+
+from app.core.sotrage_sync import book_storage as book_storage_sync
+from app.core.storage import BookModel, BookTable, book_storage
+
+
+def titles(books: list[BookModel]) -> list[tuple[int, str]]:
+    return [(book.id, book.title) for book in books]
+
+
+def filled_table(count: int) -> BookTable:
+    table = BookTable()
+    table.add_books([
+        BookModel(title=f"Книга {number % 3}") for number in range(count)
+    ])
+    return table
+
+
+def test_get_book_by_id_and_title():
+    table = filled_table(10)
+    assert titles([table.get_book(id=7)]) == [(7, "Книга 1")]
+    assert table.get_book(id=10) is None
+    assert table.get_book(title="Книга 2").id == 2
+    assert table.get_book(title="Нет") is None
+
+
+def test_id_range():
+    table = filled_table(10)
+    assert [book.id for book in table.get_books(id__gt=3, id__lt=7)] == [
+        4, 5, 6
+    ]
+    assert [book.id for book in table.get_books(id__gt=8)] == [9]
+    assert table.get_books(id__gt=5, id__lt=6) == []
+
+
+def test_title_index_follows_changes():
+    table = filled_table(6)
+    assert [book.id for book in table.get_books(title="Книга 0")] == [0, 3]
+    table.update_book(3, "Книга 1")
+    table.delete_book(0)
+    assert table.get_books(title="Книга 0") == []
+    assert [book.id for book in table.get_books(title="Книга 1")] == [
+        1, 3, 4
+    ]
+    assert titles(table.get_books(title="Книга 1", id__gt=1)) == [
+        (3, "Книга 1"), (4, "Книга 1")
+    ]
+
+
+def test_reads_do_not_wait_for_lock(table):
+    table.add_books([BookModel(title="Книга")])
+    # Изменение в другом потоке держит блокировку: чтение её не ждёт
+    with table.lock:
+        assert titles(asyncio.run(book_storage.get_books())) == [
+            (0, "Книга")
+        ]
+        assert asyncio.run(book_storage.get_book(title="Книга")).id == 0
+
+
+def test_sync_and_async_share_table(table):
+    def add(number: int):
+        for _ in range(200):
+            book_storage_sync.add_book(BookModel(title=f"Поток {number}"))
+
+    async def add_async():
+        for _ in range(200):
+            await book_storage.add_book(BookModel(title="asyncio"))
+
+    threads = [threading.Thread(target=add, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(add_async())
+    for thread in threads:
+        thread.join()
+    books = asyncio.run(book_storage.get_books())
+    assert [book.id for book in books] == list(range(1000))
+    assert len(book_storage_sync.get_books(title="asyncio")) == 200
+
+
+def test_deleted_rows_are_compacted():
+    table = filled_table(10)
+    table.compact_threshold = 2
+    # Уплотнение - когда удалено больше половины строк
+    table.delete_books([0, 1, 2, 3, 5])
+    assert len(table.columns[0]) == 10
+    table.delete_book(7)
+    ids, column_titles = table.columns
+    assert list(ids) == [4, 6, 8, 9]
+    assert None not in column_titles
+    assert len(table) == 4
+    assert table.get_book(id=3) is None
+    assert [book.id for book in table.get_books(title="Книга 0")] == [6, 9]
+
+
+def test_load_snapshot():
+    table = filled_table(3)
+    table.load(array("q", [2, 5]), ["Вторая", "Пятая"], 6)
+    assert titles(table.get_books()) == [(2, "Вторая"), (5, "Пятая")]
+    assert table.get_book(title="Пятая").id == 5
+    book = BookModel(title="Новая")
+    table.add_book(book)
+    assert book.id == 6
+
+
+class DeletedAfterRead(list):
+    """Колонка названий, в которой книга удаляется сразу после
+    первого чтения её названия (параллельный delete_book)"""
+
+    def __getitem__(self, position):
+        title = super().__getitem__(position)
+        if isinstance(position, int):
+            self[position] = None
+        return title
+
+
+def test_scan_reads_title_once():
+    table = filled_table(6)
+    ids, column_titles = table.columns
+    table.columns = (ids, DeletedAfterRead(column_titles))
+    books = table.get_books(title__contains="Книга", limit=10)
+    assert None not in [book.title for book in books]
+    table.columns = (ids, DeletedAfterRead(column_titles))
+    assert None not in [book.title for book in table.get_books(limit=10)]
@@ -0,0 +1,31 @@
+import json
+from argparse import Namespace
+
+from benchmarks import storage_suite
+
+
+def compare(tmp_path, base: dict, new: dict) -> int:
+    for name, results in (("base", base), ("new", new)):
+        (tmp_path / f"{name}.json").write_text(
+            json.dumps({"results": results})
+            )
+    return storage_suite.compare(Namespace(
+        base=tmp_path / "base.json", new=tmp_path / "new.json", threshold=0.1
+        ))
+
+
+def test_compare_passes_within_threshold(tmp_path):
+    base = {"1000": {"sync.add_book": 100.0, "load.unique_titles": 50.0}}
+    new = {"1000": {"sync.add_book": 95.0, "load.unique_titles": 60.0}}
+    assert compare(tmp_path, base, new) == 0
+
+
+def test_compare_fails_on_regression(tmp_path):
+    base = {"1000": {"sync.add_book": 100.0}}
+    assert compare(tmp_path, base, {"1000": {"sync.add_book": 80.0}}) == 1
+
+
+def test_compare_fails_on_missing_metric(tmp_path):
+    base = {"1000": {"sync.add_book": 100.0, "load.unique_titles": 50.0}}
+    assert compare(tmp_path, base, {"1000": {"sync.add_book": 100.0}}) == 1
+    assert compare(tmp_path, base, {}) == 1
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.core.changes import ChangeFeed
+from app.core.storage import BookModel
+from app.graphql_api import schema as schema_module
+from app.graphql_api import subscriptions
+from app.graphql_api.schema import schema
+from app.graphql_api.subscriptions import BookEvents
+
+
+@pytest.fixture
+def events(table, monkeypatch) -> BookEvents:
+    """События таблицы для подписок GraphQL"""
+    feed = ChangeFeed()
+    events = BookEvents()
+    table.listeners.append(feed.append)
+    feed.listeners.append(events.publish)
+    monkeypatch.setattr(subscriptions, "change_feed", feed)
+    monkeypatch.setattr(schema_module, "book_events", events)
+    return events
+
+
+async def subscribe(events: BookEvents, query: str):
+    """Подписка и задача, ждущая её первого результата"""
+    results = await schema.subscribe(query)
+    first = asyncio.create_task(anext(results))
+    # Подписчик регистрируется при первом ожидании результата
+    async with asyncio.timeout(1):
+        while not events.has_subscribers:
+            await asyncio.sleep(0)
+    return results, first
+
+
+def test_book_changed_with_filter(table, events):
+    async def main():
+        results, first = await subscribe(events, """subscription {
+            bookChanged(filter: {titleIstartswith: "вой"}) {
+                seq op id title oldTitle
+            }
+        }""")
+        table.add_books([BookModel(title="Анна"), BookModel(title="Война")])
+        table.update_book(1, "Мир")
+        changes = [(await first).data["bookChanged"]]
+        changes.append((await anext(results)).data["bookChanged"])
+        await results.aclose()
+        return changes
+
+    assert asyncio.run(main()) == [
+        {"seq": 2, "op": "ADD", "id": "1", "title": "Война",
+         "oldTitle": None},
+        {"seq": 3, "op": "UPDATE", "id": "1", "title": "Мир",
+         "oldTitle": "Война"},
+    ]
+    assert not events.has_subscribers
+
+
+def test_books_added_in_lists(table, events):
+    async def main():
+        results, first = await subscribe(
+            events, "subscription { booksAdded { id title } }"
+            )
+        table.add_books([BookModel(title="Анна"), BookModel(title="Война")])
+        table.delete_book(0)
+        result = await first
+        await results.aclose()
+        return result.data["booksAdded"]
+
+    assert asyncio.run(main()) == [
+        {"id": "0", "title": "Анна"}, {"id": "1", "title": "Война"}
+    ]
+
+
+def test_slow_subscriber_gets_error(table, events, monkeypatch):
+    monkeypatch.setattr(subscriptions, "QUEUE_SIZE", 2)
+
+    async def main():
+        results, first = await subscribe(
+            events, "subscription { bookChanged { seq } }"
+            )
+        # Событий сразу больше, чем вмещает очередь подписчика
+        table.add_books([BookModel(title="Книга") for _ in range(5)])
+        result = await first
+        await results.aclose()
+        return result
+
+    result = asyncio.run(main())
+    assert result.errors[0].extensions == {"code": "SUBSCRIBER_TOO_SLOW"}